@@ -0,0 +1,371 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+import threading
+import hashlib
+import sqlite3
+import shutil
+import time
+import zlib
+import os
+
+# ===== Artifact Store Settings =====
+
+# "sqlite": one SQLite file (one host). For several hosts, "package.module:factory" of a
+# shared ArtifactStore implementation (see backends.py).
+ARTIFACT_STORE_BACKEND = os.getenv("ARTIFACT_STORE_BACKEND", "sqlite")
+ARTIFACT_DB = os.getenv("ARTIFACT_DB", "artifacts.sqlite")
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(1024 * 1024 * 1024)))   # compressed size
+ARTIFACT_MAX_AGE = int(os.getenv("ARTIFACT_MAX_AGE", str(30 * 24 * 3600)))           # seconds
+COMPRESSION_LEVEL = 6
+# Reads refresh an artifact's access time at most this often (seconds), not on every get()
+ACCESS_TOUCH_INTERVAL = 60
+
+# Scan output directories (reports, logs, blobs) of this host. Those not ingested into the
+# store (CLI and bulk runs, failed or cancelled jobs) are deleted once untouched for OUTPUTS_MAX_AGE
+OUTPUTS_DIR = os.getenv("OUTPUTS_DIR", "outputs")
+OUTPUTS_MAX_AGE = int(os.getenv("OUTPUTS_MAX_AGE", str(7 * 24 * 3600)))             # seconds
+
+# Artifact kinds by file name inside a scan's output directory
+KIND_REPORT = "report"
+KIND_DIFF = "diff"
+KIND_CHECKOV = "checkov"
+KIND_INPUT = "input"
+# Uploaded file of a queued job, keyed by job id until a worker picks it up
+KIND_UPLOAD = "upload"
+
+
+# ===== Artifact Store =====
+
+def content_hash(data: bytes) -> str:
+    """
+    Strong validator of an artifact's content, served as its HTTP ETag.
+    """
+
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+class ArtifactStore(ABC):
+    """
+    Store for scan artifacts (reports, diffs, checkov logs, uploaded inputs), keyed by
+    (report name, kind) and shared by every API replica and scan worker.
+    """
+
+    @abstractmethod
+    def put(self, name: str, kind: str, data: bytes, file: str = "") -> None:
+        """
+        Stores (or replaces) one artifact.
+        """
+
+    @abstractmethod
+    def get(self, name: str, kind: str = KIND_REPORT) -> Optional[bytes]:
+        """
+        Looks up an artifact by report name, None if it is not stored (or was evicted).
+        """
+
+    @abstractmethod
+    def etag(self, name: str, kind: str = KIND_REPORT) -> Optional[str]:
+        """
+        Content hash of an artifact (content_hash), None if it is not stored.
+        """
+
+    @abstractmethod
+    def delete(self, name: str, kind: str) -> None:
+        ...
+
+    @abstractmethod
+    def latest_name_for_file(self, file: str, kind: str = KIND_REPORT, exclude: str = "") -> Optional[str]:
+        """
+        Name of the most recently stored artifact of a scanned file.
+        """
+
+    @abstractmethod
+    def point_to_report(self, file: str, name: str, path: str) -> None:
+        """
+        Records path as the latest report written for a scanned file.
+        """
+
+    @abstractmethod
+    def report_pointer(self, file: str) -> Optional[tuple]:
+        """
+        (name, path) of the latest report written for a scanned file, None if there is none.
+        """
+
+    @abstractmethod
+    def list(self, kind: str = KIND_REPORT, limit: int = 100, offset: int = 0, file: str = "") -> list:
+        """
+        Stored artifacts of one kind, newest first: (name, file, size, created_at).
+        """
+
+    @abstractmethod
+    def enforce_retention(self) -> int:
+        """
+        Drops expired and least recently used scans. Returns the number of artifacts removed.
+        """
+
+    def ingest_scan(self, output_dir: str, name: str, file: str, input_path: str = "") -> None:
+        """
+        Moves a finished scan into the store: report, diff and checkov logs from output_dir
+        plus the uploaded input. The directory and input file are deleted afterwards.
+        """
+
+        for entry in os.listdir(output_dir):
+            path = os.path.join(output_dir, entry)
+            if entry == name + ".json":
+                kind = KIND_REPORT
+            elif entry == name + "_diff.json":
+                kind = KIND_DIFF
+            elif entry.startswith("checkov_"):
+                kind = KIND_CHECKOV
+            else:
+                continue
+            with open(path, "rb") as f:
+                self.put(name, kind, f.read(), file)
+
+        if input_path and os.path.exists(input_path):
+            with open(input_path, "rb") as f:
+                self.put(name, KIND_INPUT, f.read(), file)
+            os.remove(input_path)
+
+        shutil.rmtree(output_dir, ignore_errors=True)
+        self.enforce_retention()
+
+
+class SqliteArtifactStore(ArtifactStore):
+    """
+    Compressed artifact store in one SQLite file.
+
+    Everything is packed into one file instead of a directory per scan. Scans older than
+    max_age are dropped, and least recently used ones are evicted until the compressed
+    total fits in max_bytes. A scan's artifacts (report, diff, logs, input) are always
+    evicted together. Uploads of queued jobs are never evicted for size, the worker
+    deletes them when the job is finished.
+    """
+
+    def __init__(self, db_path: str = ARTIFACT_DB, max_bytes: int = ARTIFACT_MAX_BYTES, max_age: int = ARTIFACT_MAX_AGE):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        # Must be set before the first table is created to take effect
+        self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                name TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                file TEXT NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                etag TEXT,
+                PRIMARY KEY (name, kind)
+            )""")
+        # Stores created before content hashes were kept
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(artifacts)")]
+        if "etag" not in columns:
+            self._conn.execute("ALTER TABLE artifacts ADD COLUMN etag TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_file ON artifacts(file, kind, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_accessed ON artifacts(accessed_at)")
+        # Latest report file written per scanned file, for scans not (yet) moved into the store
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS report_pointers (
+                file TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                path TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )""")
+        self._conn.commit()
+
+    def put(self, name: str, kind: str, data: bytes, file: str = "") -> None:
+        """
+        Stores (or replaces) one artifact, compressed, along with its content hash.
+        """
+
+        compressed = zlib.compress(data, COMPRESSION_LEVEL)
+        etag = content_hash(data)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artifacts "
+                "(name, kind, file, data, size, stored_size, created_at, accessed_at, etag) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, kind, file, compressed, len(data), len(compressed), now, now, etag)
+            )
+            self._conn.commit()
+
+    def get(self, name: str, kind: str = KIND_REPORT) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, accessed_at FROM artifacts WHERE name = ? AND kind = ?", (name, kind)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] >= ACCESS_TOUCH_INTERVAL:
+                self._conn.execute(
+                    "UPDATE artifacts SET accessed_at = ? WHERE name = ? AND kind = ?", (now, name, kind)
+                )
+                self._conn.commit()
+
+        return zlib.decompress(row[0])
+
+    def etag(self, name: str, kind: str = KIND_REPORT) -> Optional[str]:
+        """
+        Content hash of an artifact without reading its data, None if it is not stored.
+        Hashed on the spot for artifacts stored before hashes were kept.
+        """
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag FROM artifacts WHERE name = ? AND kind = ?", (name, kind)
+            ).fetchone()
+        if row is None:
+            return None
+        if row[0] is not None:
+            return row[0]
+
+        data = self.get(name, kind)
+        if data is None:
+            return None
+        etag = content_hash(data)
+        with self._lock:
+            self._conn.execute("UPDATE artifacts SET etag = ? WHERE name = ? AND kind = ?", (etag, name, kind))
+            self._conn.commit()
+        return etag
+
+    def delete(self, name: str, kind: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM artifacts WHERE name = ? AND kind = ?", (name, kind))
+            self._conn.commit()
+
+    def latest_name_for_file(self, file: str, kind: str = KIND_REPORT, exclude: str = "") -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name FROM artifacts WHERE file = ? AND kind = ? AND name != ? ORDER BY created_at DESC LIMIT 1",
+                (file, kind, exclude)
+            ).fetchone()
+        return row[0] if row else None
+
+    def point_to_report(self, file: str, name: str, path: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO report_pointers (file, name, path, created_at) VALUES (?, ?, ?, ?)",
+                (file, name, os.path.abspath(path), time.time())
+            )
+            self._conn.commit()
+
+    def report_pointer(self, file: str) -> Optional[tuple]:
+        with self._lock:
+            row = self._conn.execute("SELECT name, path FROM report_pointers WHERE file = ?", (file,)).fetchone()
+        return tuple(row) if row else None
+
+    def list(self, kind: str = KIND_REPORT, limit: int = 100, offset: int = 0, file: str = "") -> list:
+        """
+        Stored artifacts of one kind, newest first: (name, file, size, created_at).
+        With file, only the artifacts of that scanned file.
+        """
+
+        with self._lock:
+            if file:
+                return self._conn.execute(
+                    "SELECT name, file, size, created_at FROM artifacts WHERE file = ? AND kind = ? "
+                    "ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                    (file, kind, limit, offset)
+                ).fetchall()
+            return self._conn.execute(
+                "SELECT name, file, size, created_at FROM artifacts WHERE kind = ? "
+                "ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (kind, limit, offset)
+            ).fetchall()
+
+    def enforce_retention(self) -> int:
+        """
+        Drops expired scans, then least recently used ones until the store fits in max_bytes.
+        A scan (all kinds of one name) is used as recently as its most recently read artifact.
+        Returns the number of artifacts removed.
+        """
+
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM artifacts WHERE name IN "
+                "(SELECT name FROM artifacts GROUP BY name HAVING MAX(created_at) < ?)",
+                (time.time() - self.max_age,)
+            ).rowcount
+
+            total = self._conn.execute("SELECT COALESCE(SUM(stored_size), 0) FROM artifacts").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._conn.execute(
+                    "SELECT name, SUM(stored_size) FROM artifacts WHERE kind != ? GROUP BY name ORDER BY MAX(accessed_at)",
+                    (KIND_UPLOAD,)
+                ).fetchall()
+                for name, stored_size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    removed += self._conn.execute(
+                        "DELETE FROM artifacts WHERE name = ? AND kind != ?", (name, KIND_UPLOAD)
+                    ).rowcount
+                    total -= stored_size
+
+            self._conn.commit()
+            if removed:
+                # Give the freed pages back to the file system
+                self._conn.execute("PRAGMA incremental_vacuum").fetchall()
+
+        return removed
+
+
+def sweep_outputs(outputs_dir: str = OUTPUTS_DIR, max_age: int = OUTPUTS_MAX_AGE) -> int:
+    """
+    Deletes scan output directories nothing was written to for max_age, a failed scan can
+    be resumed until then. Returns the number of directories removed.
+    """
+
+    try:
+        entries = list(os.scandir(outputs_dir))
+    except FileNotFoundError:
+        return 0
+
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in entries:
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        try:
+            # Newest of the directory and the files (and blob directory) in it
+            newest = max([entry.stat().st_mtime] + [child.stat().st_mtime for child in os.scandir(entry.path)])
+        except FileNotFoundError:
+            continue
+        if newest < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+
+    if removed:
+        print(f"Removed {removed} stale scan output directories from {outputs_dir}")
+    return removed
+
+
+_store: Optional[ArtifactStore] = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """
+    Returns the process-wide artifact store (ARTIFACT_STORE_BACKEND), opened on first use.
+    """
+
+    global _store
+    with _store_lock:
+        if _store is None:
+            if ARTIFACT_STORE_BACKEND == "sqlite":
+                _store = SqliteArtifactStore()
+            else:
+                from backends import load_backend
+                _store = load_backend(ARTIFACT_STORE_BACKEND)()
+        return _store
@@ -0,0 +1,23 @@
+import importlib
+
+# ===== Pluggable Backends =====
+
+# The job queue, artifact store, checkpointer and blob store each default to a local
+# SQLite/file implementation (one host). Their *_BACKEND setting can instead name a factory
+# of a shared implementation, as "package.module:attribute", so API replicas and scan
+# workers can run on separate hosts:
+#   JOB_QUEUE_BACKEND        -> JobQueue           (job_queue.py)
+#   ARTIFACT_STORE_BACKEND   -> ArtifactStore      (artifact_store.py)
+#   CHECKPOINT_BACKEND       -> BaseCheckpointSaver (checkpoints.py, LangGraph interface)
+#   BLOB_STORE_BACKEND       -> BlobStore          (blob_store.py), called with the scan's output_dir
+
+
+def load_backend(spec: str):
+    """
+    The class or function named by spec ("package.module:attribute").
+    """
+
+    module, _, attribute = spec.partition(":")
+    if not module or not attribute:
+        raise ValueError(f"Backend must be given as package.module:attribute, got {spec!r}")
+    return getattr(importlib.import_module(module), attribute)
@@ -0,0 +1,15 @@
+resource "aws_iam_policy" "admin" {
+  name   = "admin-everything"
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect   = "Allow"
+      Action   = "*"
+      Resource = "*"
+    }]
+  })
+}
+
+resource "aws_s3_bucket" "private" {
+  bucket = "corp-private-data"
+}
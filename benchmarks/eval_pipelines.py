@@ -0,0 +1,494 @@
+# EVALUATION OF THE SIMPLE AND REACT PIPELINES
+# Runs both scan graphs over a labeled corpus of IaC files with known misconfigurations
+# (eval_corpus/labels.yaml) and reports, per pipeline and framework: latency, LLM calls,
+# token usage, precision and recall. Use it to decide which pipeline a framework should
+# be routed to, and to catch quality regressions before a prompt or model change ships.
+#
+# No recordings ship with the corpus: the first run has to be a --record run against the real
+# models (API access needed). Once its eval_recordings/ are committed, later runs replay them
+# offline.
+#
+# Responses:
+#   recorded  model and checkov calls are replayed from eval_recordings/ (after a --record run).
+#             Latency is the local run time plus the recorded time of the replayed calls.
+#   stub      the stubs of stub_scan.py, for a smoke test of the harness (scores are meaningless)
+#   --record  runs the real models and checkov (needs the usual .env) and saves the recordings
+#
+# Usage:
+#   python benchmarks/eval_pipelines.py [--pipelines simple,react] [--responses recorded|stub]
+#       [--record] [--corpus DIR] [--recordings DIR] [--min-recall 0.8] [--json results.json] [--verbose]
+
+from typing import Optional
+from datetime import datetime
+import contextlib
+import argparse
+import tempfile
+import hashlib
+import fnmatch
+import uuid
+import yaml
+import json
+import time
+import sys
+import io
+import os
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+CORPUS_DIR = os.path.join(BENCH_DIR, "eval_corpus")
+RECORDINGS_DIR = os.path.join(BENCH_DIR, "eval_recordings")
+
+PIPELINES = ("simple", "react")
+
+# Lines an issue's location may be off by and still find a label
+LINE_TOLERANCE = 2
+
+
+# ===== Recorded Calls =====
+
+class MissingRecording(Exception):
+    pass
+
+
+class Session:
+    """
+    Model and tool calls of one case, by stage (thinker, writer, checkov), in call order.
+    Recorded from the real backends, or replayed in the same order.
+    """
+
+    def __init__(self, calls: Optional[dict] = None, recording: bool = False):
+        self.calls = calls if calls is not None else {}
+        self.recording = recording
+        self.used: list = []            # (stage, entry) of every call made in this run
+        self.replayed_time = 0.0        # recorded seconds of the replayed calls
+        self._next: dict[str, int] = {}
+
+    def add(self, stage: str, entry: dict) -> None:
+        self.calls.setdefault(stage, []).append(entry)
+        self.used.append((stage, entry))
+
+    def replay(self, stage: str) -> dict:
+        i = self._next.get(stage, 0)
+        entries = self.calls.get(stage, [])
+        if i >= len(entries):
+            raise MissingRecording(f"no recorded {stage} call #{i + 1}, record the case again (--record)")
+        self._next[stage] = i + 1
+        self.used.append((stage, entries[i]))
+        self.replayed_time += entries[i]["latency"]
+        return entries[i]
+
+    def llm_usage(self) -> dict:
+        usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+        for stage, entry in self.used:
+            if stage == "checkov":
+                continue
+            usage["calls"] += 1
+            usage["input_tokens"] += (entry.get("usage") or {}).get("input_tokens", 0)
+            usage["output_tokens"] += (entry.get("usage") or {}).get("output_tokens", 0)
+        return usage
+
+
+# The case being run, read by the backends installed below
+_session: Optional[Session] = None
+
+
+def install_backends(record: bool) -> None:
+    """
+    Swaps the LLM builders and checkov tool of the scan scripts for ones that record
+    the real calls into the current session (record=True) or replay them from it.
+    The model router still picks and escalates tiers, so routing is evaluated too.
+    """
+
+    from langchain_core.load import dumps, loads
+    from langchain_core.runnables import RunnableLambda
+    from langchain_core.tools import StructuredTool
+    import report_generator_react
+    import report_generator_simple
+    import tools
+    from model_router import ModelRouter
+    from stream_writer import StreamingIssueWriter, _chunk_text
+    from llms import build_chat_model
+    from deadlines import THINKER_TIMEOUT, WRITER_TIMEOUT
+
+    real_checkov = tools.checkov_tool
+
+    def build_thinker(tier, backend, model):
+        llm = build_chat_model(backend, timeout=THINKER_TIMEOUT, model=model).bind_tools([real_checkov]) if record else None
+
+        def think(messages):
+            if not record:
+                return loads(_session.replay("thinker")["message"], allowed_objects="core")
+
+            start = time.perf_counter()
+            response = llm.invoke(messages)
+            _session.add("thinker", {
+                "model": model,
+                "latency": time.perf_counter() - start,
+                "usage": response.usage_metadata,
+                "message": dumps(response),
+            })
+            return response
+
+        return RunnableLambda(think)
+
+    def build_writer(tier, backend, model):
+        llm = build_chat_model(backend, timeout=WRITER_TIMEOUT, json_mode=True, model=model) if record else None
+
+        def write(messages):
+            if not record:
+                text = _session.replay("writer")["text"]
+                for start in range(0, len(text), 64):
+                    yield text[start:start + 64]
+                return
+
+            start = time.perf_counter()
+            merged = None
+            pieces = []
+            for chunk in llm.stream(messages):
+                merged = chunk if merged is None else merged + chunk
+                pieces.append(_chunk_text(chunk))
+                yield pieces[-1]
+            _session.add("writer", {
+                "model": model,
+                "latency": time.perf_counter() - start,
+                "usage": merged.usage_metadata if merged is not None else None,
+                "text": "".join(pieces),
+            })
+
+        return StreamingIssueWriter(RunnableLambda(write))
+
+    def checkov(input_file_path: str, output_dir: str, output_file_name: str) -> str:
+        if not record:
+            return _session.replay("checkov")["output"]
+
+        start = time.perf_counter()
+        output = str(real_checkov.invoke({
+            "input_file_path": input_file_path, "output_dir": output_dir, "output_file_name": output_file_name
+        }))
+        _session.add("checkov", {"latency": time.perf_counter() - start, "output": output})
+        return output
+
+    # Same name, description and arguments, so the thinker's prompt does not change
+    tools.checkov_tool = StructuredTool.from_function(
+        func=checkov, name=real_checkov.name, description=real_checkov.description, args_schema=real_checkov.args_schema
+    )
+    report_generator_react.build_llms = lambda: (ModelRouter("thinker", build_thinker), ModelRouter("writer", build_writer))
+    report_generator_simple.build_llm = lambda: ModelRouter("writer", build_writer)
+
+
+def recording_path(recordings_dir: str, pipeline: str, case: dict) -> str:
+    return os.path.join(recordings_dir, pipeline, case["file"] + ".json")
+
+
+def file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+# ===== Scoring =====
+
+def _similar(a: frozenset, b: frozenset) -> bool:
+    from issue_merge import NAME_SIMILARITY
+
+    if not a or not b:
+        return False
+    return len(a & b) / len(a | b) >= NAME_SIMILARITY
+
+
+def label_matches(label: dict, issue) -> bool:
+    """
+    Whether an issue reports the labeled misconfiguration (see labels.yaml).
+    """
+
+    from issue_merge import CHECK_ALIASES, canonical_check, name_tokens
+
+    if not issue.location:
+        return False
+    start, end = label["lines"]
+    if min(issue.location) > end + LINE_TOLERANCE or max(issue.location) < start - LINE_TOLERANCE:
+        return False
+
+    check = canonical_check(issue)
+    if check is not None:
+        return check in {CHECK_ALIASES.get(c, c) for c in label.get("checks", [])}
+
+    tokens = name_tokens(issue.name)
+    return any(_similar(tokens, name_tokens(name)) for name in label.get("names", []))
+
+
+def _ignored(issue, patterns: list) -> bool:
+    from issue_merge import canonical_check
+
+    checks = {issue.check_id, canonical_check(issue)} - {None}
+    return any(fnmatch.fnmatchcase(check, pattern) for check in checks for pattern in patterns)
+
+
+def score_case(issues: list, case: dict, ignore_checks: list) -> dict:
+    """
+    True/false positives and misses of one report. Every label is found at most once,
+    further issues of a found label are counted as duplicates, not false positives.
+    """
+
+    labels = case.get("findings", [])
+    ignore_checks = ignore_checks + case.get("ignore_checks", [])
+    found = [False] * len(labels)
+    score = {"tp": 0, "fp": 0, "fn": 0, "duplicates": 0, "ignored": 0, "false_positives": [], "missed": []}
+
+    for issue in issues:
+        matches = [i for i, label in enumerate(labels) if label_matches(label, issue)]
+        free = [i for i in matches if not found[i]]
+        if free:
+            found[free[0]] = True
+            score["tp"] += 1
+        elif matches:
+            score["duplicates"] += 1
+        elif _ignored(issue, ignore_checks):
+            score["ignored"] += 1
+        else:
+            score["fp"] += 1
+            score["false_positives"].append(f"{issue.name} ({issue.check_id or 'no check'}, lines {issue.location})")
+
+    for label, was_found in zip(labels, found):
+        if not was_found:
+            score["fn"] += 1
+            score["missed"].append(f"{(label.get('names') or label.get('checks'))[0]} (lines {label['lines']})")
+
+    return score
+
+
+# ===== Running =====
+
+def build_graph(pipeline: str):
+    if pipeline == "simple":
+        from report_generator_simple import build_workflow
+        return build_workflow()
+    from report_generator_react import build_agent
+    return build_agent()
+
+
+def run_case(graph, pipeline: str, case: dict, corpus_dir: str, session: Optional[Session], verbose: bool) -> tuple:
+    """
+    Scans one corpus file, returns its metrics and issues. session is None with stubbed responses.
+    """
+
+    global _session
+    from checkpoints import run_job
+
+    path = os.path.join(corpus_dir, case["file"])
+    initial_state = {"input_file_path": path, "source_file": path, "output_dir": ""}
+    job_id = f"eval-{pipeline}-{uuid.uuid4().hex}"
+
+    _session = session
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stdout if verbose else output):
+        final_state, _ = run_job(graph, initial_state, job_id)
+    wall = time.perf_counter() - start
+
+    result = {
+        "pipeline": pipeline,
+        "file": case["file"],
+        "framework": case["framework"],
+        "latency_s": wall + (session.replayed_time if session is not None else 0.0),
+        "issues": len(final_state["report"].issues),
+    }
+    if session is not None:
+        result.update(session.llm_usage())
+    return result, final_state["report"].issues
+
+
+# ===== Report =====
+
+def _percentile(values: list, share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def summarize(results: list) -> list:
+    """
+    Per pipeline and framework (and "all"): latency percentiles, mean LLM calls and tokens
+    per case, precision, recall and F1 over all findings.
+    """
+
+    groups: dict[tuple, list] = {}
+    for result in results:
+        if "error" in result:
+            continue
+        groups.setdefault((result["pipeline"], result["framework"]), []).append(result)
+        groups.setdefault((result["pipeline"], "all"), []).append(result)
+
+    summary = []
+    for (pipeline, framework), rows in sorted(groups.items()):
+        tp, fp, fn = (sum(row[key] for row in rows) for key in ("tp", "fp", "fn"))
+        precision = tp / (tp + fp) if tp + fp else None
+        recall = tp / (tp + fn) if tp + fn else None
+        latencies = [row["latency_s"] for row in rows]
+        metered = [row for row in rows if "calls" in row]
+        summary.append({
+            "pipeline": pipeline,
+            "framework": framework,
+            "cases": len(rows),
+            "p50_s": _percentile(latencies, 0.5),
+            "p95_s": _percentile(latencies, 0.95),
+            "llm_calls": sum(row["calls"] for row in metered) / len(metered) if metered else None,
+            "input_tokens": sum(row["input_tokens"] for row in metered) / len(metered) if metered else None,
+            "output_tokens": sum(row["output_tokens"] for row in metered) / len(metered) if metered else None,
+            "tp": tp, "fp": fp, "fn": fn,
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall) if precision and recall else None,
+        })
+    return summary
+
+
+def _fmt(value, spec: str) -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def print_summary(summary: list) -> None:
+    print(f"\n{'pipeline':<8} {'framework':<15} {'cases':>5} {'p50 s':>7} {'p95 s':>7} {'calls':>6} "
+          f"{'in tok':>8} {'out tok':>8} {'tp':>4} {'fp':>4} {'fn':>4} {'prec':>6} {'recall':>6} {'f1':>6}")
+    for row in summary:
+        print(f"{row['pipeline']:<8} {row['framework']:<15} {row['cases']:>5} {row['p50_s']:>7.2f} {row['p95_s']:>7.2f} "
+              f"{_fmt(row['llm_calls'], '.1f'):>6} {_fmt(row['input_tokens'], '.0f'):>8} {_fmt(row['output_tokens'], '.0f'):>8} "
+              f"{row['tp']:>4} {row['fp']:>4} {row['fn']:>4} {_fmt(row['precision'], '.2f'):>6} "
+              f"{_fmt(row['recall'], '.2f'):>6} {_fmt(row['f1'], '.2f'):>6}")
+
+
+def recommend(summary: list, min_recall: float) -> dict:
+    """
+    Per framework, the cheapest pipeline (tokens, then p50 latency) with at least min_recall.
+    """
+
+    choices = {}
+    for framework in sorted({row["framework"] for row in summary} - {"all"}):
+        eligible = [row for row in summary
+                    if row["framework"] == framework and row["recall"] is not None and row["recall"] >= min_recall]
+        best = min(eligible, key=lambda row: ((row["input_tokens"] or 0) + (row["output_tokens"] or 0), row["p50_s"]), default=None)
+        choices[framework] = best["pipeline"] if best else None
+    return choices
+
+
+# ===== Main =====
+
+def main() -> None:
+    global _session
+
+    parser = argparse.ArgumentParser(description="Evaluation of the simple and ReAct pipelines on a labeled corpus")
+    parser.add_argument("--pipelines", default=",".join(PIPELINES))
+    parser.add_argument("--responses", choices=("recorded", "stub"), default="recorded")
+    parser.add_argument("--record", action="store_true", help="Run the real models and checkov and save the recordings")
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    parser.add_argument("--recordings", default=RECORDINGS_DIR)
+    parser.add_argument("--min-recall", type=float, default=None, help="Suggest the cheapest pipeline per framework reaching it")
+    parser.add_argument("--json", default=None, help="Write per case results and the summary here")
+    parser.add_argument("--verbose", action="store_true", help="Show the scans' own output")
+    args = parser.parse_args()
+
+    pipelines = [p.strip() for p in args.pipelines.split(",") if p.strip()]
+    for pipeline in pipelines:
+        if pipeline not in PIPELINES:
+            parser.error(f"Unknown pipeline {pipeline}, expected one of {', '.join(PIPELINES)}")
+
+    corpus_dir = os.path.abspath(args.corpus)
+    recordings_dir = os.path.abspath(args.recordings)
+    if args.responses == "recorded" and not args.record and not os.path.isdir(recordings_dir):
+        parser.error(f"No recordings in {recordings_dir}: record them first with --record (needs API access), "
+                     "or smoke test the harness with --responses stub")
+    json_path = os.path.abspath(args.json) if args.json else None
+    with open(os.path.join(corpus_dir, "labels.yaml"), "r", encoding="utf-8") as f:
+        labels = yaml.safe_load(f)
+    cases = labels["cases"]
+    ignore_checks = labels.get("ignore_checks", [])
+
+    if args.record:
+        from dotenv import load_dotenv
+        load_dotenv(os.path.join(REPO_DIR, ".env"))
+
+    # Scans run in a scratch directory, with no response/block caches or suppressions,
+    # so every case is scanned in full and nothing leaks into the real state files
+    workdir = tempfile.TemporaryDirectory(prefix="iac-eval-")
+    os.chdir(workdir.name)
+    os.environ["LLM_CACHE"] = "off"
+    os.environ["BLOCK_CACHE"] = "off"
+    os.environ["SUPPRESSIONS_FILE"] = os.path.join(workdir.name, "suppressions.yaml")
+    sys.path.insert(0, REPO_DIR)
+    sys.path.insert(0, BENCH_DIR)
+
+    if args.responses == "stub" and not args.record:
+        from stub_scan import install_stubs
+        install_stubs()
+    else:
+        install_backends(record=args.record)
+
+    results = []
+    for pipeline in pipelines:
+        graph = build_graph(pipeline)
+        for case in cases:
+            path = recording_path(recordings_dir, pipeline, case)
+            session = None
+            if args.record:
+                session = Session(recording=True)
+            elif args.responses == "recorded":
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        recording = json.load(f)
+                except FileNotFoundError:
+                    print(f"{pipeline} {case['file']}: no recording, run with --record first")
+                    results.append({"pipeline": pipeline, "file": case["file"], "framework": case["framework"], "error": "no recording"})
+                    continue
+                if recording.get("file_sha256") != file_hash(os.path.join(corpus_dir, case["file"])):
+                    print(f"{pipeline} {case['file']}: file changed since it was recorded, results may not match")
+                session = Session(recording["calls"])
+
+            try:
+                result, issues = run_case(graph, pipeline, case, corpus_dir, session, args.verbose)
+            except Exception as e:
+                print(f"{pipeline} {case['file']}: failed: {e}")
+                results.append({"pipeline": pipeline, "file": case["file"], "framework": case["framework"], "error": str(e)})
+                continue
+            finally:
+                _session = None
+
+            result.update(score_case(issues, case, ignore_checks))
+            results.append(result)
+            print(f"{pipeline} {case['file']}: {result['issues']} issues, tp {result['tp']} fp {result['fp']} "
+                  f"fn {result['fn']}, {result['latency_s']:.2f}s")
+
+            if args.record:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump({
+                        "pipeline": pipeline,
+                        "file": case["file"],
+                        "file_sha256": file_hash(os.path.join(corpus_dir, case["file"])),
+                        "recorded_at": datetime.now().isoformat(),
+                        "calls": session.calls,
+                    }, f, indent=1, default=str)
+
+    summary = summarize(results)
+    print_summary(summary)
+
+    failed = [result for result in results if "error" in result]
+    if failed:
+        print(f"\n{len(failed)} of {len(results)} cases did not run")
+
+    choices = None
+    if args.min_recall is not None:
+        choices = recommend(summary, args.min_recall)
+        print(f"\nCheapest pipeline with recall >= {args.min_recall:g}:")
+        for framework, pipeline in choices.items():
+            print(f"  {framework}: {pipeline or 'none reaches it'}")
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "summary": summary, "recommendation": choices}, f, indent=2)
+        print(f"\nResults written to {json_path}")
+
+    os.chdir(REPO_DIR)
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# MEASURES IMPORT / STARTUP TIME OF THE CLI ENTRY POINTS
+# Usage: python benchmarks/import_time.py [runs]
+
+import subprocess
+import statistics
+import sys
+import time
+import os
+
+# Run from the repo root so the flat modules are importable
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules imported on the way to a scan
+MODULES = [
+    "templates",
+    "tools",
+    "graph_functions",
+    "llm_cache",
+    "llm_scheduler",
+    "checkpoints",
+    "llms",
+    "langgraph.graph",
+    "langgraph.prebuilt",
+    "langchain_google_genai",
+    "langchain_ollama",
+]
+
+# Entry points run with no arguments (argument check only, the fast-start path)
+SCRIPTS = [
+    "report_generator_react.py",
+    "report_generator_simple.py",
+]
+
+# Number of slowest imports listed for each module
+TOP_IMPORTS = 5
+
+
+def time_command(args: list, runs: int) -> float:
+    """
+    Median wall time of a fresh python process, in milliseconds.
+    """
+
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=REPO_DIR, capture_output=True, check=False)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def slowest_imports(module: str) -> list:
+    """
+    Top cumulative import times (ms) reported by python -X importtime.
+    """
+
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR, capture_output=True, text=True, check=False
+    )
+
+    entries = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        entries.append((int(cumulative) / 1000, name))
+
+    return sorted(entries, reverse=True)[:TOP_IMPORTS]
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    baseline = time_command(["-c", "pass"], runs)
+
+    print(f"Interpreter startup: {baseline:.0f} ms\n")
+
+    print("Entry points (no arguments):")
+    for script in SCRIPTS:
+        print(f"  {script:<32} {time_command([script], runs) - baseline:>8.0f} ms")
+
+    print("\nModule import time:")
+    for module in MODULES:
+        elapsed = time_command(["-c", f"import {module}"], runs) - baseline
+        print(f"  {module:<32} {elapsed:>8.0f} ms")
+        for cumulative, name in slowest_imports(module)[1:]:
+            print(f"      {name:<40} {cumulative:>8.0f} ms")
@@ -0,0 +1,316 @@
+# HTTP LOAD TEST OF THE SCAN SERVICE
+# Starts the real API (main.py) and scan workers against stubbed LLM and checkov backends
+# (stub_scan.py), drives /scan/ at increasing concurrency and reports latency percentiles,
+# throughput, error rate, queue depth and memory per concurrency level.
+# Use it to size worker pools before a rollout.
+#
+# Usage:
+#   python benchmarks/load_test.py [--concurrency 1,8,32,128] [--requests 200]
+#       [--workers 2] [--worker-slots 8] [--api-workers 1]
+#       [--llm-latency 0.5] [--checkov-latency 1.0] [--sizes 2:0.6,50:0.3,500:0.1]
+#       [--pipeline react|simple] [--llm-rpm 0] [--json results.json]
+
+from typing import Optional
+import subprocess
+import argparse
+import tempfile
+import asyncio
+import sqlite3
+import socket
+import random
+import httpx
+import json
+import time
+import sys
+import os
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# Seconds between queue depth / memory samples
+SAMPLE_INTERVAL = 0.5
+
+
+# ===== Input Files =====
+
+def make_template(size_kb: int) -> bytes:
+    """
+    Synthetic Terraform file of roughly size_kb kilobytes.
+    """
+
+    blocks = []
+    size = 0
+    i = 0
+    while size < size_kb * 1024:
+        block = f'resource "aws_s3_bucket" "b{i}" {{\n  bucket = "bucket-{i}"\n  acl    = "public-read"\n}}\n\n'
+        blocks.append(block)
+        size += len(block)
+        i += 1
+    return "".join(blocks).encode("utf-8")
+
+
+def parse_sizes(spec: str) -> list:
+    """
+    "2:0.6,50:0.3" -> [(2, 0.6), (50, 0.3)], file size in KB and share of requests.
+    """
+
+    sizes = []
+    for part in spec.split(","):
+        size_kb, weight = part.split(":")
+        sizes.append((int(size_kb), float(weight)))
+    return sizes
+
+
+# ===== Service Processes =====
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def tree_rss_mb(pid: int) -> float:
+    """
+    Resident memory of a process and all its descendants, from /proc (Linux).
+    """
+
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+            # Children are listed per thread, workers start scans from pool threads
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children", "r") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total / 1024
+
+
+def start_service(args, work_dir: str, port: int) -> tuple:
+    """
+    Starts the API and the scan workers in work_dir, with every shared database in there too.
+    """
+
+    env = {
+        **os.environ,
+        "PYTHONPATH": REPO_DIR,
+        "JOB_QUEUE_DB": os.path.join(work_dir, "jobs.sqlite"),
+        "ARTIFACT_DB": os.path.join(work_dir, "artifacts.sqlite"),
+        "CHECKPOINT_DB": os.path.join(work_dir, "checkpoints.sqlite"),
+        "LLM_SCHEDULER_DB": os.path.join(work_dir, "llm_scheduler.sqlite"),
+        "LLM_CACHE": "off",
+        "SCRIPT_PATH": os.path.join(BENCH_DIR, "stub_scan.py"),
+        "STUB_PIPELINE": args.pipeline,
+        "STUB_LLM_LATENCY": str(args.llm_latency),
+        "STUB_CHECKOV_LATENCY": str(args.checkov_latency),
+        # Unlimited unless a real quota is given, so the stubs measure the service itself
+        "LLM_RPM": str(args.llm_rpm or 10 ** 9),
+        "LLM_TPM": str(args.llm_tpm or 10 ** 12),
+        "LLM_MAX_CONCURRENCY": str(args.worker_slots * args.workers),
+    }
+    log = open(os.path.join(work_dir, "service.log"), "w")
+
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(args.api_workers),
+         "--log-level", "warning"],
+        cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    workers = [
+        subprocess.Popen(
+            [sys.executable, os.path.join(REPO_DIR, "scan_worker.py"),
+             "--concurrency", str(args.worker_slots), "--pipeline", args.pipeline],
+            cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        for _ in range(args.workers)
+    ]
+    return api, workers
+
+
+def wait_ready(base_url: str, api: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if api.poll() is not None:
+            raise RuntimeError("API process exited, see service.log")
+        try:
+            httpx.get(base_url + "/docs", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("API did not come up in time")
+
+
+# ===== Load Generation =====
+
+def percentile(values: list, p: float) -> float:
+    """
+    Nearest-rank percentile, 0 for an empty list.
+    """
+
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(p / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+async def sample(queue_db: str, api: subprocess.Popen, workers: list, stats: dict, stop: asyncio.Event) -> None:
+    """
+    Samples queue depth and service memory until stop is set.
+    """
+
+    conn = sqlite3.connect(queue_db, timeout=30)
+    while not stop.is_set():
+        try:
+            queued, running = conn.execute(
+                "SELECT COALESCE(SUM(status = 'queued'), 0), COALESCE(SUM(status = 'running'), 0) FROM jobs"
+            ).fetchone()
+        except sqlite3.OperationalError:
+            queued = running = 0  # Table not created yet
+
+        stats["max_queued"] = max(stats["max_queued"], queued)
+        stats["max_running"] = max(stats["max_running"], running)
+        stats["api_rss_mb"] = max(stats["api_rss_mb"], tree_rss_mb(api.pid))
+        stats["workers_rss_mb"] = max(stats["workers_rss_mb"], sum(tree_rss_mb(w.pid) for w in workers))
+
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=SAMPLE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+    conn.close()
+
+
+async def run_level(base_url: str, concurrency: int, requests: int, files: list, weights: list,
+                    queue_db: str, api: subprocess.Popen, workers: list) -> dict:
+    """
+    Sends requests uploads with at most concurrency in flight, returns the level's statistics.
+    """
+
+    latencies = []
+    statuses: dict[str, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"max_queued": 0, "max_running": 0, "api_rss_mb": 0.0, "workers_rss_mb": 0.0}
+    stop = asyncio.Event()
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+
+        async def one_request() -> None:
+            name, content = random.choices(files, weights=weights)[0]
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/scan/", files={"file": (name, content)})
+                    status = str(response.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                elapsed = time.perf_counter() - start
+
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == "200":
+                latencies.append(elapsed)
+
+        sampler = asyncio.create_task(sample(queue_db, api, workers, stats, stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(requests)))
+        duration = time.perf_counter() - start
+        stop.set()
+        await sampler
+
+    ok = statuses.get("200", 0)
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": ok,
+        "error_rate": 1 - ok / requests,
+        "statuses": statuses,
+        "throughput_rps": ok / duration,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "max_s": max(latencies, default=0.0),
+        **stats,
+    }
+
+
+def print_report(results: list) -> None:
+    header = f"{'conc':>5} {'reqs':>5} {'err%':>6} {'rps':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} " \
+             f"{'max queued':>10} {'api MB':>7} {'workers MB':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['concurrency']:>5} {r['requests']:>5} {r['error_rate'] * 100:>6.1f} {r['throughput_rps']:>7.2f} "
+              f"{r['p50_s']:>7.2f} {r['p95_s']:>7.2f} {r['p99_s']:>7.2f} "
+              f"{r['max_queued']:>10} {r['api_rss_mb']:>7.0f} {r['workers_rss_mb']:>10.0f}")
+        errors = {status: n for status, n in r["statuses"].items() if status != "200"}
+        if errors:
+            print(f"{'':>5} errors: {errors}")
+
+
+# ===== CLI =====
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load test the scan API with stubbed LLM and checkov backends.")
+    parser.add_argument("--concurrency", default="1,8,32,128", help="Comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--workers", type=int, default=2, help="Scan worker processes")
+    parser.add_argument("--worker-slots", type=int, default=8, help="Concurrent scans per worker")
+    parser.add_argument("--api-workers", type=int, default=1, help="API processes (uvicorn --workers)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per stubbed LLM call")
+    parser.add_argument("--checkov-latency", type=float, default=1.0, help="Seconds per stubbed checkov run")
+    parser.add_argument("--sizes", default="2:0.6,50:0.3,500:0.1", help="File size mix, KB:share,...")
+    parser.add_argument("--pipeline", choices=["react", "simple"], default="react")
+    parser.add_argument("--llm-rpm", type=float, default=0, help="Apply a real LLM requests/min quota (0: none)")
+    parser.add_argument("--llm-tpm", type=float, default=0, help="Apply a real LLM tokens/min quota (0: none)")
+    parser.add_argument("--json", default="", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    sizes = parse_sizes(args.sizes)
+    files = [(f"load_{size_kb}kb.tf", make_template(size_kb)) for size_kb, _ in sizes]
+    weights = [weight for _, weight in sizes]
+
+    with tempfile.TemporaryDirectory(prefix="scan_load_") as work_dir:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        api, workers = start_service(args, work_dir, port)
+
+        try:
+            wait_ready(base_url, api)
+            print(f"Service up: {args.api_workers} API process(es), {args.workers} worker(s) x "
+                  f"{args.worker_slots} slot(s), {args.pipeline} pipeline, sizes {args.sizes}\n")
+
+            results = []
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                result = asyncio.run(run_level(
+                    base_url, concurrency, args.requests, files, weights,
+                    os.path.join(work_dir, "jobs.sqlite"), api, workers
+                ))
+                results.append(result)
+                print(f"concurrency {concurrency}: {result['throughput_rps']:.2f} req/s, "
+                      f"p95 {result['p95_s']:.2f}s, errors {result['error_rate'] * 100:.1f}%")
+
+        finally:
+            for process in [api, *workers]:
+                process.terminate()
+            for process in [api, *workers]:
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    print()
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# MEASURES LINE INDEX BUILD AND SNIPPET EXTRACTION TIME
+# Usage: python benchmarks/snippets.py [lines] [findings]
+
+import tempfile
+import random
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from line_index import get_line_index, attach_snippets
+from templates import SecurityIssue
+
+
+def make_template(path: str, lines: int) -> None:
+    """
+    Writes a synthetic Terraform file with the given number of lines.
+    """
+
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(lines // 5):
+            f.write(f'resource "aws_s3_bucket" "b{i}" {{\n  bucket = "bucket-{i}"\n  acl    = "public-read"\n}}\n\n')
+
+
+if __name__ == "__main__":
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    findings = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "main.tf")
+        make_template(path, lines)
+
+        issues = []
+        for _ in range(findings):
+            start = random.randint(1, lines - 5)
+            issues.append(SecurityIssue(
+                name="Public S3 Bucket", severity="High", location=[start, start + 4],
+                confidence_score="High", problems=[], remedies=[]
+            ))
+
+        start = time.perf_counter()
+        index = get_line_index(path)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        attach_snippets(issues, path)
+        snippet_ms = (time.perf_counter() - start) * 1000
+
+        print(f"Lines: {index.line_count}, findings: {findings}")
+        print(f"Index build:        {build_ms:8.1f} ms")
+        print(f"Snippet extraction: {snippet_ms:8.1f} ms ({snippet_ms * 1000 / findings:.1f} us/finding)")
+        index.close()
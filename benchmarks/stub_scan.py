@@ -0,0 +1,122 @@
+# SCAN SCRIPT WITH STUBBED LLM AND CHECKOV BACKENDS, FOR LOAD TESTS
+# Runs the real scan graph, checkpointing and artifact handling, with the LLM and
+# checkov calls replaced by sleeps of configurable latency. Used by load_test.py
+# through SCRIPT_PATH, takes the same arguments as the real scan scripts.
+#
+# Settings (env):
+#   STUB_PIPELINE         react (default) or simple
+#   STUB_LLM_LATENCY      seconds per LLM call (default 0.5)
+#   STUB_CHECKOV_LATENCY  seconds per checkov run (default 1.0)
+#   STUB_JITTER           +/- fraction applied to every latency (default 0.2)
+
+import random
+import json
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PIPELINE = os.getenv("STUB_PIPELINE", "react")
+LLM_LATENCY = float(os.getenv("STUB_LLM_LATENCY", "0.5"))
+CHECKOV_LATENCY = float(os.getenv("STUB_CHECKOV_LATENCY", "1.0"))
+JITTER = float(os.getenv("STUB_JITTER", "0.2"))
+
+
+def stub_sleep(seconds: float) -> None:
+    time.sleep(max(0.0, seconds * random.uniform(1 - JITTER, 1 + JITTER)))
+
+
+def count_lines(messages) -> int:
+    """
+    Line count of the template in the first human message, used to size the fake findings.
+    """
+
+    text = messages if isinstance(messages, str) else str(messages)
+    return max(1, text.count("\\n") + text.count("\n"))
+
+
+def build_stub_llms():
+    """
+    Reasoning LLM that asks for one checkov run and then stops, and a writer
+    LLM that streams a few findings as JSON. Both sleep STUB_LLM_LATENCY per call.
+    Wrapped in the model router like the real ones, every tier gets the same stub.
+    """
+
+    from langchain_core.messages import AIMessage, ToolMessage
+    from langchain_core.runnables import RunnableLambda
+    from templates import AIReport, SecurityIssue
+    from stream_writer import StreamingIssueWriter
+    from model_router import ModelRouter
+
+    def reason(messages):
+        stub_sleep(LLM_LATENCY)
+        if any(isinstance(m, ToolMessage) for m in messages):
+            return AIMessage(content="Checkov results reviewed, writing the report.")
+        return AIMessage(content="", tool_calls=[{
+            "name": "checkov_tool",
+            "args": {"input_file_path": "stub", "output_dir": "stub", "output_file_name": "stub"},
+            "id": f"call_{random.getrandbits(32):x}",
+        }])
+
+    def write(data):
+        stub_sleep(LLM_LATENCY)
+        lines = count_lines(data)
+        issues = []
+        for i in range(min(5, lines // 10 + 1)):
+            start = 1 + i * 5
+            issues.append(SecurityIssue(
+                name="Public S3 Bucket", severity="High", location=[start, start + 4],
+                confidence_score="High", problems=["Bucket is publicly readable"],
+                remedies=["Set acl to private"], check_id="CKV_AWS_20", resource=f"aws_s3_bucket.b{i}"
+            ))
+
+        text = AIReport(issues=issues).model_dump_json(exclude={"issues": {"__all__": {"snippet", "fingerprint"}}})
+        for start in range(0, len(text), 64):
+            yield text[start:start + 64]
+
+    return (
+        ModelRouter("thinker", lambda tier, backend, model: RunnableLambda(reason)),
+        ModelRouter("writer", lambda tier, backend, model: StreamingIssueWriter(RunnableLambda(write))),
+    )
+
+
+def install_stubs() -> None:
+    """
+    Swaps the LLM builders and checkov tool of the scan scripts for the stubs.
+    """
+
+    from langchain_core.tools import tool
+    import report_generator_react
+    import report_generator_simple
+    import tools
+
+    @tool
+    def checkov_tool(input_file_path: str, output_dir: str, output_file_name: str) -> str:
+        """
+        Stubbed Checkov scan, returns one failed check after STUB_CHECKOV_LATENCY.
+        """
+
+        stub_sleep(CHECKOV_LATENCY)
+        return json.dumps([{
+            "check_id": "CKV_AWS_20",
+            "check_name": "S3 Bucket has an ACL defined which allows public READ access.",
+            "file_line_range": [1, 4],
+            "resource": "aws_s3_bucket.b0",
+            "guideline": "https://docs.prismacloud.io/",
+        }])
+
+    tools.checkov_tool = checkov_tool
+    report_generator_react.build_llms = build_stub_llms
+    report_generator_simple.build_llm = lambda: build_stub_llms()[1]
+
+
+if __name__ == "__main__":
+    install_stubs()
+
+    if PIPELINE == "simple":
+        from report_generator_simple import main
+    else:
+        from report_generator_react import main
+
+    main(sys.argv)
@@ -0,0 +1,97 @@
+from abc import ABC, abstractmethod
+import hashlib
+import shutil
+import os
+
+# ===== Blob Store =====
+
+# Large scan payloads (template, tool outputs) are referenced from graph state as BLOB_PREFIX + sha256
+BLOB_PREFIX = "blob:sha256:"
+BLOB_DIR_NAME = "blobs"
+
+# "file": under the scan's output directory (one host). For several hosts, "package.module:factory"
+# of a shared BlobStore implementation, called with the scan's output_dir (see backends.py).
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "file")
+
+
+class BlobStore(ABC):
+    """
+    Content-addressed store for the large payloads of one scan.
+
+    Graph state only holds short references, so the template and tool outputs exist once
+    instead of several times in every state copy and checkpoint. Nodes load a payload when
+    they actually send it somewhere. Identical payloads are stored once.
+    """
+
+    @abstractmethod
+    def put(self, text: str) -> str:
+        """
+        Stores text and returns its reference.
+        """
+
+    @abstractmethod
+    def get(self, ref: str) -> str:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Deletes every blob of the scan, once it finished and can no longer be resumed.
+        """
+
+    def resolve(self, value) -> str:
+        """
+        Content of a reference, anything else is returned as it is (inline values, older checkpoints).
+        """
+
+        if is_blob_ref(value):
+            return self.get(value)
+        return value
+
+
+class FileBlobStore(BlobStore):
+    """
+    Blobs as files named by their sha256 under root.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def put(self, text: str) -> str:
+
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.root, digest)
+
+        if not os.path.exists(path):
+            os.makedirs(self.root, exist_ok=True)
+            # Write then rename, a crashed scan never leaves a partial blob behind
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        return BLOB_PREFIX + digest
+
+    def get(self, ref: str) -> str:
+        with open(os.path.join(self.root, ref.removeprefix(BLOB_PREFIX)), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def is_blob_ref(value) -> bool:
+    return isinstance(value, str) and value.startswith(BLOB_PREFIX) and len(value) == len(BLOB_PREFIX) + 64
+
+
+def get_blob_store(output_dir: str) -> BlobStore:
+    """
+    Blob store of the scan writing to output_dir. It survives a crash so a resumed scan can
+    still read its blobs, and is cleared once the scan finished (checkpoints.run_job).
+    """
+
+    if BLOB_STORE_BACKEND != "file":
+        from backends import load_backend
+        return load_backend(BLOB_STORE_BACKEND)(output_dir)
+    return FileBlobStore(os.path.join(output_dir, BLOB_DIR_NAME))
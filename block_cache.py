@@ -0,0 +1,145 @@
+from typing import Optional
+import threading
+import bisect
+import hashlib
+import sqlite3
+import json
+import time
+import os
+
+from templates import SecurityIssue
+
+# ===== Block Cache Settings =====
+
+# "on" or "off"
+BLOCK_CACHE = os.getenv("BLOCK_CACHE", "on")
+BLOCK_CACHE_DB = os.getenv("BLOCK_CACHE_DB", "block_cache.sqlite")
+BLOCK_CACHE_TTL = int(os.getenv("BLOCK_CACHE_TTL", str(7 * 24 * 3600)))    # seconds
+
+
+def prompt_key(prompt_template) -> str:
+    """
+    Identifies a prompt, cached issues of another prompt version are not reused.
+    """
+
+    return hashlib.sha256(prompt_template.pretty_repr().encode("utf-8")).hexdigest()[:16]
+
+
+def block_hash(framework: str, lines: list, prompt_key: str, model_id: str) -> str:
+    """
+    Hash of one block's code, line for line as in the file (cached issue offsets count its
+    lines), so only moving the block keeps the hash. prompt_key and model_id identify the
+    prompt and writer model the issues were generated with.
+    """
+
+    code = "\n".join(lines)
+    return hashlib.sha256(f"{prompt_key}\n{model_id}\n{framework}\n{code}".encode("utf-8")).hexdigest()
+
+
+# ===== Block Issue Cache =====
+
+class BlockIssueCache:
+    """
+    LLM issues of single resource blocks, by block hash.
+
+    Issue locations are stored relative to the block's first line, so a block that moved
+    in the file gets its cached issues back at its current line numbers.
+    """
+
+    def __init__(self, db_path: str = BLOCK_CACHE_DB, ttl_seconds: int = BLOCK_CACHE_TTL):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS block_issues (
+                hash TEXT PRIMARY KEY,
+                issues TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )""")
+        self._conn.execute("DELETE FROM block_issues WHERE created_at < ?", (time.time() - ttl_seconds,))
+        self._conn.commit()
+
+    def get(self, key: str, start: int) -> Optional[list]:
+        """
+        Cached issues of a block starting at line start, None on a miss.
+        """
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT issues, created_at FROM block_issues WHERE hash = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time() - self.ttl_seconds:
+            return None
+
+        issues = []
+        for data in json.loads(row[0]):
+            issue = SecurityIssue.model_validate(data)
+            issue.location = [start + offset for offset in issue.location]
+            issues.append(issue)
+        return issues
+
+    def put_blocks(self, blocks: list, issues: list) -> None:
+        """
+        Caches the issues of every analyzed block, blocks is a list of (key, start, end).
+        An issue is stored under every block its line range overlaps, so a block an issue
+        spans into is never cached as clean. Blocks without issues are cached as clean, unless
+        some issue overlaps no block (loose code, or lines the model got wrong): it may be a
+        block's, so only blocks with issues are cached then.
+        """
+
+        blocks = sorted(blocks, key=lambda block: block[1])
+        starts = [start for _, start, _ in blocks]
+        grouped: list = [[] for _ in blocks]
+        unassigned = 0
+        for issue in issues:
+            assigned = False
+            if issue.location:
+                low, high = min(issue.location), max(issue.location)
+                # Blocks do not overlap, walk back from the last one starting before the issue ends
+                i = bisect.bisect_right(starts, high) - 1
+                while i >= 0 and blocks[i][2] >= low:
+                    grouped[i].append(issue)
+                    assigned = True
+                    i -= 1
+            if not assigned:
+                unassigned += 1
+
+        if unassigned:
+            print(f"{unassigned} issues outside the analyzed blocks, clean blocks not cached")
+
+        rows = []
+        now = time.time()
+        for (key, start, _), block_issues in zip(blocks, grouped):
+            if unassigned and not block_issues:
+                continue
+            data = []
+            for issue in block_issues:
+                relative = issue.model_dump(exclude={"snippet", "fingerprint"})
+                relative["location"] = [line - start for line in issue.location]
+                data.append(relative)
+            rows.append((key, json.dumps(data), now))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO block_issues (hash, issues, created_at) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+
+_cache: Optional[BlockIssueCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_block_cache() -> Optional[BlockIssueCache]:
+    """
+    Shared block cache, None if BLOCK_CACHE is off.
+    """
+
+    global _cache
+    if BLOCK_CACHE != "on":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = BlockIssueCache()
+        return _cache
@@ -0,0 +1,224 @@
+# BULK OFFLINE SCANNING OF MANY IAC FILES
+# Runs scans across a pool of worker processes sharing one rate-limited LLM quota.
+# Finished files are recorded in a results manifest, so a rerun skips them.
+#
+# Usage:
+#   python bulk_scan.py "infra/**/*.tf" "k8s/**/*.yaml" [--workers N] [--pipeline react|simple]
+#   python bulk_scan.py --manifest files.txt [--results bulk_results.jsonl]
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import contextlib
+import argparse
+import hashlib
+import glob
+import json
+import time
+import sys
+import io
+import os
+
+# ===== Bulk Scan Settings =====
+
+DEFAULT_RESULTS = "bulk_results.jsonl"
+DEFAULT_WORKERS = os.cpu_count() or 4
+
+# Built once per worker process by init_worker
+_graph = None
+_pipeline = None
+
+
+# ===== Manifest =====
+
+def collect_files(patterns: list, manifest: str = "") -> list:
+    """
+    Expands glob patterns and/or reads a manifest (one path per line) into a sorted file list.
+    Manifest paths are kept even if missing, run_bulk records those as failed.
+    """
+
+    files = set()
+    for pattern in patterns:
+        files.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+
+    if manifest:
+        with open(manifest, "r", encoding="utf-8") as f:
+            files.update(line.strip() for line in f if line.strip() and not line.startswith("#"))
+
+    return sorted(files)
+
+
+def file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_finished(results_path: str) -> set:
+    """
+    (path, content hash) of every file already scanned successfully.
+    An edited file has a new hash and is scanned again.
+    """
+
+    finished = set()
+    if not os.path.exists(results_path):
+        return finished
+
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partially written last line of an interrupted run
+            if record.get("status") == "done":
+                finished.add((record["file"], record["sha256"]))
+
+    return finished
+
+
+# ===== Worker =====
+
+def init_worker(pipeline: str) -> None:
+    """
+    Builds the graph and LLM clients once per worker process.
+    """
+
+    global _graph, _pipeline
+    _pipeline = pipeline
+
+    if pipeline == "simple":
+        from report_generator_simple import build_workflow
+        _graph = build_workflow()
+    else:
+        from report_generator_react import build_agent
+        _graph = build_agent()
+
+
+def scan_file(path: str, sha256: str) -> dict:
+    """
+    Scans one file in a worker. The job id is derived from path and content,
+    so a scan interrupted mid-graph resumes from its checkpoint on the next run.
+    """
+
+    from checkpoints import run_job
+
+    job_id = "bulk-" + hashlib.sha256(f"{path}\n{sha256}".encode("utf-8")).hexdigest()[:32]
+    start = time.perf_counter()
+    log = io.StringIO()
+
+    try:
+        # The pipelines print the whole report, keep worker output out of the progress display
+        with contextlib.redirect_stdout(log):
+            # Own output directory per job, files with the same name never share one
+            initial_state = {"input_file_path": path, "output_dir": f"./outputs/{job_id}/"}
+            final_state, _ = run_job(_graph, initial_state, job_id)
+
+        report = final_state["report"]
+        name = final_state["output_file_name"] if _pipeline == "react" else report.name
+        return {
+            "file": path,
+            "sha256": sha256,
+            "status": "done",
+            "job_id": job_id,
+            "report_path": final_state["output_dir"] + name + ".json",
+            "summary": report.summary,
+            "seconds": round(time.perf_counter() - start, 2),
+        }
+
+    except Exception as e:
+        return {
+            "file": path,
+            "sha256": sha256,
+            "status": "failed",
+            "job_id": job_id,
+            "error": f"{type(e).__name__}: {e}",
+            "seconds": round(time.perf_counter() - start, 2),
+        }
+
+
+# ===== Bulk Run =====
+
+def run_bulk(files: list, results_path: str, workers: int, pipeline: str) -> None:
+
+    finished = load_finished(results_path)
+    pending = []
+    unreadable = []
+    for path in files:
+        try:
+            sha256 = file_hash(path)
+        except OSError as e:
+            # A stale manifest line fails that file only, not the whole run
+            unreadable.append({"file": path, "sha256": None, "status": "failed",
+                               "error": f"{type(e).__name__}: {e}", "seconds": 0})
+            continue
+        if (path, sha256) not in finished:
+            pending.append((path, sha256))
+
+    print(f"{len(files)} files, {len(files) - len(pending) - len(unreadable)} already scanned, "
+          f"{len(unreadable)} unreadable, {len(pending)} to scan with {workers} workers")
+
+    with open(results_path, "a", encoding="utf-8") as results:
+        for record in unreadable:
+            print(f"failed {record['file']}: {record['error']}")
+            results.write(json.dumps(record) + "\n")
+    if not pending:
+        return
+
+    start = time.perf_counter()
+    done = failed = 0
+
+    with open(results_path, "a", encoding="utf-8") as results, \
+            ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(pipeline,)) as pool:
+
+        futures = {pool.submit(scan_file, path, sha256): (path, sha256) for path, sha256 in pending}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:
+                # A crashed worker (e.g. BrokenProcessPool) fails its files, the run goes on
+                path, sha256 = futures[future]
+                record = {"file": path, "sha256": sha256, "status": "failed",
+                          "error": f"{type(e).__name__}: {e}", "seconds": 0}
+            results.write(json.dumps(record) + "\n")
+            results.flush()
+
+            if record["status"] == "done":
+                done += 1
+            else:
+                failed += 1
+
+            # Progress & throughput
+            completed = done + failed
+            elapsed = time.perf_counter() - start
+            rate = completed / elapsed * 60
+            eta = (len(pending) - completed) / (completed / elapsed)
+            print(f"[{completed}/{len(pending)}] {record['status']:<6} {record['file']} ({record['seconds']}s) "
+                  f"| {rate:.1f} files/min, ETA {eta:.0f}s")
+
+    print(f"\nFinished in {time.perf_counter() - start:.0f}s: {done} done, {failed} failed. Results in {results_path}")
+
+
+def main(argv: list) -> None:
+
+    parser = argparse.ArgumentParser(description="Scan many IaC files in parallel")
+    parser.add_argument("patterns", nargs="*", help="Glob patterns of files to scan (** is recursive)")
+    parser.add_argument("--manifest", default="", help="File listing one path per line")
+    parser.add_argument("--results", default=DEFAULT_RESULTS, help="Resumable results manifest (JSON lines)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of worker processes")
+    parser.add_argument("--pipeline", choices=["react", "simple"], default="react")
+    args = parser.parse_args(argv[1:])
+
+    files = collect_files(args.patterns, args.manifest)
+    if not files:
+        parser.error("no files matched")
+
+    # Settings for the workers: bulk scans yield to interactive API scans,
+    # and every worker draws from one shared LLM quota
+    os.environ.setdefault("SCAN_PRIORITY", "batch")
+    os.environ.setdefault("LLM_SCHEDULER_DB", "llm_scheduler.sqlite")
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    run_bulk(files, args.results, args.workers, args.pipeline)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,87 @@
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+import sqlite3
+import os
+
+from artifact_store import sweep_outputs
+from blob_store import get_blob_store
+from job_queue import input_hash
+
+# ===== Checkpointing =====
+
+# "sqlite": one SQLite file shared by the scans of one host. For several hosts,
+# "package.module:factory" returning a shared LangGraph BaseCheckpointSaver (see backends.py).
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite")
+# Location of the durable checkpoint database shared by all scans
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "checkpoints.sqlite")
+
+# Report models stored in graph state that may be restored from a checkpoint
+CHECKPOINT_TYPES = [
+    ("templates", "SecurityIssue"),
+    ("templates", "SecurityReport"),
+    ("templates", "AIReport"),
+]
+
+
+def get_checkpointer(db_path: str = CHECKPOINT_DB) -> BaseCheckpointSaver:
+    """
+    Creates the LangGraph checkpointer (CHECKPOINT_BACKEND, SQLite by default).
+    Every completed node is persisted, so a crashed or timed out scan can be resumed.
+    """
+
+    if CHECKPOINT_BACKEND != "sqlite":
+        from backends import load_backend
+        return load_backend(CHECKPOINT_BACKEND)()
+
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+
+    # WAL + busy timeout, several scan processes may write to the same database
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return SqliteSaver(conn, serde=JsonPlusSerializer(allowed_msgpack_modules=CHECKPOINT_TYPES))
+
+
+def run_job(graph, initial_state: dict, job_id: str) -> tuple[dict, bool]:
+    """
+    Runs a compiled graph as a checkpointed job keyed by job_id and bound to its input.
+
+    1. New job, or a job_id reused for another input: starts the graph from initial_state.
+    2. Interrupted job: resumes from the last completed node (no node is re-run).
+    3. Finished job (threads of older versions): returns the stored final state without running anything.
+
+    The thread and the scan's blobs are deleted once the job finished, the results live in
+    the outputs and the artifact store. Stale output directories of earlier scans (CLI, bulk,
+    failed jobs) are swept then too. Returns the final state and whether the job had already finished before this call.
+    """
+
+    with open(initial_state["input_file_path"], "rb") as f:
+        digest = input_hash(f.read(), initial_state.get("source_file") or initial_state["input_file_path"])
+    initial_state = {**initial_state, "input_hash": digest}
+
+    config = {"configurable": {"thread_id": job_id}}
+    snapshot = graph.get_state(config)
+
+    if snapshot.values and snapshot.values.get("input_hash") != digest:
+        # Checkpoints of another file (or of a version that did not record the input), never resume from them
+        print(f"Job {job_id} was checkpointed for another input, starting over")
+        graph.checkpointer.delete_thread(job_id)
+        snapshot = graph.get_state(config)
+
+    if snapshot.next:
+        print(f"Resuming job {job_id} at: {', '.join(snapshot.next)}")
+        final_state, already_done = graph.invoke(None, config), False
+    elif snapshot.values:
+        print(f"Job {job_id} already completed, reusing stored results")
+        final_state, already_done = snapshot.values, True
+    else:
+        final_state, already_done = graph.invoke(initial_state, config), False
+
+    graph.checkpointer.delete_thread(job_id)
+    if final_state.get("output_dir"):
+        get_blob_store(final_state["output_dir"]).clear()
+    sweep_outputs()
+    return final_state, already_done
@@ -0,0 +1,15 @@
+import os
+
+# ===== Per-Stage Deadlines (seconds) =====
+
+# One thinker (reasoning LLM) call, including the wait for a rate-limit slot
+THINKER_TIMEOUT = float(os.getenv("THINKER_TIMEOUT", "60"))
+# One tool run (checkov)
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "120"))
+# The writer / report LLM call, including the wait for a rate-limit slot
+WRITER_TIMEOUT = float(os.getenv("WRITER_TIMEOUT", "120"))
+# Whole scan as seen by the API (the scan process is killed after this)
+SCAN_TIMEOUT = float(os.getenv("SCAN_TIMEOUT", "300"))
+
+# Thinker turns before the ReAct loop is forced to write the report
+MAX_REACT_ITERATIONS = int(os.getenv("MAX_REACT_ITERATIONS", "6"))
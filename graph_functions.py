@@ -1,15 +1,34 @@
-from langgraph.graph import END
-from langchain_core.messages import ToolMessage
-from langchain.messages import SystemMessage, HumanMessage
+from langchain_core.messages import ToolMessage, AIMessage, SystemMessage, HumanMessage
 from typing import Literal
 
-from templates import ReActGraphState, SecurityReport
-from prompts import react_thinker_prompt_human, react_thinker_prompt_system, react_writer_prompt
+from templates import ReActGraphState, SecurityReport, AIReport
+from prompts import react_thinker_prompt_human, react_thinker_prompt_human_compact, react_thinker_prompt_system, react_writer_prompt
+from llm_scheduler import get_scheduler
+from deadlines import THINKER_TIMEOUT, WRITER_TIMEOUT, MAX_REACT_ITERATIONS
+from line_index import get_line_index, attach_snippets
+from iac_parser import parse_template
+from rules import evaluate_rules, mask_covered_blocks, mask_blocks, is_covered
+from report_diff import fingerprint_issues, save_diff
+from blob_store import get_blob_store
+from model_router import complexity, choose_tier
+from suppressions import get_suppressions, filter_findings, filter_issues
+from issue_merge import merge_issues, dedupe_tool_outputs
+from block_cache import get_block_cache, block_hash, prompt_key
+from stream_writer import StreamedIssues
 
 from datetime import datetime
 import json
 import os
 
+
+def scanned_file(state: dict) -> str:
+    """
+    File name the report is filed (and suppressions are matched) under.
+    """
+
+    return state.get("source_file") or state.get("input_file_path", "unknown_file")
+
+
 # ===== Simple Graph Node Functions =====
 
 def get_file(state: dict) -> dict:
@@ -30,23 +49,101 @@ def get_file(state: dict) -> dict:
         print(f"Error reading file: {e}")
         iac_code = ""
 
+    # Line offsets for slicing issue snippets later in the scan
+    get_line_index(path)
+
     return {"iac_template": iac_code}
 
 
+def run_rules(state: dict) -> dict:
+    """
+    This node runs the local rules engine over the parsed template (no LLM).
+    Blocks without security relevant configuration are blanked out of the template passed on
+    to the LLM. Resource blocks always go to the LLM, rule issues are merged with its issues.
+    """
+
+    print("Running Rules...")
+    parsed = parse_template(state["iac_template"], state["input_file_path"])
+    rule_issues = evaluate_rules(parsed)
+    llm_template = mask_covered_blocks(state["iac_template"], parsed)
+
+    print(f"Rules found {len(rule_issues)} issues" + ("" if llm_template else ", no LLM analysis needed"))
+    score = complexity(
+        lines=llm_template.count("\n") + 1 if llm_template else 0,
+        resources=len(parsed.blocks),
+        findings=len(rule_issues)
+    )
+    return {"rule_issues": rule_issues, "llm_template": llm_template, "complexity": score}
+
+
+def write_issues(writer, state: dict, prompt_template, data: dict) -> StreamedIssues:
+    """
+    Runs a writer routed by the scan's complexity (see model_router.py).
+    On the small model an incomplete report (malformed items, cut off) is escalated instead
+    of repaired item by item.
+    """
+
+    def call(llm, last, timeout):
+        if last:
+            return llm.write(prompt_template, data, timeout=timeout), True
+        result = llm.stream_issues(prompt_template, data, timeout=timeout)
+        return result, result.complete
+
+    return writer.run(state.get("complexity", {}), call, timeout=WRITER_TIMEOUT)
+
+
 def generate_report_issues(state: dict, llm, prompt_template) -> dict:
     """
     This node calls the LLM to check and document all the issues in an IaC Template
+    Only the part of the template the rules engine could not decide is sent.
+    Blocks with the same code as in an earlier scan (and the same writer model) get their
+    cached issues instead, only new or changed blocks are sent (see block_cache.py).
     """
 
-    if(state["iac_template"] == ""):
-        return {"iac_issues" : []}
+    iac_template = state.get("llm_template", state["iac_template"])
+    if(iac_template.strip() == ""):
+        return {"iac_issues" : AIReport(issues=[])}
+
+    cache = get_block_cache()
+    cached_issues, analyzed = [], []
+    if cache is not None:
+        parsed = parse_template(state["iac_template"], state["input_file_path"])
+        lines = state["iac_template"].splitlines()
+        key_prefix = prompt_key(prompt_template)
+        # Looked up for the model the scan is routed to, stored for the one that answered
+        model_id = llm.llm(choose_tier(state.get("complexity", {}))).model_id
+
+        def block_key(block, model_id):
+            return block_hash(parsed.framework, lines[block.start - 1:block.end], key_prefix, model_id)
+
+        unchanged = []
+        for block in parsed.blocks:
+            if is_covered(block):
+                continue
+            issues = cache.get(block_key(block, model_id), block.start)
+            if issues is None:
+                analyzed.append(block)
+            else:
+                unchanged.append(block)
+                # An issue spanning several unchanged blocks is cached under each of them
+                cached_issues += [issue for issue in issues if issue not in cached_issues]
+
+        if unchanged:
+            print(f"{len(unchanged)} unchanged blocks from the block cache, {len(analyzed)} blocks to analyze")
+            iac_template = mask_blocks(iac_template, unchanged)
+            if iac_template.strip() == "":
+                return {"iac_issues": AIReport(issues=cached_issues)}
 
     print("Analyzing IaC Template...")
-    iac_template = state["iac_template"]
-    chain = prompt_template | llm
-    ai_report = chain.invoke({"iac_template": iac_template})
+    result = write_issues(llm, state, prompt_template, {"iac_template": iac_template})
+    if cache is not None and analyzed:
+        # A report missing issues would be cached as the blocks' issues (or as clean)
+        if result.complete:
+            cache.put_blocks([(block_key(block, result.model), block.start, block.end) for block in analyzed], result.issues)
+        else:
+            print("Writer output incomplete, blocks not cached")
     print("Report Scanned")
-    return {"iac_issues": ai_report}
+    return {"iac_issues": AIReport(issues=cached_issues + result.issues)}
     
 
 def populate_metadata(state: dict) -> dict:
@@ -56,7 +153,10 @@ def populate_metadata(state: dict) -> dict:
     print("Generating Report Metadata...")
     # Extract issues from AI output
     issues = state.get("iac_issues", [])
-    issues = issues.issues
+    issues = merge_issues(state.get("rule_issues", []) + issues.issues)
+    attach_snippets(issues, state["input_file_path"])
+    fingerprint_issues(issues)
+    issues, suppressed = filter_issues(issues, get_suppressions(scanned_file(state)))
 
     # Generate report name (FileName + Timestamp)
     file_name = state.get("input_file_path", "unknown_file").split("/")[-1]
@@ -71,6 +171,7 @@ def populate_metadata(state: dict) -> dict:
         "low": sum(1 for i in issues if i.severity == "Low"),
         "medium": sum(1 for i in issues if i.severity == "Medium"),
         "high": sum(1 for i in issues if i.severity == "High"),
+        "suppressed": len(set(suppressed)),
     }
 
     # Populate state
@@ -83,7 +184,7 @@ def populate_metadata(state: dict) -> dict:
         name=name,
         summary=summary,
         timestamp=timestamp,
-        file=state.get("input_file_path", "unknown_file"),
+        file=scanned_file(state),
         issues=issues
     )
     
@@ -105,6 +206,12 @@ def save_results(state: dict):
 
     print(f"\nReport saved to: {output_file_path}")
 
+    # Change set against the previous scan of the same file
+    diff_path = save_diff(state["report"], state["output_dir"])
+
+    print(f"\nFINAL_REPORT_PATH: {output_file_path}")
+    print(f"FINAL_DIFF_PATH: {diff_path}")
+
 # ===== ReAct Agent Node Functions =====
 
 def prepare_graph_state(state: ReActGraphState) -> dict:
@@ -114,7 +221,8 @@ def prepare_graph_state(state: ReActGraphState) -> dict:
     2. Prepares the output file directory.
     3. Creates the output files directory if not there already.
     4. Generates Output File Name.
-    5. Loads the IaC template as a string
+    5. Loads the IaC template into the scan's blob store and indexes its line offsets.
+       State only keeps a reference, the template is loaded again for every thinker turn.
     """
 
     # Generate Output File Name(FileName + Timestamp)
@@ -139,14 +247,25 @@ def prepare_graph_state(state: ReActGraphState) -> dict:
         print(f"Error reading file: {e}")
         iac_code = ""
 
-    # Initialize messages(short-term memory) with initial prompt
+    # Line offsets for slicing issue snippets later in the scan
+    index = get_line_index(path)
+
+    iac_template_ref = get_blob_store(output_dir).put(iac_code)
+    score = complexity(
+        lines=index.line_count if index else iac_code.count("\n") + 1,
+        resources=len(parse_template(iac_code, path).blocks)
+    )
+
+    # Initialize messages(short-term memory) with initial prompt.
+    # Stored without the template, thinker_messages adds it for every thinker turn.
     messages = [
         SystemMessage(content=react_thinker_prompt_system),
-        HumanMessage(content=react_thinker_prompt_human.format(
+        HumanMessage(content=react_thinker_prompt_human_compact.format(
             file_path=state["input_file_path"],
             output_dir=output_dir,
             output_file_name=final_name,
-            iac_template=iac_code
+            line_count=index.line_count if index else 0,
+            content_hash=iac_template_ref.split(":")[-1][:12]
         ))
     ]
 
@@ -154,31 +273,91 @@ def prepare_graph_state(state: ReActGraphState) -> dict:
         "messages": messages,
         "output_file_name": final_name,
         "output_dir": output_dir,
-        "iac_template": iac_code
+        "iac_template_ref": iac_template_ref,
+        "complexity": score
     }
 
 
+def thinker_messages(state: ReActGraphState) -> list:
+    """
+    Builds the messages sent to the thinker, loading blobs only where they are sent.
+    The HumanMessage in state has no IaC template and tool outputs are blob references,
+    so state and checkpoints stay small. Every turn sends the same full history it sent
+    before plus the new messages: each request extends the previous one, and the provider
+    reuses the cached prefix (see prompt_cache.py) instead of evaluating it again.
+    state["messages"] is not modified.
+    """
+
+    blobs = get_blob_store(state["output_dir"])
+
+    messages = []
+    for message in state["messages"]:
+        if isinstance(message, HumanMessage) and state.get("iac_template_ref"):
+            message = message.model_copy(update={"content": react_thinker_prompt_human.format(
+                file_path=state["input_file_path"],
+                output_dir=state["output_dir"],
+                output_file_name=state["output_file_name"],
+                iac_template=blobs.get(state["iac_template_ref"])
+            )})
+        elif isinstance(message, ToolMessage):
+            message = message.model_copy(update={"content": str(blobs.resolve(message.content))})
+        messages.append(message)
+
+    return messages
+
+
 def llm_call(state: ReActGraphState, reason_llm) -> dict:
     """
     Reasoning LLM.
     Takes the messages from state, decides whether to call a tool or generate Answer.
     No prompt required as LLM can get all the context from messages.
     Make sure to populate messages with an initial SystemMessage and HumanMessage.
+    Template and tool outputs are loaded from the blob store (see thinker_messages).
     """
 
     print("Calling Agent(Thinking)...")
 
-    # Get memory
-    messages = state["messages"]
-    # Get next step from LLM
-    response = reason_llm.invoke(messages)
+    # Get memory(with the blobs loaded, state only holds references)
+    messages = thinker_messages(state)
+    # Get next step from LLM, a small model's malformed tool calls are retried on the large one
+    def call(llm, last, timeout):
+        response = get_scheduler().invoke(llm, messages, timeout=timeout)
+        return response, last or not response.invalid_tool_calls
+
+    response = reason_llm.run(state.get("complexity", {}), call, timeout=THINKER_TIMEOUT)
 
     return {"messages": [response]}
 
 
+def suppress_tool_findings(tool_output: str, state: ReActGraphState) -> tuple:
+    """
+    Drops the suppressed findings from a tool output (a JSON list of findings), before
+    any LLM reads it. Returns (output, suppressed keys), other outputs are left as they are.
+    """
+
+    suppressions = get_suppressions(scanned_file(state))
+    if not len(suppressions):
+        return tool_output, []
+
+    try:
+        findings = json.loads(tool_output)
+    except (json.JSONDecodeError, TypeError):
+        return tool_output, []
+    if not isinstance(findings, list):
+        return tool_output, []
+
+    kept, suppressed = filter_findings(findings, suppressions, state["input_file_path"])
+    if suppressed:
+        print(f"Suppressed {len(suppressed)} of {len(findings)} findings")
+        tool_output = json.dumps(kept, indent=2, default=str)
+    return tool_output, suppressed
+
+
 def tool_call(state: ReActGraphState, tool_list: dict) -> dict:
     """
     Performs the tool call as requested by the reasoning LLM.
+    Suppressed findings are removed from the tool output (see suppressions.py).
+    Tool outputs go into the scan's blob store, the ToolMessages only reference them.
     """
 
     print("Calling Tools...")
@@ -187,6 +366,8 @@ def tool_call(state: ReActGraphState, tool_list: dict) -> dict:
     last_message = state["messages"][-1]
     # List to store all tool outputs
     tool_messages = []
+    blobs = get_blob_store(state["output_dir"])
+    suppressed = []
     # Iterate over all tools
     for tool_call in last_message.tool_calls:
         tool_name = tool_call["name"]
@@ -196,9 +377,12 @@ def tool_call(state: ReActGraphState, tool_list: dict) -> dict:
             tool_func = tool_list[tool_name]
             print(f"Running tool: {tool_name} with args: {tool_args}")
             observation = tool_func.invoke(tool_args)
+            observation, dropped = suppress_tool_findings(str(observation), state)
+            suppressed += dropped
             tool_messages.append(
                 ToolMessage(
-                    content=str(observation), # The tool's output
+                    content=blobs.put(observation), # Reference to the tool's output
+                    name=tool_name,
                     tool_call_id=tool_call["id"] # The ID from the original call
                 )
             )
@@ -209,52 +393,81 @@ def tool_call(state: ReActGraphState, tool_list: dict) -> dict:
             tool_messages.append(
                 ToolMessage(
                     content=f"Error running tool: {e}",
+                    name=tool_name,
                     tool_call_id=tool_call["id"]
                 )
             )
 
-    return {"messages": tool_messages}
+    return {"messages": tool_messages, "suppressed": suppressed}
 
 
 def should_continue(state: ReActGraphState) -> Literal["tool_call", "write_report"]:
     """
     Conditional Edge Logic to decide whether to generate final answer or not.
     Environment -> Tool Call
+    After MAX_REACT_ITERATIONS thinker turns the report is written with the tool data so far.
     """
 
-    if state["messages"][-1].tool_calls:
+    iterations = sum(1 for message in state["messages"] if isinstance(message, AIMessage))
+
+    if state["messages"][-1].tool_calls and iterations < MAX_REACT_ITERATIONS:
         return "tool_call"
     else:
+        if state["messages"][-1].tool_calls:
+            print(f"Reached {MAX_REACT_ITERATIONS} thinker iterations, writing report")
         return "write_report"
 
+def count_findings(tool_output: str) -> int:
+    """
+    Number of findings in a tool output (a JSON list), 0 if it is not one.
+    """
+
+    try:
+        data = json.loads(tool_output)
+    except (json.JSONDecodeError, TypeError):
+        return 0
+    return len(data) if isinstance(data, list) else 0
+
+
 def write_report(state: ReActGraphState, writer_llm) -> dict:
     """
     Writes the final report JSON from all the tool outputs.
+    Repeated findings and near-duplicate issues are merged (see issue_merge.py).
     """
 
     writer_prompt_template = react_writer_prompt
 
+    # Tool outputs are loaded from the blob store only here, for the writer prompt
+    blobs = get_blob_store(state["output_dir"])
     tool_data = []
     for message in state["messages"]:
         if isinstance(message, ToolMessage):
-            tool_data.append(message.content)
-
-    chain = writer_prompt_template | writer_llm
-    ai_report = chain.invoke({"tool_data": "\n\n".join(tool_data)})
-    issues = ai_report.issues
+            tool_data.append(str(blobs.resolve(message.content)))
+    tool_data = dedupe_tool_outputs(tool_data)
+
+    # The writer's tier also depends on how many findings it has to write up
+    score = {**state.get("complexity", {}), "findings": sum(count_findings(data) for data in tool_data)}
+    ai_report = write_issues(writer_llm, {"complexity": score}, writer_prompt_template, {"tool_data": "\n\n".join(tool_data)})
+    issues = merge_issues(ai_report.issues)
+    attach_snippets(issues, state["input_file_path"])
+    fingerprint_issues(issues)
+    # Findings the writer reports despite the filtered tool output
+    issues, suppressed = filter_issues(issues, get_suppressions(scanned_file(state)))
+    ai_report = AIReport(issues=issues)
 
     summary = {
             "count": len(issues),
             "low": sum(1 for i in issues if i.severity == "Low"),
             "medium": sum(1 for i in issues if i.severity == "Medium"),
             "high": sum(1 for i in issues if i.severity == "High"),
+            "suppressed": len(set(state.get("suppressed", []) + suppressed)),
     }
 
     final_report = SecurityReport(
         name=state["output_file_name"],
         summary=summary,
         timestamp=datetime.now(),
-        file=state.get("input_file_path", "unknown_file"),
+        file=scanned_file(state),
         issues=issues
     )
 
@@ -265,7 +478,7 @@ def write_report(state: ReActGraphState, writer_llm) -> dict:
 
 def save_final_results(state: ReActGraphState):
     """
-    Save the final report as a json file
+    Save the final report as a json file, along with its diff against the previous scan
     """
 
     print("Generated Report:\n")
@@ -278,4 +491,8 @@ def save_final_results(state: ReActGraphState):
 
     print(f"\nReport saved to: {output_file_path}")
 
+    # Change set against the previous scan of the same file
+    diff_path = save_diff(state["report"], state["output_dir"])
+
     print(f"\nFINAL_REPORT_PATH: {output_file_path}")
+    print(f"FINAL_DIFF_PATH: {diff_path}")
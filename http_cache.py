@@ -0,0 +1,150 @@
+from collections import OrderedDict
+from typing import Callable, Optional
+from fastapi.responses import Response
+from fastapi import Request
+import threading
+import gzip
+import os
+
+try:
+    import brotli  # Optional, responses are only gzip compressed without it
+except ImportError:
+    brotli = None
+
+# ===== HTTP Caching Settings =====
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Encoded response bodies kept in memory, by (content hash, encoding)
+ENCODED_CACHE_BYTES = int(os.getenv("ENCODED_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+# Reports may be fetched again at any time, but must be revalidated (ETag) first
+CACHE_CONTROL = "private, no-cache"
+
+
+# ===== Content Negotiation =====
+
+def choose_encoding(accept_encoding: str) -> str:
+    """
+    Best supported content coding the client accepts: br, gzip or identity.
+    """
+
+    offered = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        offered[coding] = quality
+
+    for coding in (["br"] if brotli else []) + ["gzip"]:
+        if offered.get(coding, offered.get("*", 0.0)) > 0:
+            return coding
+    return "identity"
+
+
+def representation_etag(content_hash: str, encoding: str) -> str:
+    """
+    Strong ETag of one encoding of the content, every encoding has its own.
+    """
+
+    if encoding == "identity":
+        return f'"{content_hash}"'
+    return f'"{content_hash}-{encoding}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    If-None-Match check (weak comparison, as RFC 9110 specifies for this header).
+    """
+
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+# ===== Encoded Bodies =====
+
+_encoded: OrderedDict = OrderedDict()
+_encoded_size = 0
+_encoded_lock = threading.Lock()
+
+
+def encode_body(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    return data
+
+
+def encoded_body(content_hash: str, encoding: str, load: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+    """
+    Body of the content in the given encoding, compressed once and then served from an LRU cache.
+    load returns the raw content, it is only called on a cache miss.
+    """
+
+    global _encoded_size
+    key = (content_hash, encoding)
+
+    with _encoded_lock:
+        body = _encoded.get(key)
+        if body is not None:
+            _encoded.move_to_end(key)
+            return body
+
+    data = load()
+    if data is None:
+        return None
+    body = encode_body(data, encoding)
+
+    with _encoded_lock:
+        if key not in _encoded and len(body) <= ENCODED_CACHE_BYTES:
+            _encoded[key] = body
+            _encoded_size += len(body)
+            while _encoded_size > ENCODED_CACHE_BYTES:
+                _, evicted = _encoded.popitem(last=False)
+                _encoded_size -= len(evicted)
+
+    return body
+
+
+# ===== Responses =====
+
+def conditional_response(request: Request, content_hash: str, load: Callable[[], Optional[bytes]],
+                         media_type: str = "application/json", headers: Optional[dict] = None) -> Optional[Response]:
+    """
+    Response for content identified by its hash: 304 if the client's copy is current
+    (nothing is loaded), else the body compressed as negotiated.
+    None if load finds no content.
+    """
+
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    etag = representation_etag(content_hash, encoding)
+    headers = {
+        **(headers or {}),
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+        "Cache-Control": CACHE_CONTROL,
+    }
+
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+
+    body = encoded_body(content_hash, encoding, load)
+    if body is None:
+        return None
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,288 @@
+from pydantic import BaseModel, Field
+from typing import Annotated, Any, List
+import json
+import re
+
+import yaml
+
+# ====== Parsed Template Data =====
+
+class ResourceBlock(BaseModel):
+    """
+    Class representing one top-level block of an IaC template (resource, provider, ...)
+    """
+
+    kind: Annotated[str, Field(..., description="Block kind, e.g. resource, data, provider, variable")]
+    type: Annotated[str, Field(..., description="Resource type, e.g. aws_s3_bucket or AWS::S3::Bucket")]
+    name: Annotated[str, Field(..., description="Resource name / logical id")]
+    start: Annotated[int, Field(..., description="First line of the block (1-based)")]
+    end: Annotated[int, Field(..., description="Last line of the block (1-based, inclusive)")]
+    attributes: Annotated[dict, Field(default_factory=dict, description="Parsed attributes of the block")]
+
+
+class ParsedTemplate(BaseModel):
+    """
+    Class representing a parsed IaC template.
+    """
+
+    framework: Annotated[str, Field(..., description="terraform, cloudformation or unknown")]
+    blocks: Annotated[List[ResourceBlock], Field(default_factory=list, description="Top-level blocks in file order")]
+    leftover_code: Annotated[bool, Field(False, description="Code outside of any parsed block")]
+
+
+# ===== Terraform (HCL) =====
+
+TF_BLOCK_RE = re.compile(r'^\s*(resource|data|provider|module|variable|output|locals|terraform)\b\s*((?:"[^"]*"\s*)*)\{')
+TF_LABEL_RE = re.compile(r'"([^"]*)"')
+TF_ASSIGN_RE = re.compile(r'^\s*([\w-]+)\s*=\s*(.*)$')
+TF_NESTED_RE = re.compile(r'^\s*([\w-]+)\s*((?:"[^"]*"\s*)*)\{\s*$')
+TF_HEREDOC_RE = re.compile(r'<<-?\s*"?(\w+)"?\s*$')
+
+
+def _strip_comment(line: str) -> str:
+    """
+    Removes #, // and single-line /* */ comments outside of strings.
+    """
+
+    in_string = False
+    i = 0
+    while i < len(line):
+        c = line[i]
+        if in_string:
+            if c == "\\":
+                i += 1
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == "#" or line.startswith("//", i) or line.startswith("/*", i):
+            return line[:i]
+        i += 1
+    return line
+
+
+def _depth_delta(line: str) -> int:
+    """
+    Net change of {[( nesting on a line, ignoring strings and comments.
+    """
+
+    line = _strip_comment(line)
+    depth = 0
+    in_string = False
+    i = 0
+    while i < len(line):
+        c = line[i]
+        if in_string:
+            if c == "\\":
+                i += 1
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in "{[(":
+            depth += 1
+        elif c in "}])":
+            depth -= 1
+        i += 1
+    return depth
+
+
+def _block_end(lines: list, start: int) -> int:
+    """
+    Index of the line closing the block opened on lines[start].
+    """
+
+    depth = 0
+    i = start
+    while i < len(lines):
+        heredoc = TF_HEREDOC_RE.search(_strip_comment(lines[i]))
+        depth += _depth_delta(lines[i])
+        if heredoc:
+            # Skip heredoc body, its content is not HCL
+            i += 1
+            while i < len(lines) and lines[i].strip() != heredoc.group(1):
+                i += 1
+        if depth <= 0 and i >= start:
+            return i
+        i += 1
+    return len(lines) - 1
+
+
+def _parse_value(raw: str) -> Any:
+    """
+    Parses a HCL literal. Expressions that are not literals are kept as strings.
+    """
+
+    raw = raw.strip().rstrip(",")
+    if raw in ("true", "false"):
+        return raw == "true"
+
+    try:
+        # Lists/strings/numbers are JSON compatible apart from trailing commas
+        return json.loads(re.sub(r",\s*([\]}])", r"\1", raw))
+    except json.JSONDecodeError:
+        return raw.strip('"')
+
+
+def _parse_body(lines: list) -> dict:
+    """
+    Parses the lines inside a HCL block into a dict.
+    Nested blocks (e.g. ingress { ... }) become a list of dicts under their name.
+    """
+
+    attributes: dict = {}
+    i = 0
+    while i < len(lines):
+        line = _strip_comment(lines[i])
+
+        nested = TF_NESTED_RE.match(line)
+        assign = TF_ASSIGN_RE.match(line)
+
+        if nested and not assign:
+            end = _block_end(lines, i)
+            attributes.setdefault(nested.group(1), []).append(_parse_body(lines[i + 1:end]))
+            i = end + 1
+            continue
+
+        if assign:
+            key, value = assign.group(1), assign.group(2).strip()
+            heredoc = TF_HEREDOC_RE.search(value)
+            if heredoc:
+                end = i + 1
+                while end < len(lines) and lines[end].strip() != heredoc.group(1):
+                    end += 1
+                attributes[key] = "\n".join(lines[i + 1:end])
+                i = end + 1
+                continue
+
+            if _depth_delta(value) > 0:
+                end = _block_end(lines, i)
+                if value.startswith("{"):
+                    # Multi-line map: same syntax as a block body
+                    attributes[key] = _parse_body(lines[i + 1:end])
+                else:
+                    value = " ".join(_strip_comment(l).strip() for l in [value] + lines[i + 1:end + 1])
+                    attributes[key] = _parse_value(value)
+                i = end + 1
+                continue
+
+            attributes[key] = _parse_value(value)
+
+        i += 1
+
+    return attributes
+
+
+def parse_terraform(text: str) -> ParsedTemplate:
+
+    lines = text.splitlines()
+    blocks = []
+    leftover_code = False
+
+    i = 0
+    while i < len(lines):
+        match = TF_BLOCK_RE.match(lines[i])
+        if not match:
+            if _strip_comment(lines[i]).strip() and not lines[i].strip().startswith("/*"):
+                leftover_code = True
+            i += 1
+            continue
+
+        kind = match.group(1)
+        labels = TF_LABEL_RE.findall(match.group(2))
+        end = _block_end(lines, i)
+
+        if kind in ("resource", "data") and len(labels) >= 2:
+            block_type, name = labels[0], labels[1]
+        else:
+            block_type, name = kind, labels[0] if labels else kind
+
+        blocks.append(ResourceBlock(
+            kind=kind,
+            type=block_type,
+            name=name,
+            start=i + 1,
+            end=end + 1,
+            attributes=_parse_body(lines[i + 1:end])
+        ))
+        i = end + 1
+
+    return ParsedTemplate(framework="terraform", blocks=blocks, leftover_code=leftover_code)
+
+
+# ===== CloudFormation (YAML / JSON) =====
+
+class _CfnLoader(yaml.SafeLoader):
+    """
+    SafeLoader that accepts CloudFormation short-form tags (!Ref, !Sub, ...).
+    """
+
+
+def _construct_tag(loader, tag_suffix, node):
+    if isinstance(node, yaml.ScalarNode):
+        return loader.construct_scalar(node)
+    if isinstance(node, yaml.SequenceNode):
+        return loader.construct_sequence(node, deep=True)
+    return loader.construct_mapping(node, deep=True)
+
+
+_CfnLoader.add_multi_constructor("!", _construct_tag)
+
+
+def parse_cloudformation(text: str) -> ParsedTemplate:
+
+    try:
+        root = yaml.compose(text, Loader=_CfnLoader)
+    except yaml.YAMLError:
+        return ParsedTemplate(framework="unknown")
+
+    if not isinstance(root, yaml.MappingNode):
+        return ParsedTemplate(framework="unknown")
+
+    resources = next((v for k, v in root.value if k.value == "Resources"), None)
+    if not isinstance(resources, yaml.MappingNode):
+        return ParsedTemplate(framework="unknown")
+
+    lines = text.splitlines()
+    loader = _CfnLoader("")
+    blocks = []
+    for key_node, value_node in resources.value:
+        body = loader.construct_object(value_node, deep=True)
+        if not isinstance(body, dict):
+            continue
+
+        # end_mark points just past the node: mid-line for flow style (JSON),
+        # at the next token (next key, after blank lines) for block style
+        end_mark = value_node.end_mark
+        line_prefix = lines[end_mark.line][:end_mark.column] if end_mark.line < len(lines) else ""
+        end = end_mark.line + 1 if line_prefix.strip() else end_mark.line
+        while end > key_node.start_mark.line + 1 and not lines[end - 1].strip():
+            end -= 1
+
+        blocks.append(ResourceBlock(
+            kind="resource",
+            type=str(body.get("Type", "")),
+            name=str(key_node.value),
+            start=key_node.start_mark.line + 1,
+            end=max(end, key_node.start_mark.line + 1),
+            attributes=body.get("Properties") or {}
+        ))
+
+    return ParsedTemplate(framework="cloudformation", blocks=blocks)
+
+
+# ===== Entry Point =====
+
+def parse_template(text: str, path: str = "") -> ParsedTemplate:
+    """
+    Parses a template into its top-level blocks.
+    Formats that are not understood come back with framework "unknown" and no blocks.
+    """
+
+    if path.endswith(".tf") or TF_BLOCK_RE.search(text.split("\n", 1)[0] if text else ""):
+        return parse_terraform(text)
+
+    if path.endswith((".json", ".yaml", ".yml", ".template")) and "Resources" in text:
+        return parse_cloudformation(text)
+
+    return ParsedTemplate(framework="unknown")
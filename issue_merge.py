@@ -0,0 +1,243 @@
+from templates import SecurityIssue
+from rules import RULES
+
+from collections import Counter
+from typing import Optional
+import itertools
+import heapq
+import json
+import math
+import re
+
+# ===== Issue Merge Settings =====
+
+# Checks reporting the same problem share one canonical id (a rule id or the check's own id)
+CHECK_ALIASES = {checkov_id: rule["id"] for rule in RULES for checkov_id in rule.get("checkov_ids", [])}
+
+# Issues without a check id are the same problem if their names share this share of words
+NAME_SIMILARITY = 0.5
+NAME_STOPWORDS = {"a", "an", "the", "is", "are", "of", "on", "in", "to", "for", "with", "has", "not", "no", "and", "or"}
+
+LEVEL_RANK = {"Low": 0, "Medium": 1, "High": 2}
+LINK_PREFIX = "Additional Information:"
+
+
+# ===== Issue Semantics =====
+
+def canonical_check(issue: SecurityIssue) -> Optional[str]:
+    if not issue.check_id:
+        return None
+    return CHECK_ALIASES.get(issue.check_id, issue.check_id)
+
+
+def name_tokens(name: str) -> frozenset:
+    return frozenset(re.findall(r"[a-z0-9]+", name.lower())) - NAME_STOPWORDS
+
+
+def _similar_names(a: frozenset, b: frozenset) -> bool:
+    if not a or not b:
+        return False
+    return len(a & b) / len(a | b) >= NAME_SIMILARITY
+
+
+# Name lookups use prefix filtering: with the tokens of every name in the same order (rarest
+# first), two names sharing at least k tokens share one of the first len - k + 1 tokens of each.
+# Names are indexed by (token, name size) under the prefix for the smallest k any similar name
+# shares, and looked up, per size a similar name can have, under the prefix for that size.
+
+def _ceil(x: float) -> int:
+    return math.ceil(x - 1e-9)
+
+
+def _index_keys(ordered: list) -> list:
+    size = len(ordered)
+    return [(token, size) for token in ordered[:size - _ceil(NAME_SIMILARITY * size) + 1]]
+
+
+def _probe_keys(ordered: list) -> list:
+    size = len(ordered)
+    keys = []
+    for other in range(max(1, _ceil(NAME_SIMILARITY * size)), int(size / NAME_SIMILARITY + 1e-9) + 1):
+        shared = _ceil(NAME_SIMILARITY / (1 + NAME_SIMILARITY) * (size + other))
+        keys += [(token, other) for token in ordered[:size - shared + 1]]
+    return keys
+
+
+class _Cluster:
+    """
+    Overlapping issues with the same semantics, while the sweep is inside their line range.
+    """
+
+    __slots__ = ("issues", "check", "resource", "tokens", "keys", "end", "seq")
+
+    def __init__(self, issue: SecurityIssue, check: Optional[str], tokens: frozenset, keys: list, seq: int):
+        self.issues = [issue]
+        self.check = check
+        self.resource = issue.resource
+        self.tokens = tokens
+        self.keys = keys
+        self.end = max(issue.location)
+        self.seq = seq
+
+    def accepts(self, issue: SecurityIssue, check: Optional[str], tokens: frozenset) -> bool:
+        if self.resource and issue.resource and self.resource != issue.resource:
+            return False
+        if self.check and check:
+            return self.check == check
+        return _similar_names(self.tokens, tokens)
+
+    def add(self, issue: SecurityIssue, check: Optional[str]) -> None:
+        self.issues.append(issue)
+        self.end = max(self.end, max(issue.location))
+        self.check = self.check or check
+        self.resource = self.resource or issue.resource
+
+
+# ===== Merging =====
+
+def _merge_lists(lists: list) -> list:
+    """
+    Union of the lists in order, without repeats. Links stay at the end.
+    """
+
+    seen, items, links = set(), [], []
+    for values in lists:
+        for value in values:
+            key = re.sub(r"\s+", " ", value).strip().lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            (links if value.startswith(LINK_PREFIX) else items).append(value)
+    return items + links
+
+
+def merge_cluster(issues: list) -> SecurityIssue:
+    """
+    One canonical issue for a cluster: the issue with a check id and the highest confidence
+    is kept, with the highest severity and the problems and remedies of all of them.
+    """
+
+    if len(issues) == 1:
+        return issues[0]
+
+    canonical = max(issues, key=lambda i: (i.check_id is not None, LEVEL_RANK[i.confidence_score], LEVEL_RANK[i.severity]))
+    ordered = [canonical] + [issue for issue in issues if issue is not canonical]
+
+    return canonical.model_copy(update={
+        "severity": max((issue.severity for issue in issues), key=LEVEL_RANK.get),
+        "problems": _merge_lists([issue.problems for issue in ordered]),
+        "remedies": _merge_lists([issue.remedies for issue in ordered]),
+        "resource": canonical.resource or next((issue.resource for issue in ordered if issue.resource), None),
+    })
+
+
+def merge_issues(issues: list) -> list:
+    """
+    Merges near-duplicate issues: overlapping line ranges and the same problem (same or
+    equivalent check, or similar names) on the same resource.
+
+    Issues are swept in order of their first line. Only clusters still open at that line
+    (their last line not passed yet) can take the issue; they are closed from a heap on their
+    last line. Open clusters are looked up by check id, and by the rarest tokens of their name
+    for issues compared by name (only clusters that can be similar enough are found), so the
+    merge stays O(n log n) for tens of thousands of findings, also when many untyped issues
+    overlap. Issues without a location are kept as
+    they are. Output keeps the order of first appearance.
+    """
+
+    located = [(i, issue) for i, issue in enumerate(issues) if issue.location]
+    unlocated = [(i, issue) for i, issue in enumerate(issues) if not issue.location]
+    located.sort(key=lambda item: (min(item[1].location), item[0]))
+
+    tokens_of = {id(issue): name_tokens(issue.name) for _, issue in located}
+    rarity = Counter(token for tokens in tokens_of.values() for token in tokens)
+
+    by_check: dict[str, dict] = {}      # check -> open clusters with it, by seq
+    by_token: dict[tuple, dict] = {}    # (name token, name size) -> open clusters, by seq
+    closing: list = []                  # Heap of (last line, seq, cluster) of open clusters
+    clusters: list = []                 # (first position, cluster)
+    seq = itertools.count()
+
+    for position, issue in located:
+        start = min(issue.location)
+        check = canonical_check(issue)
+        tokens = tokens_of[id(issue)]
+        ordered = sorted(tokens, key=lambda token: (rarity[token], token))
+
+        # Close clusters the sweep has passed (re-queued if they grew since)
+        while closing and closing[0][0] < start:
+            end, n, cluster = heapq.heappop(closing)
+            if cluster.end > end:
+                heapq.heappush(closing, (cluster.end, n, cluster))
+                continue
+            if cluster.check is not None:
+                by_check[cluster.check].pop(n, None)
+            for key in cluster.keys:
+                by_token[key].pop(n, None)
+
+        # Same check first, then clusters whose names may be similar (untyped issues may
+        # repeat any open check, typed ones only clusters without a check)
+        same = by_check.get(check, {}) if check is not None else {}
+        candidates = [same[n] for n in sorted(same)]
+        named = {c.seq: c for key in _probe_keys(ordered) for c in by_token.get(key, {}).values()
+                 if check is None or c.check is None}
+        candidates += [named[n] for n in sorted(named)]
+
+        cluster = next((c for c in candidates if c.accepts(issue, check, tokens)), None)
+        if cluster is not None:
+            had_check = cluster.check
+            cluster.add(issue, check)
+            if had_check is None and cluster.check is not None:
+                by_check.setdefault(cluster.check, {})[cluster.seq] = cluster
+            continue
+
+        cluster = _Cluster(issue, check, tokens, _index_keys(ordered), next(seq))
+        clusters.append((position, cluster))
+        heapq.heappush(closing, (cluster.end, cluster.seq, cluster))
+        if check is not None:
+            by_check.setdefault(check, {})[cluster.seq] = cluster
+        for key in cluster.keys:
+            by_token.setdefault(key, {})[cluster.seq] = cluster
+
+    merged = [(position, merge_cluster(cluster.issues)) for position, cluster in clusters] + unlocated
+    merged.sort(key=lambda item: item[0])
+
+    if len(merged) < len(issues):
+        print(f"Merged {len(issues) - len(merged)} duplicate issues")
+    return [issue for _, issue in merged]
+
+
+def dedupe_tool_outputs(tool_outputs: list) -> list:
+    """
+    Drops findings (JSON list items) already reported by an earlier tool output, so repeated
+    tool runs do not send the same finding to the writer twice. Other outputs are kept as they are.
+    """
+
+    seen = set()
+    deduped = []
+    for output in tool_outputs:
+        try:
+            findings = json.loads(output)
+        except (json.JSONDecodeError, TypeError):
+            deduped.append(output)
+            continue
+        if not isinstance(findings, list):
+            deduped.append(output)
+            continue
+
+        kept = []
+        for finding in findings:
+            if isinstance(finding, dict):
+                key = (finding.get("check_id"), finding.get("resource"), json.dumps(finding.get("file_line_range")))
+            else:
+                key = json.dumps(finding, sort_keys=True, default=str)
+            if key not in seen:
+                seen.add(key)
+                kept.append(finding)
+
+        if len(kept) < len(findings):
+            print(f"Dropped {len(findings) - len(kept)} findings repeated from an earlier tool run")
+            output = json.dumps(kept, indent=2, default=str)
+        deduped.append(output)
+
+    return deduped
@@ -0,0 +1,263 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional
+import threading
+import hashlib
+import sqlite3
+import time
+import os
+
+# ===== Job Queue Settings =====
+
+# "sqlite": one SQLite file shared by the API replicas and scan workers of one host (SQLite
+# locking is not safe on network file systems). For several hosts, "package.module:factory"
+# of a shared JobQueue implementation (see backends.py).
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "sqlite")
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", "jobs.sqlite")
+
+# A running job whose worker has not sent a heartbeat for this long is handed to another worker
+JOB_LEASE = float(os.getenv("JOB_LEASE", "30"))
+# Claims of one job (first run + lease expiries) before it is failed for good
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+@dataclass
+class Job:
+    job_id: str
+    file: str
+    status: str
+    priority: str
+    attempts: int
+    cancel_requested: bool
+    report_name: Optional[str]
+    error: Optional[str]
+    worker: Optional[str]
+    created_at: float
+    updated_at: float
+    input_hash: Optional[str] = None
+
+
+def input_hash(data: bytes, file: str) -> str:
+    """
+    Identity of a job's input: the file it is filed under and its content.
+    """
+
+    return hashlib.sha256(file.encode("utf-8") + b"\0" + data).hexdigest()[:32]
+
+
+# ===== Job Queue =====
+
+class JobQueue(ABC):
+    """
+    Scan jobs shared between API replicas (which enqueue and poll) and scan workers (which claim and run).
+
+    Workers hold a lease renewed by heartbeats, a crashed worker's job is claimed again after
+    the lease expires and resumes from its checkpoint. Interactive jobs are claimed before batch jobs.
+    """
+
+    @abstractmethod
+    def enqueue(self, job_id: str, file: str, priority: str = "interactive", input_hash: Optional[str] = None) -> Job:
+        """
+        Adds a job. A failed or cancelled job with the same id is queued again (and resumes
+        from its checkpoint if the input is unchanged), a queued, running or finished one is left as it is.
+        """
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    def claim(self, worker: str) -> Optional[Job]:
+        """
+        Hands the next job to a worker, None if there is nothing to do.
+        """
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """
+        Renews the lease of a running job. Returns False if the worker should stop it.
+        """
+
+    @abstractmethod
+    def finish(self, job_id: str, status: str, report_name: Optional[str] = None, error: Optional[str] = None) -> None:
+        ...
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a job. Returns False if there is no such unfinished job.
+        """
+
+
+class SqliteJobQueue(JobQueue):
+    """
+    Job queue in one SQLite file, so it runs without outside services (one host).
+    """
+
+    def __init__(self, db_path: str = JOB_QUEUE_DB, lease: float = JOB_LEASE, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                file TEXT NOT NULL,
+                status TEXT NOT NULL,
+                priority TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                report_name TEXT,
+                error TEXT,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                input_hash TEXT
+            )""")
+        # Databases created before jobs were bound to their input
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if "input_hash" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN input_hash TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs(status, priority, created_at)")
+
+    def enqueue(self, job_id: str, file: str, priority: str = "interactive", input_hash: Optional[str] = None) -> Job:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, file, status, priority, created_at, updated_at, input_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, file, QUEUED, priority, now, now, input_hash)
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, file = ?, input_hash = ?, attempts = 0, cancel_requested = 0, error = NULL, "
+                "updated_at = ? WHERE job_id = ? AND status IN (?, ?)",
+                (QUEUED, file, input_hash, now, job_id, FAILED, CANCELLED)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return Job(*row[:5], bool(row[5]), *row[6:])
+
+    def claim(self, worker: str) -> Optional[Job]:
+        """
+        Hands the next job to a worker: interactive before batch, oldest first, including
+        running jobs whose lease expired. None if there is nothing to do.
+        """
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs of dead workers that were cancelled meanwhile or already used up their attempts
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, cancel_requested = 0, updated_at = ? "
+                    "WHERE status = ? AND updated_at < ? AND cancel_requested = 1",
+                    (CANCELLED, now, RUNNING, now - self.lease)
+                )
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = 'Worker lost too many times', updated_at = ? "
+                    "WHERE status = ? AND updated_at < ? AND attempts >= ?",
+                    (FAILED, now, RUNNING, now - self.lease, self.max_attempts)
+                )
+                row = self._conn.execute(
+                    "SELECT job_id FROM jobs WHERE status = ? OR (status = ? AND updated_at < ?) "
+                    "ORDER BY priority = 'batch', created_at LIMIT 1",
+                    (QUEUED, RUNNING, now - self.lease)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                    (RUNNING, worker, now, row[0])
+                )
+            finally:
+                self._conn.execute("COMMIT")
+
+        return self.get(row[0])
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """
+        Renews the lease of a running job. Returns False if the worker should stop it
+        (cancel requested, or the job was handed to another worker).
+        """
+
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE job_id = ? AND worker = ? AND status = ?",
+                (time.time(), job_id, worker, RUNNING)
+            )
+            row = self._conn.execute(
+                "SELECT cancel_requested, worker, status FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+
+        return row is not None and not row[0] and row[1] == worker and row[2] == RUNNING
+
+    def finish(self, job_id: str, status: str, report_name: Optional[str] = None, error: Optional[str] = None) -> None:
+        """
+        Records the outcome of a job (DONE, FAILED or CANCELLED).
+        """
+
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, report_name = ?, error = ?, cancel_requested = 0, updated_at = ? "
+                "WHERE job_id = ?",
+                (status, report_name, error, time.time(), job_id)
+            )
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a job: a queued one right away, a running one once its worker sees the request.
+        Returns False if there is no such unfinished job.
+        """
+
+        now = time.time()
+        with self._lock:
+            queued = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                (CANCELLED, now, job_id, QUEUED)
+            ).rowcount
+            running = self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = ?",
+                (job_id, RUNNING)
+            ).rowcount
+
+        return bool(queued or running)
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Returns the process-wide job queue (JOB_QUEUE_BACKEND), opened on first use.
+    """
+
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            if JOB_QUEUE_BACKEND == "sqlite":
+                _queue = SqliteJobQueue()
+            else:
+                from backends import load_backend
+                _queue = load_backend(JOB_QUEUE_BACKEND)()
+        return _queue
@@ -0,0 +1,127 @@
+from collections import OrderedDict
+from array import array
+from typing import Optional
+import threading
+import mmap
+import os
+
+# ===== Line Index Settings =====
+
+# Files at least this big are memory-mapped instead of read into memory
+MMAP_THRESHOLD = 1024 * 1024
+# Longest snippet attached to an issue, longer ranges are cut with a marker
+MAX_SNIPPET_LINES = 40
+# Indexes kept open per process (each may hold a file handle and an mmap)
+LINE_INDEX_MAX_FILES = int(os.getenv("LINE_INDEX_MAX_FILES", "32"))
+
+
+# ===== Line Offset Index =====
+
+class LineIndex:
+    """
+    Byte offsets of every line start in a file, built once per scan.
+    Any line range can then be sliced out in O(1) without splitting the file again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+        size = os.path.getsize(path)
+        if size >= MMAP_THRESHOLD:
+            self._file = open(path, "rb")
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            with open(path, "rb") as f:
+                self.data = f.read()
+
+        # offsets[i] is the start of line i + 1, the last entry is the end of the file
+        self.offsets = array("Q", [0])
+        position = self.data.find(b"\n")
+        while position != -1:
+            self.offsets.append(position + 1)
+            position = self.data.find(b"\n", position + 1)
+        if self.offsets[-1] != len(self.data):
+            self.offsets.append(len(self.data))
+
+    @property
+    def line_count(self) -> int:
+        return len(self.offsets) - 1
+
+    def snippet(self, start: int, end: int, max_lines: int = MAX_SNIPPET_LINES) -> str:
+        """
+        Text of lines start..end (1-based, inclusive), clamped to the file.
+        """
+
+        if end < start:
+            start, end = end, start
+        start = max(1, start)
+        end = min(self.line_count, end)
+        if start > end:
+            return ""
+
+        cut = end - start + 1 > max_lines
+        if cut:
+            end = start + max_lines - 1
+
+        text = self.data[self.offsets[start - 1]:self.offsets[end]].decode("utf-8", errors="replace")
+        if cut:
+            text += "...\n"
+        return text
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.data.close()
+            self._file.close()
+            self._file = None
+
+
+# ===== Per-Scan Registry =====
+
+_indexes: OrderedDict[tuple, LineIndex] = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_line_index(path: str) -> Optional[LineIndex]:
+    """
+    Returns the index for path, building it on first use.
+    Indexes are keyed by path, size and modification time, so an edited file is re-indexed.
+    The index of an older version of the file is closed then, and past LINE_INDEX_MAX_FILES
+    the least recently used index is closed, so long-lived workers do not pile up open files.
+    """
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+
+        for stale in [k for k in _indexes if k[0] == key[0]]:
+            _indexes.pop(stale).close()
+        index = LineIndex(path)
+        _indexes[key] = index
+        while len(_indexes) > LINE_INDEX_MAX_FILES:
+            _indexes.popitem(last=False)[1].close()
+        return index
+
+
+def attach_snippets(issues: list, path: str) -> list:
+    """
+    Fills the snippet of every issue from its [start, end] location.
+    """
+
+    index = get_line_index(path)
+    if index is None:
+        return issues
+
+    for issue in issues:
+        if len(issue.location) >= 1:
+            issue.snippet = index.snippet(issue.location[0], issue.location[-1])
+
+    return issues
@@ -0,0 +1,201 @@
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+
+from collections import OrderedDict
+from typing import Any, Optional
+import threading
+import hashlib
+import sqlite3
+import json
+import time
+import os
+
+from llm_scheduler import admit_pending_call
+
+# ===== LLM Response Cache Settings =====
+
+# "disk" (memory + SQLite), "memory" or "off"
+LLM_CACHE = os.getenv("LLM_CACHE", "disk")
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "llm_cache.sqlite")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))        # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))      # in-memory tier
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))  # disk tier
+
+# Message fields that change between identical calls and must not affect the key
+VOLATILE_FIELDS = {"id", "response_metadata", "usage_metadata"}
+
+
+def _strip_volatile(obj: Any) -> Any:
+    """
+    Recursively drops VOLATILE_FIELDS from a serialized message list.
+    """
+
+    if isinstance(obj, dict):
+        return {k: _strip_volatile(v) for k, v in obj.items() if k not in VOLATILE_FIELDS}
+    if isinstance(obj, list):
+        return [_strip_volatile(v) for v in obj]
+    return obj
+
+
+# ===== Cache =====
+
+class ResponseCache(BaseCache):
+    """
+    Exact-match cache for chat model responses, plugged in through the model's `cache` argument.
+
+    Keyed by the model + parameters string (includes bound tools and structured output schema)
+    and a hash of the normalized message list. Whole generations are stored, so tool calls and
+    structured (AIReport) outputs replay exactly as they were returned.
+
+    Two tiers: a small in-memory LRU in front of an optional SQLite store. Entries expire after
+    ttl_seconds and the disk store is trimmed back to max_bytes by least recent access.
+
+    Looked up before the LLM scheduler admits the call: only a miss waits for a slot and
+    is charged to the rate-limit buckets (admit_pending_call).
+    """
+
+    admits_on_miss = True
+
+    def __init__(self, db_path: Optional[str] = LLM_CACHE_DB, ttl_seconds: int = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._memory: OrderedDict[str, tuple[float, RETURN_VAL_TYPE]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if db_path:
+            db_dir = os.path.dirname(db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        """
+        Hash of the model/parameter string and the normalized messages.
+        """
+
+        try:
+            prompt = json.dumps(_strip_volatile(json.loads(prompt)), sort_keys=True)
+        except json.JSONDecodeError:
+            pass
+
+        return hashlib.sha256((llm_string + "\n" + prompt).encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        generations = self._lookup(prompt, llm_string)
+        if generations is None:
+            # Outside the lock, waiting for a scheduler slot must not block other lookups
+            admit_pending_call()
+        return generations
+
+    def _lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self.make_key(prompt, llm_string)
+        now = time.time()
+
+        with self._lock:
+            # Memory tier
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+            # Disk tier
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ? AND created_at >= ?",
+                    (key, now - self.ttl_seconds)
+                ).fetchone()
+                if row is not None:
+                    generations = loads(row[0], allowed_objects="core")
+                    self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    self._remember(key, row[1], generations)
+                    self.hits += 1
+                    return generations
+
+            self.misses += 1
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self.make_key(prompt, llm_string)
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, now, return_val)
+
+            if self._conn is not None:
+                value = dumps(return_val)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                    (key, value, len(value), now, now)
+                )
+                self._evict(now)
+                self._conn.commit()
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+
+    def _remember(self, key: str, created_at: float, generations: RETURN_VAL_TYPE) -> None:
+        """
+        Puts an entry into the in-memory LRU tier.
+        """
+
+        self._memory[key] = (created_at, generations)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float) -> None:
+        """
+        Drops expired rows, then least recently used rows until the store fits in max_bytes.
+        """
+
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            total -= size
+
+
+def get_response_cache() -> Optional[BaseCache]:
+    """
+    Builds the response cache selected by LLM_CACHE.
+    Returns None when caching is off (the model then behaves as if uncached).
+    """
+
+    if LLM_CACHE == "off":
+        return None
+    if LLM_CACHE == "memory":
+        return ResponseCache(db_path=None)
+    return ResponseCache()
@@ -0,0 +1,443 @@
+from contextlib import contextmanager, ExitStack
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+import itertools
+import threading
+import sqlite3
+import heapq
+import time
+import os
+
+# ===== Scheduler Settings =====
+
+# Provider quota, keep slightly under the real limits
+LLM_RPM = float(os.getenv("LLM_RPM", "60"))                  # requests per minute
+LLM_TPM = float(os.getenv("LLM_TPM", "250000"))              # tokens per minute
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+
+# Set to share the quota and concurrency limit between processes/workers on the same host (SQLite file)
+LLM_SCHEDULER_DB = os.getenv("LLM_SCHEDULER_DB", "")
+
+# A shared in-flight slot of a process that died is freed after this many seconds
+LLM_LEASE_TTL = float(os.getenv("LLM_LEASE_TTL", "300"))
+
+# Priority class of this process: interactive API scans go ahead of bulk batch scans
+SCAN_PRIORITY = os.getenv("SCAN_PRIORITY", "interactive")
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+# Share of the buckets that only interactive requests may use
+BATCH_RESERVE = 0.2
+
+# Backoff after a rate limit error, doubled on every consecutive 429
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+
+
+def estimate_tokens(data: Any) -> int:
+    """
+    Rough input token estimate (~4 chars per token) for a message list or rendered prompt.
+    """
+
+    if hasattr(data, "to_messages"):
+        return estimate_tokens(data.to_messages())
+    if isinstance(data, str):
+        return len(data) // 4 + 1
+    if isinstance(data, dict):
+        return sum(estimate_tokens(v) for v in data.values())
+    if isinstance(data, (list, tuple)):
+        return sum(estimate_tokens(v) for v in data)
+    if hasattr(data, "content"):
+        return estimate_tokens(data.content)
+    return 1
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    Detects provider rate limit errors (HTTP 429 / RESOURCE_EXHAUSTED).
+    """
+
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    text = f"{type(error).__name__} {error}"
+    return "429" in text or "ResourceExhausted" in text or "RESOURCE_EXHAUSTED" in text
+
+
+# ===== Cache-Aware Admission =====
+
+# Takes the slot of the call being invoked, set while a call on a model with an admitting cache runs
+_pending_admission: ContextVar[Optional[Callable[[], None]]] = ContextVar("pending_llm_admission", default=None)
+
+
+def admit_pending_call() -> None:
+    """
+    Called by a response cache on a miss, right before the call goes to the provider:
+    blocks until the scheduler admits it. Cache hits never call it, so they take no slot
+    and no bucket budget. Does nothing outside LLMScheduler.invoke.
+    """
+
+    admit = _pending_admission.get()
+    if admit is not None:
+        admit()
+
+
+def _admits_on_miss(runnable) -> bool:
+    """
+    Whether the chat model inside runnable (bound tools, structured output) has a response
+    cache that calls admit_pending_call on a miss.
+    """
+
+    while runnable is not None:
+        cache = getattr(runnable, "cache", None)
+        if getattr(cache, "admits_on_miss", False):
+            return True
+        runnable = getattr(runnable, "bound", None) or getattr(runnable, "first", None)
+    return False
+
+
+# ===== Token Buckets =====
+
+class LocalBuckets:
+    """
+    Request and token buckets and the concurrency limit, shared by all threads of this process.
+    """
+
+    def __init__(self, rpm: float, tpm: float, max_concurrency: int):
+        self.capacity = {"requests": rpm, "tokens": tpm}
+        self.rate = {"requests": rpm / 60, "tokens": tpm / 60}
+        self.level = dict(self.capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.active = 0
+        self.consecutive_429 = 0
+        self._lock = threading.Lock()
+
+    def try_take(self, requests: float, tokens: float, reserve: float) -> float:
+        """
+        Takes from both buckets if possible. Returns 0 on success, else seconds to wait.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+
+            elapsed = now - self.updated_at
+            self.updated_at = now
+            for name in self.level:
+                self.level[name] = min(self.capacity[name], self.level[name] + elapsed * self.rate[name])
+
+            return _take(self.level, self.capacity, self.rate, {"requests": requests, "tokens": tokens}, reserve)
+
+    def charge(self, tokens: float) -> None:
+        """
+        Charges tokens used beyond the estimate (the bucket may go into debt).
+        """
+
+        with self._lock:
+            self.level["tokens"] -= tokens
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def try_start(self) -> Optional[int]:
+        """
+        Takes an in-flight slot if the concurrency limit allows. Returns a lease for finish(), else None.
+        """
+
+        with self._lock:
+            if self.active >= int(self.limit):
+                return None
+            self.active += 1
+            return 0
+
+    def finish(self, lease: int) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.consecutive_429 = 0
+            self.limit = min(self.max_concurrency, self.limit + 1 / max(self.limit, 1))
+
+    def on_rate_limited(self) -> tuple[int, int]:
+        """
+        Halves the concurrency limit. Returns the consecutive 429 count and the new limit.
+        """
+
+        with self._lock:
+            self.consecutive_429 += 1
+            self.limit = max(1.0, self.limit / 2)
+            return self.consecutive_429, int(self.limit)
+
+
+class SqliteBuckets:
+    """
+    Same as LocalBuckets but stored in a SQLite file, so every worker process on the host
+    draws from one quota, sees each other's 429 backoffs and shares one concurrency limit.
+    Every scan runs in its own process, so this is what makes the limit adapt across scans.
+    In-flight calls are leases that expire after LLM_LEASE_TTL, in case a process dies mid-call.
+    """
+
+    def __init__(self, db_path: str, rpm: float, tpm: float, max_concurrency: int):
+        self.capacity = {"requests": rpm, "tokens": tpm}
+        self.rate = {"requests": rpm / 60, "tokens": tpm / 60}
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL, updated_at REAL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS leases (id INTEGER PRIMARY KEY AUTOINCREMENT, expires_at REAL)")
+        for name, capacity in self.capacity.items():
+            self._conn.execute("INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)", (name, capacity, time.time()))
+        self._conn.execute("INSERT OR IGNORE INTO buckets VALUES ('paused_until', 0, 0)")
+        self._conn.execute("INSERT OR IGNORE INTO buckets VALUES ('concurrency_limit', ?, 0)", (float(max_concurrency),))
+        self._conn.execute("INSERT OR IGNORE INTO buckets VALUES ('consecutive_429', 0, 0)")
+
+    def try_take(self, requests: float, tokens: float, reserve: float) -> float:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                rows = dict((name, (level, updated_at)) for name, level, updated_at
+                            in self._conn.execute("SELECT name, level, updated_at FROM buckets"))
+                if now < rows["paused_until"][0]:
+                    return rows["paused_until"][0] - now
+
+                level = {
+                    name: min(self.capacity[name], rows[name][0] + (now - rows[name][1]) * self.rate[name])
+                    for name in self.capacity
+                }
+                wait = _take(level, self.capacity, self.rate, {"requests": requests, "tokens": tokens}, reserve)
+                for name, value in level.items():
+                    self._conn.execute("UPDATE buckets SET level = ?, updated_at = ? WHERE name = ?", (value, now, name))
+                return wait
+            finally:
+                self._conn.execute("COMMIT")
+
+    def charge(self, tokens: float) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE buckets SET level = level - ? WHERE name = 'tokens'", (tokens,))
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE buckets SET level = MAX(level, ?) WHERE name = 'paused_until'",
+                               (time.time() + seconds,))
+
+    def _value(self, name: str) -> float:
+        return self._conn.execute("SELECT level FROM buckets WHERE name = ?", (name,)).fetchone()[0]
+
+    def try_start(self) -> Optional[int]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                self._conn.execute("DELETE FROM leases WHERE expires_at < ?", (now,))
+                active = self._conn.execute("SELECT COUNT(*) FROM leases").fetchone()[0]
+                limit = min(self.max_concurrency, self._value("concurrency_limit"))
+                if active >= int(limit):
+                    return None
+                return self._conn.execute("INSERT INTO leases (expires_at) VALUES (?)", (now + LLM_LEASE_TTL,)).lastrowid
+            finally:
+                self._conn.execute("COMMIT")
+
+    def finish(self, lease: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE id = ?", (lease,))
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("UPDATE buckets SET level = 0 WHERE name = 'consecutive_429'")
+                self._conn.execute("UPDATE buckets SET level = MIN(?, level + 1.0 / MAX(level, 1)) WHERE name = 'concurrency_limit'",
+                                   (float(self.max_concurrency),))
+            finally:
+                self._conn.execute("COMMIT")
+
+    def on_rate_limited(self) -> tuple[int, int]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("UPDATE buckets SET level = level + 1 WHERE name = 'consecutive_429'")
+                self._conn.execute("UPDATE buckets SET level = MAX(1, level / 2) WHERE name = 'concurrency_limit'")
+                return int(self._value("consecutive_429")), int(self._value("concurrency_limit"))
+            finally:
+                self._conn.execute("COMMIT")
+
+
+def _take(level: dict, capacity: dict, rate: dict, amount: dict, reserve: float) -> float:
+    """
+    Takes amount from every bucket in level (in place) or none of them.
+    Requests larger than a bucket are admitted once that bucket is full.
+    Returns 0 on success, else the seconds until enough has refilled.
+    """
+
+    wait = 0.0
+    for name, needed in amount.items():
+        needed = min(needed, capacity[name] * (1 - reserve))
+        floor = capacity[name] * reserve
+        if level[name] - needed < floor:
+            wait = max(wait, (needed + floor - level[name]) / rate[name])
+
+    if wait > 0:
+        return wait
+
+    for name, needed in amount.items():
+        level[name] -= min(needed, capacity[name] * (1 - reserve))
+    return 0.0
+
+
+# ===== Scheduler =====
+
+class LLMScheduler:
+    """
+    Process-wide gate in front of every LLM invoke.
+
+    1. Token buckets for requests and tokens per minute (optionally shared between workers).
+    2. Priority classes: waiting interactive calls are always served before batch calls,
+       and batch calls cannot use the last BATCH_RESERVE of either bucket.
+    3. Adaptive concurrency (AIMD): the in-flight limit halves on a 429 and creeps back up
+       on success, and a 429 pauses every caller for an exponential backoff.
+
+    With LLM_SCHEDULER_DB the buckets, backoff and concurrency limit are shared by every
+    process on the host. The priority order is kept between the threads of one process,
+    across processes batch calls are held back by BATCH_RESERVE only.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, db_path: str = LLM_SCHEDULER_DB):
+        if db_path:
+            self.buckets = SqliteBuckets(db_path, rpm, tpm, max_concurrency)
+        else:
+            self.buckets = LocalBuckets(rpm, tpm, max_concurrency)
+
+        self._waiters: list[tuple[int, int]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, priority: str = SCAN_PRIORITY, tokens: int = 1, deadline: Optional[float] = None):
+        """
+        Blocks until the call may run under the quota, concurrency limit and priority order.
+        Raises TimeoutError if no slot is free before deadline (time.monotonic() value).
+        """
+
+        rank = PRIORITIES.get(priority, PRIORITIES["batch"])
+        reserve = BATCH_RESERVE if rank > 0 else 0.0
+        ticket = (rank, next(self._counter))
+
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            while True:
+                wait = 0.5
+                lease = self.buckets.try_start() if self._waiters[0] == ticket else None
+                if lease is not None:
+                    wait = self.buckets.try_take(1, tokens, reserve)
+                    if wait == 0:
+                        heapq.heappop(self._waiters)
+                        break
+                    self.buckets.finish(lease)
+
+                if deadline is not None and time.monotonic() >= deadline:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                    raise TimeoutError("Deadline passed while waiting for an LLM rate-limit slot")
+
+                self._cond.wait(timeout=min(wait, 5.0))
+
+        try:
+            yield
+        finally:
+            self.buckets.finish(lease)
+            with self._cond:
+                self._cond.notify_all()
+
+    def on_success(self) -> None:
+        self.buckets.on_success()
+        with self._cond:
+            self._cond.notify_all()
+
+    def on_rate_limited(self) -> float:
+        """
+        Multiplicative decrease of the concurrency limit and a shared backoff pause.
+        """
+
+        consecutive_429, limit = self.buckets.on_rate_limited()
+        backoff = min(BACKOFF_MAX, BACKOFF_BASE ** consecutive_429)
+
+        print(f"Rate limited by LLM provider, backing off {backoff:.0f}s (concurrency limit {limit})")
+        self.buckets.pause(backoff)
+        return backoff
+
+    def invoke(self, runnable, data: Any, priority: str = SCAN_PRIORITY, timeout: Optional[float] = None) -> Any:
+        """
+        runnable.invoke(data) under the scheduler, retrying on rate limit errors.
+        With a timeout (seconds) no new slot or retry is started once it has passed.
+        If the model's response cache admits on a miss, the slot is only taken on a miss
+        (see admit_pending_call): cached answers cost no slot and no quota.
+        """
+
+        tokens = estimate_tokens(data)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        deferred = _admits_on_miss(runnable)
+
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            charged = False
+            with ExitStack() as stack:
+                def admit():
+                    nonlocal charged
+                    if not charged:
+                        stack.enter_context(self.slot(priority, tokens, deadline))
+                        charged = True
+
+                if not deferred:
+                    admit()
+                pending = _pending_admission.set(admit)
+                try:
+                    response = runnable.invoke(data)
+                except Exception as e:
+                    if not is_rate_limit_error(e) or attempt == LLM_MAX_RETRIES:
+                        raise
+                    rate_limited = True
+                else:
+                    rate_limited = False
+                finally:
+                    _pending_admission.reset(pending)
+
+            if rate_limited:
+                backoff = self.on_rate_limited()
+                if deadline is not None and time.monotonic() + backoff >= deadline:
+                    raise TimeoutError("Deadline passed while backing off from LLM rate limits")
+                continue
+
+            if not charged:
+                # Answered from the response cache
+                return response
+
+            # Reconcile the estimate with what the provider actually counted
+            usage = getattr(response, "usage_metadata", None)
+            if usage and usage.get("total_tokens", 0) > tokens:
+                self.buckets.charge(usage["total_tokens"] - tokens)
+
+            self.on_success()
+            return response
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """
+    Returns the process-wide scheduler, created on first use.
+    """
+
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
@@ -0,0 +1,52 @@
+from typing import Optional
+import os
+
+# ===== LLM Backends =====
+
+# "gemini" (default) or "ollama" (local)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral:7b-instruct")
+
+
+def build_chat_model(backend: str = LLM_BACKEND, cache=None, timeout: Optional[float] = None, json_mode: bool = False,
+                     model: Optional[str] = None):
+    """
+    Builds the chat model for the selected backend.
+    The provider package is imported here, so only the backend in use is ever loaded.
+    timeout bounds every request made by the model (seconds).
+    json_mode constrains the output to plain JSON (for streamed structured output).
+    model overrides the backend's configured model (see model_router.py).
+    Both backends reuse the static prefix of their prompts and record token usage (see prompt_cache.py).
+    """
+
+    from prompt_cache import get_usage_recorder, OLLAMA_KEEP_ALIVE
+
+    if backend == "ollama":
+        # Ollama - Mistral:7b-instruct, local alternative
+        from langchain_ollama import ChatOllama
+
+        return ChatOllama(
+            model=model or OLLAMA_MODEL,
+            temperature=0.1,
+            cache=cache,
+            client_kwargs={"timeout": timeout},
+            format="json" if json_mode else None,
+            keep_alive=OLLAMA_KEEP_ALIVE,   # KV cache of the shared prompt prefix stays loaded
+            callbacks=[get_usage_recorder()],
+        )
+
+    if backend == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(
+            model=model or GEMINI_MODEL,
+            temperature=0,
+            cache=cache,
+            timeout=timeout,
+            max_retries=0,      # Rate limit retries are left to the scheduler (llm_scheduler.py)
+            response_mime_type="application/json" if json_mode else None,
+            callbacks=[get_usage_recorder()],
+        )
+
+    raise ValueError(f"Unknown LLM backend: {backend}")
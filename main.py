@@ -1,86 +1,258 @@
 # ===== IMPORTS ======
 import fastapi
 import uvicorn
-import subprocess
-import shutil
+import asyncio
 import os
-import pathlib
-from fastapi.responses import FileResponse, JSONResponse
-from fastapi import UploadFile, File, HTTPException
+import posixpath
+import uuid
+import json
+from typing import Optional
+from fastapi.responses import JSONResponse, Response
+from fastapi import UploadFile, File, Form, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+
+from artifact_store import get_artifact_store, content_hash, KIND_REPORT, KIND_DIFF, KIND_UPLOAD
+from http_cache import conditional_response
+from job_queue import get_job_queue, input_hash, Job, DONE, FAILED, CANCELLED, FINISHED
+from deadlines import SCAN_TIMEOUT
 
 
 # ===== Create FastAPI App =====
+# Stateless: uploads and reports live in the shared artifact store and scans run on
+# scan workers (scan_worker.py) through the shared job queue, so any number of API
+# replicas can sit behind one load balancer and answer for any job.
 app = fastapi.FastAPI()
 
-# Define directories
-INPUTS_DIR = pathlib.Path("inputs")
-SCRIPT_PATH = "report_generator_react.py"
+# Queue and store calls (SQLite, zlib) are blocking and run in the threadpool, not on the event loop.
+
+# Uploads without a project or path are filed under uploads/<job_id>/<file name>: such a
+# report is never diffed against (or suppressed like) another client's file of the same name
+UPLOADS_PREFIX = "uploads"
+
+# Seconds between job status polls (and client disconnect checks) while waiting for a scan
+JOB_POLL_INTERVAL = 0.5
+# How long a request waits for its scan, queue time included
+SCAN_WAIT_TIMEOUT = float(os.getenv("SCAN_WAIT_TIMEOUT", str(SCAN_TIMEOUT + 60)))
+
+
+# ===== Job Results =====
+
+def report_response(request: Request, name: str, delta: bool = False, headers: Optional[dict] = None) -> Optional[Response]:
+    """
+    Stored report (or its diff) with an ETag, conditional (304) and compressed as negotiated.
+    None if it is not in the artifact store.
+    """
+
+    store = get_artifact_store()
+    kind = KIND_DIFF if delta else KIND_REPORT
+
+    etag = store.etag(name, kind)
+    if etag is None:
+        return None
+
+    filename = "security_report_diff.json" if delta else "security_report.json"
+    return conditional_response(
+        request, etag, lambda: store.get(name, kind),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', **(headers or {})}
+    )
+
+
+def job_response(request: Request, job: Job, delta: bool = False) -> Response:
+    """
+    Response for a job: the report (or diff) once done, the error if it failed, else its status.
+    """
+
+    if job.status == DONE:
+        # Use the diff (new/resolved/unchanged issues) if only the change set was asked for
+        response = report_response(request, job.report_name, delta, headers={"X-Job-Id": job.job_id})
+        if response is None:
+            return JSONResponse(
+                status_code=500,
+                content={"error": "Report not found in artifact store.", "job_id": job.job_id}
+            )
+        return response
+
+    if job.status == FAILED:
+        # Completed nodes are checkpointed, retrying with this job_id resumes the scan
+        return JSONResponse(
+            status_code=500,
+            content={"error": job.error, "job_id": job.job_id, "hint": "Retry with the same job_id to resume"}
+        )
+
+    if job.status == CANCELLED:
+        # 499: client closed request (nginx convention)
+        return JSONResponse(
+            status_code=499,
+            content={"error": "Analysis cancelled. Retry with the same job_id to resume", "job_id": job.job_id}
+        )
+
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job.job_id, "status": job.status},
+        headers={"X-Job-Id": job.job_id}
+    )
+
+
+async def wait_for_job(request: Request, job_id: str) -> Optional[Job]:
+    """
+    Polls the job queue until the job is finished. The job is cancelled if the client
+    disconnects, so workers never keep scanning for nobody. None after SCAN_WAIT_TIMEOUT.
+    """
+
+    queue = get_job_queue()
+    deadline = asyncio.get_running_loop().time() + SCAN_WAIT_TIMEOUT
+
+    while asyncio.get_running_loop().time() < deadline:
+        job = await run_in_threadpool(queue.get, job_id)
+        if job.status in FINISHED:
+            return job
+
+        if await request.is_disconnected():
+            await run_in_threadpool(queue.cancel, job_id)
+            return await run_in_threadpool(queue.get, job_id)
+
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    return None
+
+def report_identity(filename: str, path: Optional[str], project: Optional[str], job_id: str) -> str:
+    """
+    Name a scan is filed under, the same on every replica and worker: project/path as sent by
+    the client (e.g. "payments/envs/prod/main.tf"). Reports of the same identity are diffed
+    against each other and suppression entries match it.
+    """
+
+    basename = posixpath.basename(filename.replace("\\", "/"))
+    if not path and not project:
+        return posixpath.join(UPLOADS_PREFIX, job_id, basename)
 
-# Create the inputs directory if it doesn't exist
-INPUTS_DIR.mkdir(exist_ok=True)
+    parts = []
+    for part in (project, path or basename):
+        # Relative and inside its parent: "a/../../b" or "/etc" never escape the project
+        part = posixpath.normpath((part or ".").replace("\\", "/").lstrip("/"))
+        if part == ".." or part.startswith("../"):
+            raise HTTPException(status_code=400, detail=f"Invalid project or path: {project!r}, {path!r}")
+        if part != ".":
+            parts.append(part)
+
+    identity = posixpath.join(*parts) if parts else ""
+    if not identity or identity.split("/")[0] == UPLOADS_PREFIX:
+        raise HTTPException(status_code=400, detail=f"Invalid project or path: {project!r}, {path!r}")
+    return identity
 
 # ===== API ROUTES =====
 
 @app.post("/scan/")
-async def scan_iac_file(file: UploadFile = File(...)):
+async def scan_iac_file(request: Request, file: UploadFile = File(...), path: Optional[str] = Form(None),
+                        project: Optional[str] = Form(None), job_id: Optional[str] = None,
+                        delta: bool = False, wait: bool = True):
     """
     Endpoint to upload an IaC file for analysis.
+    The optional path (in the repository) and project form fields identify the file: its
+    report is diffed against the previous scan of the same project/path, and path-scoped
+    suppression entries match on it. Without them every upload is a file of its own.
+    Pass the job_id of a failed or timed out scan to resume it instead of starting over
+    (same file only: a job_id is bound to its input, another file under a finished or
+    running job's id is rejected with 409).
+    With delta=true only the changes since the previous scan of the same project/path are returned.
+    With wait=false the job_id is returned at once (202), poll GET /scan/{job_id} for the result.
     """
-    
-    # 1. Save the uploaded file to the 'inputs/' directory
-    input_filepath = INPUTS_DIR / file.filename
+
+    # Every scan is a checkpointed job, retries with the same job_id resume it
+    job_id = job_id or uuid.uuid4().hex
+    queue = get_job_queue()
+    source_file = report_identity(file.filename or "upload", path, project, job_id)
+
     try:
-        with input_filepath.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
+        data = await file.read()
     finally:
-        file.file.close()
+        await file.close()
+    digest = input_hash(data, source_file)
 
-    # 2. Run report_generator_react.py script
-    try:
-        # Run as subprocess
-        process = subprocess.run(
-            ["python", SCRIPT_PATH, str(input_filepath)],
-            capture_output=True,  # Capture stdout and stderr
-            text=True,
-            check=False,          # Don't raise an error on non-zero exit
-            timeout=300           # 5-minute timeout
-        )
+    job = await run_in_threadpool(queue.get, job_id)
+    if job is not None and job.status not in (FAILED, CANCELLED) and job.input_hash not in (None, digest):
+        raise HTTPException(status_code=409, detail=f"job_id {job_id} belongs to a scan of another file")
 
-        # Handle script errors
-        if process.returncode != 0:
-            return JSONResponse(
-                status_code=500,
-                content={"error": "Analysis script failed", "stderr": process.stderr}
-            )
+    if job is None or job.status in (FAILED, CANCELLED):
+        # 1. Put the uploaded file into the shared artifact store, for whichever worker claims the job
+        try:
+            await run_in_threadpool(get_artifact_store().put, job_id, KIND_UPLOAD, data, source_file)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
 
-        # 3. Find the report file path from the script's output
-        stdout = process.stdout
-        report_path = None
-        for line in stdout.splitlines():
-            if line.startswith("FINAL_REPORT_PATH:"):
-                report_path = line.split("FINAL_REPORT_PATH:")[1].strip()
-                break
-        
-        if not report_path or not os.path.exists(report_path):
-            return JSONResponse(
-                status_code=500,
-                content={
-                    "error": "Script ran but backend could not find report path.",
-                    "stdout": stdout
-                }
-            )
+        # 2. Queue the scan (interactive, ahead of batch jobs), a changed input starts over instead of resuming
+        job = await run_in_threadpool(queue.enqueue, job_id, source_file, priority="interactive", input_hash=digest)
+
+    if not wait or job.status in FINISHED:
+        return await run_in_threadpool(job_response, request, job, delta)
 
-        # 4. Send the report JSON file back to the user
-        return FileResponse(
-            path=report_path,
-            media_type="application/json",
-            filename="security_report.json"
+    # 3. Wait for a worker to finish it, stopped on client disconnect
+    job = await wait_for_job(request, job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=504,
+            content={"error": "Analysis still running, poll GET /scan/{job_id} for the result", "job_id": job_id}
         )
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
+    # 4. Send the report JSON back to the user
+    return await run_in_threadpool(job_response, request, job, delta)
+
+
+@app.get("/scan/{job_id}")
+async def get_scan(request: Request, job_id: str, delta: bool = False):
+    """
+    Status of a scan job, or its report once done. Served by any replica.
+    """
+
+    job = await run_in_threadpool(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No scan with job_id {job_id}")
+
+    return await run_in_threadpool(job_response, request, job, delta)
+
+
+@app.delete("/scan/{job_id}")
+async def cancel_scan(job_id: str):
+    """
+    Cancels a queued or running scan. Its LLM calls and checkov runs stop within a
+    heartbeat, completed steps stay checkpointed and can be resumed with the same job_id.
+    """
+
+    if not await run_in_threadpool(get_job_queue().cancel, job_id):
+        raise HTTPException(status_code=404, detail=f"No unfinished scan with job_id {job_id}")
+
+    return {"job_id": job_id, "status": "cancelling"}
+
+
+@app.get("/reports")
+async def list_reports(request: Request, file: str = "", limit: int = Query(100, ge=1, le=1000),
+                       offset: int = Query(0, ge=0)):
+    """
+    Stored reports, newest first, optionally only those of one scanned file.
+    Supports If-None-Match like the reports themselves.
+    """
+
+    rows = await run_in_threadpool(get_artifact_store().list, KIND_REPORT, limit=limit, offset=offset, file=file)
+    body = json.dumps([
+        {"name": name, "file": report_file, "size": size, "created_at": created_at}
+        for name, report_file, size, created_at in rows
+    ]).encode("utf-8")
+
+    return await run_in_threadpool(conditional_response, request, content_hash(body), lambda: body)
+
+
+@app.get("/reports/{name}")
+async def get_report(request: Request, name: str, delta: bool = False):
+    """
+    A stored report by name (delta=true: its diff against the previous scan).
+    Strong ETags from the content hash, 304 on If-None-Match, gzip/brotli as negotiated.
+    """
+
+    response = await run_in_threadpool(report_response, request, name, delta)
+    if response is None:
+        raise HTTPException(status_code=404, detail=f"No stored report named {name}")
+
+    return response
 
 
 if __name__ == "__main__":
@@ -0,0 +1,230 @@
+# ADAPTIVE MODEL ROUTING
+# Picks a model tier per scan stage from the complexity of the input, and escalates
+# to the stronger tier when the cheaper model's output does not validate.
+#
+# Per-tier latency and escalation rates: python model_router.py
+
+from typing import Any, Callable, Optional
+import threading
+import sqlite3
+import time
+import os
+
+from llms import LLM_BACKEND, GEMINI_MODEL, OLLAMA_MODEL
+
+# ===== Routing Settings =====
+
+# "on" or "off". Off by default until the evaluation harness (benchmarks/eval_pipelines.py)
+# shows the small tier holds up on the labeled corpus
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "off")
+
+SMALL = "small"
+LARGE = "large"
+
+# The large tier is the configured default model, the small tier a cheaper/faster (or local) one
+SMALL_BACKEND = os.getenv("ROUTER_SMALL_BACKEND", LLM_BACKEND)
+SMALL_MODEL = os.getenv("ROUTER_SMALL_MODEL", "gemini-2.5-flash-lite" if SMALL_BACKEND == "gemini" else OLLAMA_MODEL)
+TIERS = {
+    SMALL: (SMALL_BACKEND, SMALL_MODEL),
+    LARGE: (LLM_BACKEND, GEMINI_MODEL if LLM_BACKEND == "gemini" else OLLAMA_MODEL),
+}
+
+# Inputs above any of these limits go straight to the large tier
+MAX_SMALL_LINES = int(os.getenv("ROUTER_MAX_SMALL_LINES", "300"))
+MAX_SMALL_RESOURCES = int(os.getenv("ROUTER_MAX_SMALL_RESOURCES", "20"))
+MAX_SMALL_FINDINGS = int(os.getenv("ROUTER_MAX_SMALL_FINDINGS", "25"))
+
+# Where routing decisions and latencies are recorded (shared by all scan processes)
+ROUTER_STATS_DB = os.getenv("ROUTER_STATS_DB", "router_stats.sqlite")
+
+
+def complexity(lines: int, resources: int = 0, findings: int = 0) -> dict:
+    """
+    Complexity of a scan input as stored in graph state.
+    """
+
+    return {"lines": lines, "resources": resources, "findings": findings}
+
+
+def routing_enabled() -> bool:
+    return MODEL_ROUTING == "on" and TIERS[SMALL] != TIERS[LARGE]
+
+
+def choose_tier(score: dict) -> str:
+    if not routing_enabled():
+        return LARGE
+    if (score.get("lines", 0) > MAX_SMALL_LINES
+            or score.get("resources", 0) > MAX_SMALL_RESOURCES
+            or score.get("findings", 0) > MAX_SMALL_FINDINGS):
+        return LARGE
+    return SMALL
+
+
+# ===== Routing Stats =====
+
+class RouterStats:
+    """
+    Every routed call: stage, tier, latency, whether its output was valid and whether it was an escalation.
+    """
+
+    def __init__(self, db_path: str = ROUTER_STATS_DB):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS routed_calls (
+                stage TEXT NOT NULL,
+                tier TEXT NOT NULL,
+                model TEXT NOT NULL,
+                latency REAL NOT NULL,
+                ok INTEGER NOT NULL,
+                escalation INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            )""")
+        self._conn.commit()
+
+    def record(self, stage: str, tier: str, latency: float, ok: bool, escalation: bool) -> None:
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO routed_calls VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (stage, tier, "/".join(TIERS[tier]), latency, int(ok), int(escalation), time.time())
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            # Stats must never fail a scan
+            print(f"Could not record routing stats: {e}")
+
+    def summary(self, since: float = 0) -> list:
+        """
+        Per stage and tier: calls, p50/p95 latency, share of invalid outputs and escalations.
+        """
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, tier, model, latency, ok, escalation FROM routed_calls WHERE created_at >= ?", (since,)
+            ).fetchall()
+
+        groups: dict[tuple, list] = {}
+        for stage, tier, model, latency, ok, escalation in rows:
+            groups.setdefault((stage, tier, model), []).append((latency, ok, escalation))
+
+        summary = []
+        for (stage, tier, model), calls in sorted(groups.items()):
+            latencies = sorted(latency for latency, _, _ in calls)
+            summary.append({
+                "stage": stage,
+                "tier": tier,
+                "model": model,
+                "calls": len(calls),
+                "p50_s": latencies[len(latencies) // 2],
+                "p95_s": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "invalid_rate": sum(1 for _, ok, _ in calls if not ok) / len(calls),
+                "escalations": sum(1 for _, _, escalation in calls if escalation),
+            })
+        return summary
+
+
+_stats: Optional[RouterStats] = None
+_stats_lock = threading.Lock()
+
+
+def get_router_stats() -> RouterStats:
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = RouterStats()
+        return _stats
+
+
+# ===== Router =====
+
+class ModelRouter:
+    """
+    Model tiers of one scan stage (thinker or writer), built on first use.
+
+    run() starts at the tier the input's complexity calls for. If the small tier fails
+    or its output does not validate, the call is repeated once on the large tier, within
+    what is left of the stage's deadline.
+    """
+
+    def __init__(self, stage: str, build: Callable[[str, str, str], Any]):
+        self.stage = stage
+        self.build = build      # (tier, backend, model) -> LLM
+        self._llms: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def llm(self, tier: str) -> Any:
+        with self._lock:
+            if tier not in self._llms:
+                self._llms[tier] = self.build(tier, *TIERS[tier])
+            return self._llms[tier]
+
+    def _record(self, tier: str, latency: float, ok: bool, escalation: bool) -> None:
+        # Without routing every call is a large tier call, nothing to measure
+        if routing_enabled():
+            get_router_stats().record(self.stage, tier, latency, ok, escalation)
+
+    def run(self, score: dict, call: Callable[[Any, bool, Optional[float]], tuple], timeout: Optional[float] = None) -> Any:
+        """
+        call(llm, last, timeout) -> (result, valid). last is True on the large tier, where there
+        is nothing left to escalate to (the call should repair what it can instead). timeout is
+        the time left of the stage's deadline (seconds), an escalation only gets what the
+        small tier left of it.
+        """
+
+        tier = choose_tier(score)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        start = time.perf_counter()
+        try:
+            result, valid = call(self.llm(tier), tier == LARGE, timeout)
+        except Exception as e:
+            if tier == LARGE:
+                self._record(tier, time.perf_counter() - start, False, False)
+                raise
+            print(f"{self.stage} failed on the {SMALL} model: {e}")
+            result, valid = None, False
+
+        self._record(tier, time.perf_counter() - start, valid, False)
+        if tier == LARGE or valid:
+            return result
+
+        remaining = deadline - time.monotonic() if deadline is not None else None
+        if remaining is not None and remaining <= 0:
+            if result is None:
+                raise TimeoutError(f"{self.stage} deadline passed on the {SMALL} model")
+            print(f"No time left to escalate {self.stage}, keeping the {SMALL} model's output")
+            return result
+
+        print(f"Escalating {self.stage} to the {LARGE} model")
+        start = time.perf_counter()
+        try:
+            result, valid = call(self.llm(LARGE), True, remaining)
+        except Exception:
+            self._record(LARGE, time.perf_counter() - start, False, True)
+            raise
+
+        self._record(LARGE, time.perf_counter() - start, valid, True)
+        return result
+
+
+# ===== CLI =====
+
+if __name__ == "__main__":
+    import sys
+
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 24
+    rows = get_router_stats().summary(since=time.time() - hours * 3600)
+
+    print(f"Routed LLM calls, last {hours:g}h")
+    print(f"{'stage':<8} {'tier':<6} {'model':<32} {'calls':>6} {'p50 s':>7} {'p95 s':>7} {'invalid':>8} {'escalated':>10}")
+    small_calls: dict[str, int] = {}
+    for row in rows:
+        if row["tier"] == SMALL:
+            small_calls[row["stage"]] = row["calls"]
+        print(f"{row['stage']:<8} {row['tier']:<6} {row['model']:<32} {row['calls']:>6} {row['p50_s']:>7.2f} "
+              f"{row['p95_s']:>7.2f} {row['invalid_rate'] * 100:>7.1f}% {row['escalations']:>10}")
+
+    for row in rows:
+        if row["tier"] == LARGE and small_calls.get(row["stage"]):
+            print(f"{row['stage']} escalation rate: {row['escalations'] / small_calls[row['stage']] * 100:.1f}% of small tier calls")
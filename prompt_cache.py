@@ -0,0 +1,223 @@
+# PROMPT PREFIX CACHING
+# Prompts (prompts.py) start with their static part, and the thinker's history is only ever
+# appended to (graph_functions.thinker_messages), so consecutive calls share a long prefix:
+# - Gemini: implicit caching applies to any repeated prefix. Explicit context caches are not
+#   used: they need a prefix of at least 1024 tokens, and the static system prompts and tools
+#   are far shorter (about 300 and 600 tokens).
+# - Ollama: the model is kept loaded (OLLAMA_KEEP_ALIVE), so the KV cache of the shared prefix
+#   is reused instead of evaluating the prompt from the start.
+# Token usage of every call, with the cached share and time to first token, is recorded.
+# Usage rows are written in batches and purged after PROMPT_USAGE_TTL.
+#
+# Usage per model: python prompt_cache.py [hours]
+
+from langchain_core.callbacks import BaseCallbackHandler
+from typing import Any, Optional
+import threading
+import atexit
+import sqlite3
+import time
+import os
+
+# ===== Prompt Cache Settings =====
+
+# How long Ollama keeps the model (and its KV cache) loaded after a call
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# Token usage of every call, shared by all scan processes
+PROMPT_CACHE_DB = os.getenv("PROMPT_CACHE_DB", "prompt_cache.sqlite")
+
+# How long token usage rows are kept
+PROMPT_USAGE_TTL = int(os.getenv("PROMPT_USAGE_TTL", str(30 * 24 * 3600)))     # seconds
+# Usage rows are buffered and written once this many are pending or this many seconds passed
+USAGE_FLUSH_ROWS = 50
+USAGE_FLUSH_INTERVAL = 10
+
+
+# ===== Store =====
+
+class PromptCacheStore:
+    """
+    Token usage of every LLM call, usage older than ttl_seconds is removed on startup.
+    """
+
+    def __init__(self, db_path: str = PROMPT_CACHE_DB, ttl_seconds: int = PROMPT_USAGE_TTL):
+        self._lock = threading.Lock()
+        self._pending: list[tuple] = []
+        self._flushed_at = time.monotonic()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                model TEXT NOT NULL,
+                input_tokens INTEGER NOT NULL,
+                cached_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                latency REAL NOT NULL,
+                ttft REAL,
+                created_at REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_usage_created ON llm_usage(created_at)")
+        self._conn.execute("DELETE FROM llm_usage WHERE created_at < ?", (time.time() - ttl_seconds,))
+        # Left behind by versions that created explicit context caches
+        self._conn.execute("DROP TABLE IF EXISTS context_caches")
+        self._conn.commit()
+
+    def record_usage(self, model: str, input_tokens: int, cached_tokens: int, output_tokens: int,
+                     latency: float, ttft: Optional[float]) -> None:
+        with self._lock:
+            self._pending.append((model, input_tokens, cached_tokens, output_tokens, latency, ttft, time.time()))
+            if (len(self._pending) < USAGE_FLUSH_ROWS
+                    and time.monotonic() - self._flushed_at < USAGE_FLUSH_INTERVAL):
+                return
+        self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes the buffered usage rows (also done at exit).
+        """
+
+        with self._lock:
+            rows, self._pending = self._pending, []
+            self._flushed_at = time.monotonic()
+            if not rows:
+                return
+            try:
+                self._conn.executemany("INSERT INTO llm_usage VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                # Stats must never fail a scan
+                print(f"Could not record token usage: {e}")
+
+    def usage_summary(self, since: float = 0) -> list:
+        """
+        Per model: calls, input/cached/output tokens, p50 latency and p50 time to first token.
+        """
+
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT model, input_tokens, cached_tokens, output_tokens, latency, ttft FROM llm_usage WHERE created_at >= ?",
+                (since,)
+            ).fetchall()
+
+        groups: dict[str, list] = {}
+        for model, *values in rows:
+            groups.setdefault(model, []).append(values)
+
+        summary = []
+        for model, calls in sorted(groups.items()):
+            latencies = sorted(call[3] for call in calls)
+            ttfts = sorted(call[4] for call in calls if call[4] is not None)
+            summary.append({
+                "model": model,
+                "calls": len(calls),
+                "input_tokens": sum(call[0] for call in calls),
+                "cached_tokens": sum(call[1] for call in calls),
+                "output_tokens": sum(call[2] for call in calls),
+                "p50_latency_s": latencies[len(latencies) // 2],
+                "p50_ttft_s": ttfts[len(ttfts) // 2] if ttfts else None,
+            })
+        return summary
+
+
+_store: Optional[PromptCacheStore] = None
+_store_lock = threading.Lock()
+
+
+def get_prompt_cache_store() -> PromptCacheStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PromptCacheStore()
+            atexit.register(_store.flush)
+        return _store
+
+
+# ===== Token Usage =====
+
+class PromptUsageRecorder(BaseCallbackHandler):
+    """
+    Records input, cached and output tokens, latency and time to first token of every model call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._runs: dict[Any, list] = {}    # run_id -> [start, first token]
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        with self._lock:
+            self._runs[run_id] = [time.perf_counter(), None]
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None and run[1] is None:
+                run[1] = time.perf_counter()
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+
+        try:
+            message = response.generations[0][0].message
+        except (IndexError, AttributeError):
+            return
+
+        usage = getattr(message, "usage_metadata", None) or {}
+        # Responses replayed from the LangChain cache come back with a zero total_cost
+        if not usage or usage.get("total_cost") == 0:
+            return
+
+        metadata = getattr(message, "response_metadata", {}) or {}
+        model = metadata.get("model_name") or metadata.get("model") or "unknown"
+        input_tokens = usage.get("input_tokens", 0)
+        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+        output_tokens = usage.get("output_tokens", 0)
+
+        end = time.perf_counter()
+        latency = end - run[0]
+        ttft = run[1] - run[0] if run[1] is not None else None
+        if ttft is None and metadata.get("prompt_eval_duration"):
+            # Ollama reports how long the prompt took to evaluate (ns)
+            ttft = (metadata.get("load_duration", 0) + metadata["prompt_eval_duration"]) / 1e9
+
+        share = f" ({cached_tokens / input_tokens * 100:.0f}% cached)" if input_tokens else ""
+        first_token = f", first token after {ttft:.2f}s" if ttft is not None else ""
+        print(f"LLM usage {model}: {input_tokens} input tokens{share}, {output_tokens} output tokens{first_token}")
+        get_prompt_cache_store().record_usage(model, input_tokens, cached_tokens, output_tokens, latency, ttft)
+
+
+_recorder: Optional[PromptUsageRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_usage_recorder() -> PromptUsageRecorder:
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = PromptUsageRecorder()
+        return _recorder
+
+
+# ===== CLI =====
+
+if __name__ == "__main__":
+    import sys
+
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 24
+    rows = get_prompt_cache_store().usage_summary(since=time.time() - hours * 3600)
+
+    print(f"LLM token usage, last {hours:g}h")
+    print(f"{'model':<32} {'calls':>6} {'input':>10} {'cached':>10} {'hit %':>6} {'output':>9} {'p50 s':>7} {'p50 ttft':>9}")
+    for row in rows:
+        hit = row["cached_tokens"] / row["input_tokens"] * 100 if row["input_tokens"] else 0.0
+        ttft = f"{row['p50_ttft_s']:.2f}" if row["p50_ttft_s"] is not None else "-"
+        print(f"{row['model']:<32} {row['calls']:>6} {row['input_tokens']:>10} {row['cached_tokens']:>10} {hit:>5.1f}% "
+              f"{row['output_tokens']:>9} {row['p50_latency_s']:>7.2f} {ttft:>9}")
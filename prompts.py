@@ -3,6 +3,10 @@ from langchain_core.messages import SystemMessage, HumanMessage
 
 # ===== Prompt Templates =====
 
+# Every prompt starts with its static part (system prompt, instructions, schemas) and ends with
+# the per-call values. Providers cache and local backends reuse the longest unchanged prefix,
+# so nothing that varies per scan may come before static text. See prompt_cache.py.
+
 simple_report_generator_prompt = ChatPromptTemplate.from_messages([
     ("system", """
         You are a Cloud Security Expert in IaC Analysis. Analyze the IaC template given by the user  for security misconfigurations and generate a detailed security report.
@@ -76,18 +80,34 @@ Critical Rules:
 """
     
     
+# Static text first, then the template, then the per-scan values: a re-scan of the same file
+# shares the whole prefix up to the scan details with the previous scan (provider prefix caching)
 react_thinker_prompt_human = """
-Please analyze the following IaC template.
+Please analyze the following IaC template. Pass the scan details given after it to your tools.
+
+**File Content:**
+
+{iac_template}
 
 **File Path:** {file_path}
 
 **Output File Directory:** {output_dir}
 
 **Output File Path:** {output_file_name}
+"""
 
-**File Content:**
+# Kept in state instead of react_thinker_prompt_human, so the template is not stored with every
+# checkpoint. Never sent: thinker_messages replaces it with the full prompt on every turn.
+react_thinker_prompt_human_compact = """
+Please analyze the following IaC template. Pass the scan details given after it to your tools.
 
-{iac_template}
+**File Content:** Already provided and reviewed in your first turn ({line_count} lines, sha256 {content_hash}). It is not repeated here.
+
+**File Path:** {file_path}
+
+**Output File Directory:** {output_dir}
+
+**Output File Path:** {output_file_name}
 """
 
 react_writer_prompt_system = """
@@ -107,7 +127,9 @@ You must follow the schema and all mapping rules exactly.
     "location": [List of 2 integers denoting starting and ending line numbers respectively],
     "confidence_score": "Low|Medium|High",
     "problems": [List of strings about possible problems that can arise from this issue],
-    "remedies": [List of solutions to fix this issue]
+    "remedies": [List of solutions to fix this issue],
+    "check_id": "String with the tool's check id or null",
+    "resource": "String with the affected resource or null"
 }}
 
 ---
@@ -119,6 +141,8 @@ You MUST follow these rules to populate each `SecurityIssue`:
     * `name`: Use the tool's `check_name` or equivalent.
     * `severity`: Use the tool's `severity`.
     * `location`: Use the tool's `file_line_range` or `location`.
+    * `check_id`: Use the tool's `check_id` (null if there is none).
+    * `resource`: Use the tool's `resource` (null if there is none).
     If name and severity is not provided, make your own.
 
 2.  **Generative Filling (Fill what's missing):** If the fields below are not in the tool output, you **must** generate them. Use the `name` and any provided links as context.
@@ -0,0 +1,153 @@
+from templates import SecurityIssue, SecurityReport, ReportDiff
+from artifact_store import get_artifact_store
+
+from typing import Optional
+import hashlib
+import json
+import re
+
+
+# ===== Fingerprints =====
+
+def _normalize(text: str) -> str:
+    """
+    Lowercase with all whitespace collapsed, so formatting changes do not alter fingerprints.
+    """
+
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def finding_fingerprint(check: str, resource: Optional[str], location: list, snippet: Optional[str]) -> str:
+    """
+    Stable ID of a finding: check, resource, span length and a hash of the code at the
+    location. Moving a resource up or down the file keeps its fingerprint, changing
+    its code or the check does not.
+    """
+
+    span = location[-1] - location[0] if location else 0
+
+    if snippet is not None:
+        content = hashlib.sha256(_normalize(snippet).encode("utf-8")).hexdigest()
+    else:
+        # No code available, fall back to the raw location
+        content = ":".join(str(line) for line in location)
+
+    key = "|".join([check, resource or "", str(span), content])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+
+
+def fingerprint_issue(issue: SecurityIssue) -> str:
+    """
+    Fingerprint of an issue, by its check id (or normalized name).
+    """
+
+    return finding_fingerprint(issue.check_id or _normalize(issue.name), issue.resource, issue.location, issue.snippet)
+
+
+def fingerprint_issues(issues: list) -> list:
+    """
+    Sets the fingerprint of every issue. Identical findings within one report
+    get an occurrence suffix so every fingerprint stays unique.
+    """
+
+    seen: dict[str, int] = {}
+    for issue in issues:
+        fingerprint = fingerprint_issue(issue)
+        seen[fingerprint] = seen.get(fingerprint, 0) + 1
+        issue.fingerprint = fingerprint if seen[fingerprint] == 1 else f"{fingerprint}#{seen[fingerprint]}"
+
+    return issues
+
+
+# ===== Diffing =====
+
+def _stored_reports(report: SecurityReport):
+    """
+    Raw JSON of the candidate earlier reports of the same file: the latest one in the
+    artifact store, and the latest report file written by a scan (per-file pointer).
+    Both are single lookups, no scan of the report history.
+    """
+
+    store = get_artifact_store()
+    name = store.latest_name_for_file(report.file, exclude=report.name)
+    if name is not None:
+        data = store.get(name)
+        if data is not None:
+            yield data
+
+    pointer = store.report_pointer(report.file)
+    if pointer is not None and pointer[0] not in (report.name, name):
+        try:
+            with open(pointer[1], "rb") as f:
+                yield f.read()
+        except OSError:
+            pass    # Moved into the store (or deleted) since
+
+
+def find_previous_report(report: SecurityReport) -> Optional[SecurityReport]:
+    """
+    Latest earlier report of the same file.
+    """
+
+    previous = None
+    for data in _stored_reports(report):
+        try:
+            candidate = SecurityReport.model_validate(json.loads(data))
+        except ValueError:
+            continue
+
+        if candidate.file != report.file or candidate.name == report.name:
+            continue
+        if candidate.timestamp >= report.timestamp:
+            continue
+        if previous is None or candidate.timestamp > previous.timestamp:
+            previous = candidate
+
+    return previous
+
+
+def diff_reports(report: SecurityReport, previous: Optional[SecurityReport]) -> ReportDiff:
+    """
+    Splits the findings of report into new, resolved and unchanged relative to previous.
+    """
+
+    current = {issue.fingerprint or fingerprint_issue(issue): issue for issue in report.issues}
+    before = {}
+    if previous is not None:
+        # Older reports may predate fingerprints
+        if any(issue.fingerprint is None for issue in previous.issues):
+            fingerprint_issues(previous.issues)
+        before = {issue.fingerprint: issue for issue in previous.issues}
+
+    new = [issue for fp, issue in current.items() if fp not in before]
+    resolved = [issue for fp, issue in before.items() if fp not in current]
+    unchanged = [issue for fp, issue in current.items() if fp in before]
+
+    return ReportDiff(
+        report=report.name,
+        previous_report=previous.name if previous else None,
+        file=report.file,
+        summary={"new": len(new), "resolved": len(resolved), "unchanged": len(unchanged)},
+        new=new,
+        resolved=resolved,
+        unchanged=unchanged,
+    )
+
+
+def save_diff(report: SecurityReport, output_dir: str) -> str:
+    """
+    Diffs report against the previous report of the same file and saves it
+    next to the report as <name>_diff.json. Returns the diff file path.
+    """
+
+    diff = diff_reports(report, find_previous_report(report))
+
+    diff_path = output_dir + report.name + "_diff.json"
+    with open(diff_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(diff.model_dump(), indent=2, default=str))
+
+    # The next scan of the file diffs against this report
+    get_artifact_store().point_to_report(report.file, report.name, output_dir + report.name + ".json")
+
+    print(f"Changes since previous scan: {diff.summary}")
+    return diff_path
@@ -1,92 +1,130 @@
 # TO GENERATE A REPORT IN JSON OUTPUT FROM IAC
 # ReAct Agent Variant With Tools
 
-# ===== Importing Libraries & Env Variables======
+# ===== Importing Libraries ======
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_ollama import ChatOllama
-from langgraph.graph import StateGraph, START, END
+# Only light imports at module level. LangChain/LangGraph and the LLM clients are
+# imported and built inside the functions below, after the arguments are checked.
+# Measure with: python benchmarks/import_time.py
 
-from templates import AIReport, ReActGraphState
-from graph_functions import prepare_graph_state, llm_call, tool_call, should_continue, write_report, save_final_results
-from tools import checkov_tool
-
-from dotenv import load_dotenv
 import sys
+import uuid
 from functools import partial
 
-load_dotenv()
+# ===== Defining Agents to be Used =====
 
-from langgraph.prebuilt import ToolNode
+def build_llms():
+    """
+    Builds the reasoning and writer LLMs for the selected backend (LLM_BACKEND).
+    Each is routed between a small and a large model by the scan's complexity (see model_router.py).
+    """
 
-# ===== Defining Tool List =====
+    from tools import checkov_tool
+    from model_router import ModelRouter
+    from stream_writer import StreamingIssueWriter
+    from llm_cache import get_response_cache
+    from llms import build_chat_model
+    from deadlines import THINKER_TIMEOUT, WRITER_TIMEOUT
 
-tool_list = [checkov_tool]
+    # Shared exact-match response cache, identical calls are replayed instead of re-billed
+    response_cache = get_response_cache()
 
-tool_node = ToolNode(tools=tool_list)
+    # --- Reasoning LLM ---
+    reason_llm = ModelRouter("thinker", lambda tier, backend, model: build_chat_model(
+        backend, cache=response_cache, timeout=THINKER_TIMEOUT, model=model
+    ).bind_tools([checkov_tool]))
 
-# ===== Defining Agents to be Used =====
+    # --- Writer LLM ---
+    # Streamed JSON, every issue is validated (and repaired if needed) on its own
+    writer_llm = ModelRouter("writer", lambda tier, backend, model: StreamingIssueWriter(build_chat_model(
+        backend, cache=response_cache, timeout=WRITER_TIMEOUT, json_mode=True, model=model
+    )))
 
-# --- Reasoning LLM ---
+    return reason_llm, writer_llm
 
-# Ollama - Mistral:7b-instruct for report generation.
+# ===== Graph Creation =====
 
-# llm = ChatOllama(
-#     model="mistral:7b-instruct",
-#     temperature=0.1
-# )
+def build_agent():
+    """
+    Builds and compiles the ReAct agent graph.
+    """
 
-# Gemini - Non local alternative
+    from langgraph.graph import StateGraph, START, END
 
-reason_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    temperature=0,
-).bind_tools([checkov_tool])
+    from templates import ReActGraphState
+    from graph_functions import prepare_graph_state, llm_call, tool_call, should_continue, write_report, save_final_results
+    from tools import checkov_tool
+    from checkpoints import get_checkpointer
 
-# --- Writer LLM ---
+    # --- Defining Tool List ---
 
-writer_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    temperature=0,
-).with_structured_output(AIReport)
+    tool_list = [checkov_tool]
 
-# ===== Graph Creation =====
+    reason_llm, writer_llm = build_llms()
+
+    agent = StateGraph(ReActGraphState)
+
+    # --- Graph Nodes ---
+
+    agent.add_node("prepare_graph_state", prepare_graph_state)
+    agent.add_node("llm_call", partial(llm_call, reason_llm = reason_llm))
+
+    # Own tool node, tool outputs go into the blob store instead of the messages
+    agent.add_node("tool_call", partial(tool_call, tool_list = {tool.name: tool for tool in tool_list}))
+
+    agent.add_node("write_report", partial(write_report, writer_llm = writer_llm))
+    agent.add_node("save_final_results", save_final_results)
+
+    # --- Graph Edges ---
+
+    agent.add_edge(START, "prepare_graph_state")
+    agent.add_edge("prepare_graph_state", "llm_call")
+    agent.add_conditional_edges("llm_call",
+        should_continue,
+        {
+            "tool_call": "tool_call",
+            "write_report": "write_report"
+        })
+    agent.add_edge("tool_call", "llm_call")
+    agent.add_edge("write_report", "save_final_results")
+    agent.add_edge("save_final_results", END)
+
+    # --- Agent compilation ---
+
+    # Checkpointed so that a retried job resumes from its last completed node
+    return agent.compile(checkpointer=get_checkpointer())
 
-agent = StateGraph(ReActGraphState)
+# ===== Inference =====
 
-# --- Graph Nodes ---
+def main(argv: list) -> None:
 
-agent.add_node("prepare_graph_state", prepare_graph_state)
-agent.add_node("llm_call", partial(llm_call, reason_llm = reason_llm))
+    if(len(argv) not in (2, 3, 4)):
+        print("""Incorrect number of arguments
+    Usage: python report_generator_react.py <file-path> [job-id] [source-file]""")
+        sys.exit(1)
 
-# agent.add_node("tool_call", partial(tool_call, tool_list = tool_list))
-agent.add_node("tool_call", tool_node)
+    # Env variables are loaded before any module reads its settings
+    from dotenv import load_dotenv
+    load_dotenv()
 
-agent.add_node("write_report", partial(write_report, writer_llm = writer_llm))
-agent.add_node("save_final_results", save_final_results)
+    from checkpoints import run_job
 
-# --- Graph Edges ---
+    path = argv[1]
+    job_id = argv[2] if len(argv) >= 3 else uuid.uuid4().hex
+    # Name the report is filed under, when the file was staged under another path (scan workers)
+    source_file = argv[3] if len(argv) == 4 else path
+    print(f"JOB_ID: {job_id}")
 
-agent.add_edge(START, "prepare_graph_state")
-agent.add_edge("prepare_graph_state", "llm_call")
-agent.add_conditional_edges("llm_call", 
-    should_continue, 
-    {
-        "tool_call": "tool_call",
-        "write_report": "write_report"
-    })
-agent.add_edge("tool_call", "llm_call")
-agent.add_edge("write_report", "save_final_results")
-agent.add_edge("save_final_results", END)
+    react_agent = build_agent()
 
-# --- Agent compilation ---
+    initial_state = {"input_file_path": path, "source_file": source_file, "output_dir": ""}
+    final_state, already_done = run_job(react_agent, initial_state, job_id)
 
-react_agent = agent.compile()
+    # save_final_results did not run in this process, so report the stored path again
+    if already_done:
+        print(f"\nFINAL_REPORT_PATH: {final_state['output_dir'] + final_state['output_file_name'] + '.json'}")
+        print(f"FINAL_DIFF_PATH: {final_state['output_dir'] + final_state['output_file_name'] + '_diff.json'}")
 
-if(len(sys.argv) != 2):
-    print("""Incorrect number of arguments
-    Usage: python main.py <file-path>""")
 
-path = sys.argv[1]
-initial_state = {"input_file_path": path, "output_dir": ""}
-final_state = react_agent.invoke(initial_state)
\ No newline at end of file
+if __name__ == "__main__":
+    main(sys.argv)
@@ -1,69 +1,109 @@
 # TO GENERATE A REPORT IN JSON OUTPUT FROM IAC
 # Simple Sequential Flow with no tools
 
-#===== Importing Libraries & Env Variables======
+#===== Importing Libraries ======
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_ollama import ChatOllama
-from langgraph.graph import StateGraph, START, END
+# Only light imports at module level. LangChain/LangGraph and the LLM client are
+# imported and built inside the functions below, after the arguments are checked.
+# Measure with: python benchmarks/import_time.py
 
-from templates import AIReport, GraphState
-from prompts import simple_report_generator_prompt
-from graph_functions import get_file, generate_report_issues, populate_metadata, save_results
-
-from dotenv import load_dotenv
 import sys
+import uuid
 from functools import partial
 
-load_dotenv()
-
 #===== Defining Agent to be used ======
 
-# --- LLM ---
+def build_llm():
+    """
+    Builds the report LLM for the selected backend (LLM_BACKEND).
+    It is routed between a small and a large model by the scan's complexity (see model_router.py).
+    """
 
-# Ollama - Mistral:7b-instruct for report generation.
+    from stream_writer import StreamingIssueWriter
+    from model_router import ModelRouter
+    from llm_cache import get_response_cache
+    from llms import build_chat_model
+    from deadlines import WRITER_TIMEOUT
 
-# llm = ChatOllama(
-#     model="mistral:7b-instruct",
-#     temperature=0.1
-# )
+    # Shared exact-match response cache, identical calls are replayed instead of re-billed
+    response_cache = get_response_cache()
 
-# Gemini - Non local alternative
+    # Streamed JSON, every issue is validated (and repaired if needed) on its own
+    return ModelRouter("writer", lambda tier, backend, model: StreamingIssueWriter(build_chat_model(
+        backend, cache=response_cache, timeout=WRITER_TIMEOUT, json_mode=True, model=model
+    )))
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    temperature=0,
-).with_structured_output(AIReport)
+# ===== Graph Creation =====
 
-# --- Prompt ---
+def build_workflow():
+    """
+    Builds and compiles the sequential report graph.
+    """
 
-prompt = simple_report_generator_prompt
+    from langgraph.graph import StateGraph, START, END
 
-# ===== Graph Creation =====
+    from templates import GraphState
+    from prompts import simple_report_generator_prompt
+    from graph_functions import get_file, run_rules, generate_report_issues, populate_metadata, save_results
+    from checkpoints import get_checkpointer
+
+    llm = build_llm()
+
+    # --- Prompt ---
+
+    prompt = simple_report_generator_prompt
+
+    graph = StateGraph(GraphState)
 
-graph = StateGraph(GraphState)
+    # --- Graph Nodes ---
+    graph.add_node("get_file", get_file)
+    graph.add_node("run_rules", run_rules)
+    graph.add_node("generate_report_issues", partial(generate_report_issues, llm=llm, prompt_template=prompt))
+    graph.add_node("populate_metadata", populate_metadata)
+    graph.add_node("save_results", save_results)
 
-# --- Graph Nodes ---
-graph.add_node("get_file", get_file)
-graph.add_node("generate_report_issues", partial(generate_report_issues, llm=llm, prompt_template=prompt))
-graph.add_node("populate_metadata", populate_metadata)
-graph.add_node("save_results", save_results)
+    # --- Graph Edges ---
+    graph.add_edge(START, "get_file")
+    graph.add_edge("get_file", "run_rules")
+    graph.add_edge("run_rules", "generate_report_issues")
+    graph.add_edge("generate_report_issues", "populate_metadata")
+    graph.add_edge("populate_metadata", "save_results")
+    graph.add_edge("save_results", END)
 
-# --- Graph Edges ---
-graph.add_edge(START, "get_file")
-graph.add_edge("get_file", "generate_report_issues")
-graph.add_edge("generate_report_issues", "populate_metadata")
-graph.add_edge("populate_metadata", "save_results")
-graph.add_edge("save_results", END)
+    return graph.compile(checkpointer=get_checkpointer())
 
 # ===== Compilation & Inference =====
 
-workflow = graph.compile()
+def main(argv: list) -> None:
+
+    if(len(argv) not in (2, 3, 4)):
+        print("""Incorrect number of arguments
+    Usage: python report_generator_simple.py <file-path> [job-id] [source-file]""")
+        sys.exit(1)
+
+    # Env variables are loaded before any module reads its settings
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from checkpoints import run_job
+
+    path = argv[1]
+    job_id = argv[2] if len(argv) >= 3 else uuid.uuid4().hex
+    # Name the report is filed under, when the file was staged under another path (scan workers)
+    source_file = argv[3] if len(argv) == 4 else path
+    print(f"JOB_ID: {job_id}")
+
+    workflow = build_workflow()
+
+    initial_state = {"input_file_path": path, "source_file": source_file, "output_dir": ""}
+    final_state, already_done = run_job(workflow, initial_state, job_id)
+
+    # save_results did not run in this process, so report the stored path again
+    if already_done:
+        report_path = final_state["output_dir"] + final_state["report"].name
+        print(f"\nFINAL_REPORT_PATH: {report_path + '.json'}")
+        print(f"FINAL_DIFF_PATH: {report_path + '_diff.json'}")
 
-if(len(sys.argv) != 2):
-    print("""Incorrect number of arguments
-    Usage: python main.py <file-path>""")
 
-path = sys.argv[1]
-initial_state = {"input_file_path": path, "output_dir": ""}
-final_state = workflow.invoke(initial_state)
\ No newline at end of file
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,293 @@
+from templates import SecurityIssue
+from iac_parser import ParsedTemplate, ResourceBlock
+from typing import Any
+
+# ===== Rule Definitions =====
+
+# Each rule applies to the listed resource types. "match" is a condition tree:
+#   {"all": [...]} / {"any": [...]}  - combine conditions
+#   {"path": "a.b", "op": ..., "value": ...} - test the attribute(s) at a dotted path,
+#       nested blocks and lists are searched element by element.
+# Ops: equals, in, contains, not_true (missing/false), missing, present
+# "checkov_ids" are the Checkov checks reporting exactly the same problem (merged in issue_merge.py).
+# Checks that are narrower (one port, write access only) keep their own id, or merging would
+# hide the distinct problems they report.
+# "covers" (optional) maps resource types the rule fully decides to every attribute such a
+# block may set: a block of that type setting nothing else needs no LLM (see is_covered).
+
+RULES = [
+    {
+        "id": "RULE_S3_PUBLIC_ACL",
+        "name": "S3 Bucket with Public ACL",
+        "checkov_ids": ["CKV_AWS_20"],
+        "severity": "High",
+        "resource_types": ["aws_s3_bucket", "aws_s3_bucket_acl", "AWS::S3::Bucket"],
+        "covers": {
+            "aws_s3_bucket_acl": ["bucket", "acl", "expected_bucket_owner"],
+        },
+        "match": {"any": [
+            {"path": "acl", "op": "in", "value": ["public-read", "public-read-write", "authenticated-read"]},
+            {"path": "AccessControl", "op": "in", "value": ["PublicRead", "PublicReadWrite", "AuthenticatedRead"]},
+        ]},
+        "problems": [
+            "Anyone on the internet can list or read the bucket contents",
+            "Sensitive data exposure and compliance violations",
+        ],
+        "remedies": [
+            "Set the bucket ACL to private",
+            "Enable S3 Block Public Access on the bucket and account",
+        ],
+    },
+    {
+        "id": "RULE_SG_OPEN_INGRESS",
+        "name": "Security Group Allows Ingress from 0.0.0.0/0",
+        "severity": "High",
+        "resource_types": [
+            "aws_security_group", "aws_security_group_rule", "aws_vpc_security_group_ingress_rule",
+            "AWS::EC2::SecurityGroup", "AWS::EC2::SecurityGroupIngress",
+        ],
+        "covers": {
+            "aws_vpc_security_group_ingress_rule": [
+                "security_group_id", "cidr_ipv4", "cidr_ipv6", "from_port", "to_port", "ip_protocol",
+                "referenced_security_group_id", "prefix_list_id", "description",
+            ],
+            "AWS::EC2::SecurityGroupIngress": [
+                "GroupId", "GroupName", "CidrIp", "CidrIpv6", "FromPort", "ToPort", "IpProtocol",
+                "SourceSecurityGroupId", "SourceSecurityGroupName", "SourceSecurityGroupOwnerId",
+                "SourcePrefixListId", "Description",
+            ],
+        },
+        "match": {"any": [
+            {"path": "ingress.cidr_blocks", "op": "contains", "value": "0.0.0.0/0"},
+            {"path": "ingress.ipv6_cidr_blocks", "op": "contains", "value": "::/0"},
+            {"all": [
+                {"path": "type", "op": "equals", "value": "ingress"},
+                {"any": [
+                    {"path": "cidr_blocks", "op": "contains", "value": "0.0.0.0/0"},
+                    {"path": "ipv6_cidr_blocks", "op": "contains", "value": "::/0"},
+                ]},
+            ]},
+            {"path": "cidr_ipv4", "op": "equals", "value": "0.0.0.0/0"},
+            {"path": "cidr_ipv6", "op": "equals", "value": "::/0"},
+            {"path": "SecurityGroupIngress.CidrIp", "op": "equals", "value": "0.0.0.0/0"},
+            {"path": "SecurityGroupIngress.CidrIpv6", "op": "equals", "value": "::/0"},
+            {"path": "CidrIp", "op": "equals", "value": "0.0.0.0/0"},
+            {"path": "CidrIpv6", "op": "equals", "value": "::/0"},
+        ]},
+        "problems": [
+            "Services behind the security group are reachable from the whole internet",
+            "Brute force and exploitation of exposed ports",
+        ],
+        "remedies": [
+            "Restrict ingress to known CIDR ranges or security groups",
+            "Expose services through a load balancer or VPN instead",
+        ],
+    },
+    {
+        "id": "RULE_EBS_UNENCRYPTED",
+        "name": "EBS Volume Not Encrypted",
+        "checkov_ids": ["CKV_AWS_3"],
+        "severity": "Medium",
+        "resource_types": ["aws_ebs_volume", "AWS::EC2::Volume"],
+        "covers": {
+            "aws_ebs_volume": ["availability_zone", "size", "type", "iops", "throughput", "encrypted", "kms_key_id",
+                               "snapshot_id", "final_snapshot"],
+            "AWS::EC2::Volume": ["AvailabilityZone", "Size", "VolumeType", "Iops", "Throughput", "Encrypted",
+                                 "KmsKeyId", "SnapshotId"],
+        },
+        "match": {"all": [
+            {"path": "encrypted", "op": "not_true"},
+            {"path": "Encrypted", "op": "not_true"},
+        ]},
+        "problems": [
+            "Data at rest and snapshots are readable if the volume is exposed",
+            "Compliance violations for encryption at rest",
+        ],
+        "remedies": [
+            "Set encrypted = true (Encrypted: true) on the volume",
+            "Enable EBS encryption by default for the account",
+        ],
+    },
+    {
+        "id": "RULE_RDS_UNENCRYPTED",
+        "name": "RDS Instance Storage Not Encrypted",
+        "checkov_ids": ["CKV_AWS_16"],
+        "severity": "Medium",
+        "resource_types": ["aws_db_instance", "AWS::RDS::DBInstance"],
+        "match": {"all": [
+            {"path": "storage_encrypted", "op": "not_true"},
+            {"path": "StorageEncrypted", "op": "not_true"},
+        ]},
+        "problems": [
+            "Database storage, backups and snapshots are not encrypted at rest",
+        ],
+        "remedies": [
+            "Set storage_encrypted = true (StorageEncrypted: true) on the instance",
+        ],
+    },
+    {
+        "id": "RULE_PROVIDER_HARDCODED_KEYS",
+        "name": "Hardcoded Cloud Credentials in Provider",
+        "checkov_ids": ["CKV_AWS_41"],
+        "severity": "High",
+        "resource_types": ["provider"],
+        "match": {"any": [
+            {"path": "access_key", "op": "present"},
+            {"path": "secret_key", "op": "present"},
+        ]},
+        "problems": [
+            "Credentials leak through version control and state files",
+        ],
+        "remedies": [
+            "Remove keys from the provider block and use environment variables, profiles or roles",
+        ],
+    },
+]
+
+# Block kinds that carry no security relevant configuration on their own
+NEUTRAL_KINDS = {"terraform", "variable", "output", "locals"}
+
+# Resource types without security relevant settings, decided without any rule
+INERT_RESOURCE_TYPES = {
+    "random_id", "random_pet", "random_integer", "random_shuffle", "time_sleep", "time_static",
+    "aws_route_table_association", "aws_main_route_table_association",
+}
+
+# Meta-arguments and tags, allowed on every covered resource
+META_ATTRIBUTES = {"count", "for_each", "provider", "depends_on", "lifecycle", "tags", "tags_all", "Tags"}
+
+
+
+def _covered_attributes() -> dict:
+    """
+    Resource type -> attributes the rules fully decide, from the rules' "covers".
+    """
+
+    covered: dict[str, set] = {}
+    for rule in RULES:
+        for resource_type, attributes in rule.get("covers", {}).items():
+            covered.setdefault(resource_type, set(META_ATTRIBUTES)).update(attributes)
+    return covered
+
+
+COVERED_ATTRIBUTES = _covered_attributes()
+
+
+# ===== Rule Evaluation =====
+
+def _values_at(data: Any, path: list) -> list:
+    """
+    All values at a dotted path, searching through lists (nested blocks) on the way.
+    """
+
+    if not path:
+        return data if isinstance(data, list) else [data]
+    if isinstance(data, list):
+        return [v for item in data for v in _values_at(item, path)]
+    if isinstance(data, dict) and path[0] in data:
+        return _values_at(data[path[0]], path[1:])
+    return []
+
+
+def _is_true(value: Any) -> bool:
+    return value is True or str(value).lower() == "true"
+
+
+def _evaluate(condition: dict, attributes: dict) -> bool:
+
+    if "all" in condition:
+        return all(_evaluate(c, attributes) for c in condition["all"])
+    if "any" in condition:
+        return any(_evaluate(c, attributes) for c in condition["any"])
+
+    values = _values_at(attributes, condition["path"].split("."))
+    op, expected = condition["op"], condition.get("value")
+
+    if op == "equals":
+        return any(v == expected for v in values)
+    if op == "in":
+        return any(v in expected for v in values)
+    if op == "contains":
+        return expected in values
+    if op == "not_true":
+        return not any(_is_true(v) for v in values)
+    if op == "missing":
+        return not values
+    if op == "present":
+        return bool(values)
+
+    raise ValueError(f"Unknown rule op: {op}")
+
+
+def is_covered(block: ResourceBlock) -> bool:
+    """
+    Whether the rule set fully decides this block (no LLM needed): blocks without security
+    relevant configuration (NEUTRAL_KINDS, INERT_RESOURCE_TYPES), and resources of a type
+    some rule covers that set only attributes the rules decide. Every other resource still
+    goes to the LLM, the rules are only a pre-pass for it and their issues are merged with
+    the LLM's (issue_merge.py).
+    """
+
+    if block.kind in NEUTRAL_KINDS:
+        return True
+    if block.kind != "resource":
+        return False
+    if block.type in INERT_RESOURCE_TYPES:
+        return True
+
+    covered = COVERED_ATTRIBUTES.get(block.type)
+    return covered is not None and set(block.attributes) <= covered
+
+
+def evaluate_rules(parsed: ParsedTemplate) -> list:
+    """
+    Runs every rule against every block, returns SecurityIssues for the matches.
+    """
+
+    issues = []
+    for block in parsed.blocks:
+        for rule in RULES:
+            if block.type not in rule["resource_types"]:
+                continue
+            if _evaluate(rule["match"], block.attributes):
+                issues.append(SecurityIssue(
+                    name=rule["name"],
+                    severity=rule["severity"],
+                    location=[block.start, block.end],
+                    confidence_score="High",
+                    problems=rule["problems"],
+                    remedies=rule["remedies"],
+                    check_id=rule["id"],
+                    resource=f"{block.type}.{block.name}",
+                ))
+
+    return issues
+
+
+def mask_blocks(iac_template: str, blocks: list) -> str:
+    """
+    Blanks out the lines of the given blocks, keeping line numbers intact.
+    """
+
+    lines = iac_template.splitlines()
+    for block in blocks:
+        for i in range(block.start - 1, min(block.end, len(lines))):
+            lines[i] = ""
+
+    return "\n".join(lines)
+
+
+def mask_covered_blocks(iac_template: str, parsed: ParsedTemplate) -> str:
+    """
+    Blanks out the lines of blocks the LLM does not need (see is_covered), keeping line numbers intact.
+    Returns "" when nothing is left for the LLM to decide.
+    """
+
+    if parsed.framework == "unknown" or not parsed.blocks:
+        return iac_template
+
+    uncovered = [b for b in parsed.blocks if not is_covered(b)]
+    if not uncovered and not parsed.leftover_code:
+        return ""
+
+    return mask_blocks(iac_template, [b for b in parsed.blocks if is_covered(b)])
@@ -0,0 +1,204 @@
+# SCAN WORKER
+# Claims scan jobs from the shared job queue, runs them and puts the results into the
+# shared artifact store. Run as many workers as needed, independent of the number of
+# API replicas (main.py). By default the queue, artifact store, checkpoints and blob
+# stores are local SQLite files and directories, so all processes run on one host from
+# the same directory. To run API replicas and workers on separate hosts, point
+# JOB_QUEUE_BACKEND, ARTIFACT_STORE_BACKEND, CHECKPOINT_BACKEND and BLOB_STORE_BACKEND at
+# shared implementations (see backends.py); a re-claimed job then resumes on any host.
+#
+# Usage:
+#   python scan_worker.py [--concurrency N] [--pipeline react|simple]
+
+from concurrent.futures import ThreadPoolExecutor
+import subprocess
+import argparse
+import signal
+import shutil
+import socket
+import uuid
+import time
+import os
+
+from job_queue import get_job_queue, DONE, FAILED, CANCELLED
+from artifact_store import get_artifact_store, KIND_UPLOAD
+from deadlines import SCAN_TIMEOUT
+
+# ===== Worker Settings =====
+
+SCRIPT_PATHS = {"react": "report_generator_react.py", "simple": "report_generator_simple.py"}
+LLM_SCHEDULER_DB = os.getenv("LLM_SCHEDULER_DB", "llm_scheduler.sqlite")
+
+# Local scratch space, inputs are staged here while a scan runs
+WORK_DIR = os.getenv("WORK_DIR", "work")
+
+# Seconds between queue polls when idle, and between heartbeats / cancel checks while scanning
+IDLE_POLL_INTERVAL = 1.0
+HEARTBEAT_INTERVAL = 1.0
+# Grace period before a stopped scan is killed
+KILL_GRACE_PERIOD = 5
+
+
+# ===== Scan Process =====
+
+def stop_scan(process: subprocess.Popen) -> None:
+    """
+    Stops a scan and everything it started (checkov runs in the same process group).
+    SIGTERM first, SIGKILL if it is still alive after KILL_GRACE_PERIOD.
+    """
+
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            process.wait(timeout=KILL_GRACE_PERIOD)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def run_job(job, worker: str, script_path: str) -> None:
+    """
+    Runs one claimed job: stages the uploaded file, runs the scan script in its own
+    process group and moves its artifacts into the store. The scan is stopped if the
+    job is cancelled, handed to another worker or runs past SCAN_TIMEOUT.
+    The upload is deleted once the job is finished either way (a retry uploads it again),
+    unless the job was handed to another worker.
+    """
+
+    queue = get_job_queue()
+    store = get_artifact_store()
+
+    upload = store.get(job.job_id, KIND_UPLOAD)
+    if upload is None:
+        queue.finish(job.job_id, FAILED, error="Uploaded file not found in artifact store")
+        return
+
+    # Staged under the job id, so uploads with the same file name never collide
+    job_dir = os.path.join(WORK_DIR, job.job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    input_path = os.path.join(job_dir, os.path.basename(job.file))
+    with open(input_path, "wb") as f:
+        f.write(upload)
+
+    # The report is filed under job.file, the same name on every worker
+    process = subprocess.Popen(
+        ["python", script_path, input_path, job.job_id, job.file],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        env={
+            **os.environ,
+            "SCAN_PRIORITY": job.priority,
+            "LLM_SCHEDULER_DB": LLM_SCHEDULER_DB  # Every scan process on the host shares one LLM quota
+        },
+        start_new_session=True  # Own process group, so its children can be stopped with it
+    )
+
+    owns_job = True
+    try:
+        deadline = time.monotonic() + SCAN_TIMEOUT
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=HEARTBEAT_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+
+            if not queue.heartbeat(job.job_id, worker):
+                stop_scan(process)
+                process.communicate()
+                # Lease lost to another worker: the job is theirs now, leave its state alone
+                if queue.get(job.job_id).worker == worker:
+                    queue.finish(job.job_id, CANCELLED, error="Cancelled")
+                else:
+                    owns_job = False
+                print(f"[{worker}] Job {job.job_id} stopped")
+                return
+
+            if time.monotonic() >= deadline:
+                stop_scan(process)
+                process.communicate()
+                # Completed nodes are checkpointed, enqueuing the job again resumes it
+                queue.finish(job.job_id, FAILED, error="Analysis timed out, retry with the same job_id to resume")
+                print(f"[{worker}] Job {job.job_id} timed out")
+                return
+
+        if process.returncode != 0:
+            queue.finish(job.job_id, FAILED, error=f"Analysis script failed: {stderr[-2000:]}")
+            print(f"[{worker}] Job {job.job_id} failed")
+            return
+
+        report_path = None
+        for line in stdout.splitlines():
+            if line.startswith("FINAL_REPORT_PATH:"):
+                report_path = line.split("FINAL_REPORT_PATH:")[1].strip()
+                break
+
+        if not report_path:
+            queue.finish(job.job_id, FAILED, error="Script ran but worker could not find report path")
+            return
+
+        # Move the scan artifacts (report, diff, checkov log, input) into the shared store.
+        # A resumed, already finished job was ingested before and only needs the name.
+        report_name = os.path.basename(report_path).removesuffix(".json")
+        if os.path.exists(report_path):
+            store.ingest_scan(os.path.dirname(report_path), report_name, job.file, input_path)
+
+        queue.finish(job.job_id, DONE, report_name=report_name)
+        print(f"[{worker}] Job {job.job_id} done: {report_name}")
+
+    except Exception as e:
+        stop_scan(process)
+        queue.finish(job.job_id, FAILED, error=f"Worker error: {e}")
+        print(f"[{worker}] Job {job.job_id} failed: {e}")
+
+    finally:
+        if owns_job:
+            store.delete(job.job_id, KIND_UPLOAD)
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+
+def worker_loop(worker: str, script_path: str) -> None:
+    """
+    Claims and runs jobs until the process is stopped.
+    """
+
+    queue = get_job_queue()
+    while True:
+        try:
+            job = queue.claim(worker)
+        except Exception as e:
+            print(f"[{worker}] Could not claim a job: {e}")
+            job = None
+
+        if job is None:
+            time.sleep(IDLE_POLL_INTERVAL)
+            continue
+
+        print(f"[{worker}] Claimed job {job.job_id} ({job.file}, attempt {job.attempts})")
+        run_job(job, worker, script_path)
+
+
+# ===== CLI =====
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run scan jobs from the shared job queue.")
+    parser.add_argument("--concurrency", type=int, default=2, help="Scans run at the same time by this worker")
+    parser.add_argument("--pipeline", choices=["react", "simple"], default="react")
+    args = parser.parse_args()
+
+    # One id per slot, a lease belongs to exactly one of them
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    script_path = os.getenv("SCRIPT_PATH", SCRIPT_PATHS[args.pipeline])
+    print(f"Worker {worker_id} running {args.concurrency} {args.pipeline} scan slot(s)")
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for slot in range(args.concurrency):
+            pool.submit(worker_loop, f"{worker_id}-{slot}", script_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+from langchain_core.caches import BaseCache
+from langchain_core.callbacks import CallbackManager
+from langchain_core.load import dumpd, dumps
+from langchain_core.messages import AIMessage, SystemMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import ValidationError
+from typing import Optional
+from dataclasses import dataclass, field
+from functools import partial, cached_property
+import hashlib
+import json
+import time
+import re
+
+from templates import SecurityIssue
+from llm_scheduler import get_scheduler
+
+# ===== Streaming Writer Settings =====
+
+# Items the writer is asked again for, one call each, when local repair fails
+MAX_REREQUESTS = 3
+
+# Start of the issues array in the writer output: {"issues": [ ... or a bare [ ...
+ISSUES_ARRAY_START = re.compile(r'"issues"\s*:\s*\[$|^\s*(```(json)?\s*)?\[$')
+
+# Severity and confidence spellings models use instead of Low/Medium/High
+LEVELS = {
+    "low": "Low", "info": "Low", "informational": "Low", "minor": "Low",
+    "medium": "Medium", "moderate": "Medium", "med": "Medium",
+    "high": "High", "critical": "High", "severe": "High", "major": "High",
+}
+
+REREQUEST_PROMPT = """
+The following item of a security report does not match the SecurityIssue schema.
+Return only the corrected item as one JSON object, without commentary.
+
+**SecurityIssue Schema:**
+{schema}
+
+**Validation Errors:**
+{errors}
+
+**Item:**
+{item}
+"""
+
+
+# ===== Incremental Parsing =====
+
+class IssueStreamParser:
+    """
+    Incremental parser for streamed writer output.
+    Finds the issues array and returns the raw text of each item as soon as its object closes.
+    """
+
+    def __init__(self):
+        self.prefix = ""        # Text before the issues array
+        self.in_array = False
+        self.done = False
+        self.item: list = []    # Characters of the item being read
+        self.depth = 0          # Bracket depth inside the current item
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, text: str) -> list:
+        """
+        Consumes a chunk, returns the items completed by it.
+        """
+
+        completed = []
+        for ch in text:
+            if self.done:
+                break
+
+            if not self.in_array:
+                self.prefix += ch
+                if ch == "[" and ISSUES_ARRAY_START.search(self.prefix):
+                    self.in_array = True
+                continue
+
+            if self.depth == 0:
+                if ch == "{":
+                    self.item = [ch]
+                    self.depth = 1
+                elif ch == "]":
+                    self.done = True
+                continue  # Whitespace and commas between items
+
+            self.item.append(ch)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    completed.append("".join(self.item))
+                    self.item = []
+
+        return completed
+
+    def finish(self) -> Optional[str]:
+        """
+        Text of an item cut off by the end of the output, if any.
+        """
+
+        if self.depth > 0 and self.item:
+            return "".join(self.item)
+        return None
+
+
+# ===== Item Repair =====
+
+def _repair_json(raw: str) -> str:
+    """
+    Fixes common syntax slips: trailing commas, Python literals, single quotes, missing closing brackets.
+    """
+
+    text = re.sub(r",\s*([}\]])", r"\1", raw)
+    text = re.sub(r"\bNone\b", "null", text)
+    text = re.sub(r"\bTrue\b", "true", text)
+    text = re.sub(r"\bFalse\b", "false", text)
+    if '"' not in text:
+        text = text.replace("'", '"')
+
+    # Close whatever a cut off item left open
+    closers = []
+    in_string = escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+        elif ch in "}]" and closers:
+            closers.pop()
+    if in_string:
+        text += '"'
+    return re.sub(r",\s*$", "", text) + "".join(reversed(closers))
+
+
+def _repair_fields(data: dict) -> dict:
+    """
+    Coerces field values models commonly get slightly wrong into the SecurityIssue types.
+    """
+
+    for key in ("severity", "confidence_score"):
+        value = data.get(key)
+        if isinstance(value, str):
+            data[key] = LEVELS.get(value.strip().lower(), value)
+
+    location = data.get("location")
+    if isinstance(location, int):
+        location = [location, location]
+    elif isinstance(location, str):
+        location = [int(n) for n in re.findall(r"\d+", location)]
+    if isinstance(location, list):
+        location = [int(n) for n in location if isinstance(n, (int, float)) or str(n).isdigit()]
+        if len(location) == 1:
+            location = location * 2
+        data["location"] = location[:2]
+
+    for key in ("problems", "remedies"):
+        value = data.get(key)
+        if value is None:
+            data[key] = []
+        elif isinstance(value, str):
+            data[key] = [value]
+
+    return data
+
+
+def parse_issue(raw: str) -> SecurityIssue:
+    """
+    Validates one streamed item, repairing it locally if needed.
+    Raises ValueError (with the original validation errors) if it cannot be repaired.
+    """
+
+    try:
+        return SecurityIssue.model_validate_json(raw)
+    except ValidationError as e:
+        error = e
+
+    try:
+        data = json.loads(_repair_json(raw))
+        if isinstance(data, dict):
+            return SecurityIssue.model_validate(_repair_fields(data))
+    except (json.JSONDecodeError, ValidationError, ValueError):
+        pass
+
+    raise ValueError(str(error))
+
+
+# ===== Streaming Writer =====
+
+@dataclass
+class StreamedIssues:
+    issues: list = field(default_factory=list)
+    failed: list = field(default_factory=list)   # (raw item, error) not repaired
+    text: str = ""
+    truncated: bool = False     # The output was cut off mid-array
+    model: str = ""             # model_id of the writer that produced it
+
+    @property
+    def complete(self) -> bool:
+        """
+        Whether every issue the model reported is in issues.
+        """
+
+        return not self.failed and not self.truncated
+
+
+def _chunk_text(chunk) -> str:
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    # Content blocks (e.g. Gemini): keep the text parts
+    return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+
+class StreamingIssueWriter:
+    """
+    Writer LLM with incremental structured output.
+
+    The model streams plain JSON. Every issue is validated as soon as its object closes,
+    so one malformed item no longer sinks the whole report. Bad items are repaired locally,
+    or asked for again on their own (at most MAX_REREQUESTS small calls) and dropped if
+    that fails too.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    @cached_property
+    def model_id(self) -> str:
+        """
+        Identifies the model and its settings, as the response cache keys them.
+        """
+
+        return hashlib.sha256(dumps(self.model).encode("utf-8")).hexdigest()[:16]
+
+    def _replay(self, cached: list, messages: list) -> None:
+        """
+        Reports a cache hit to the model's callbacks (usage recording, tracing),
+        as the model itself does for cached invokes.
+        """
+
+        manager = CallbackManager.configure(inheritable_callbacks=getattr(self.model, "callbacks", None))
+        for run in manager.on_chat_model_start(dumpd(self.model), [messages]):
+            run.on_llm_end(LLMResult(generations=[cached]))
+
+    def _cache(self) -> Optional[BaseCache]:
+        cache = getattr(self.model, "cache", None)
+        return cache if isinstance(cache, BaseCache) else None
+
+    def _stream(self, prompt_value, deadline: Optional[float] = None, cached: Optional[list] = None) -> StreamedIssues:
+        """
+        One writer call: streams the output, validating items as they complete. With cached
+        generations (a response cache hit) those are parsed instead of calling the model.
+        Complete outputs are stored in the model's response cache, keyed by the serialized
+        messages and model (its settings, without callbacks or cache).
+        Stops with TimeoutError once deadline (time.monotonic() value) has passed.
+        """
+
+        messages = prompt_value.to_messages()
+        cache = self._cache()
+        if cached:
+            self._replay(cached, messages)
+            chunks = [cached[0].message]
+        else:
+            chunks = self.model.stream(messages)
+
+        result = StreamedIssues(model=self.model_id)
+        parser = IssueStreamParser()
+        text = []
+        for chunk in chunks:
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("Writer deadline passed while streaming")
+            piece = _chunk_text(chunk)
+            text.append(piece)
+            for raw in parser.feed(piece):
+                self._accept(raw, result)
+
+        result.text = "".join(text)
+        truncated = parser.finish()
+        if truncated is not None:
+            result.truncated = True
+            self._accept(truncated, result)
+
+        if not parser.in_array:
+            raise ValueError(f"Writer output has no issues array: {result.text[:200]!r}")
+
+        # A cut-off stream is not cached, the next identical call asks the model again
+        if cache is not None and not cached and truncated is None:
+            cache.update(dumps(messages), dumps(self.model), [ChatGeneration(message=AIMessage(content=result.text))])
+
+        return result
+
+    def _accept(self, raw: str, result: StreamedIssues) -> None:
+        try:
+            issue = parse_issue(raw)
+        except ValueError as e:
+            result.failed.append((raw, str(e)))
+            return
+
+        result.issues.append(issue)
+        print(f"Issue {len(result.issues)} ready: {issue.name}")
+
+    def _rerequest(self, raw: str, error: str, timeout: Optional[float]) -> Optional[SecurityIssue]:
+        """
+        Asks the model to fix one item. None if the answer still does not validate.
+        """
+
+        messages = [
+            SystemMessage(content="You fix JSON objects so they validate against a schema."),
+            HumanMessage(content=REREQUEST_PROMPT.format(
+                schema=json.dumps(SecurityIssue.model_json_schema()),
+                errors=error,
+                item=raw
+            ))
+        ]
+        response = get_scheduler().invoke(self.model, messages, timeout=timeout)
+
+        text = _chunk_text(response)
+        start, end = text.find("{"), text.rfind("}")
+        try:
+            return parse_issue(text[start:end + 1] if start != -1 else text)
+        except ValueError:
+            return None
+
+    def stream_issues(self, prompt_template, data: dict, timeout: Optional[float] = None) -> StreamedIssues:
+        """
+        Runs the writer prompt once, without asking again for malformed items.
+        """
+
+        # Rendered up front, so the scheduler counts the whole prompt (system prompt included)
+        prompt_value = prompt_template.invoke(data)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        # Cache hits are answered without waiting for (or being charged) a scheduler slot
+        cache = self._cache()
+        if cache is not None:
+            cached = cache.lookup(dumps(prompt_value.to_messages()), dumps(self.model))
+            if cached:
+                return self._stream(prompt_value, deadline, cached)
+
+        stream = RunnableLambda(partial(self._stream, deadline=deadline))
+        return get_scheduler().invoke(stream, prompt_value, timeout=timeout)
+
+    def write(self, prompt_template, data: dict, timeout: Optional[float] = None) -> StreamedIssues:
+        """
+        Runs the writer prompt and returns all valid (or repaired) issues, failed holds the
+        items that were dropped. timeout covers the writer call and its re-requests together.
+        """
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        result = self.stream_issues(prompt_template, data, timeout)
+
+        dropped = []
+        for i, (raw, error) in enumerate(result.failed):
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if i >= MAX_REREQUESTS or (remaining is not None and remaining <= 0):
+                print(f"Dropped {len(result.failed) - i} malformed issues (re-request limit or deadline reached)")
+                dropped += result.failed[i:]
+                break
+            issue = self._rerequest(raw, error, remaining)
+            if issue is None:
+                print("Dropped a malformed issue that could not be repaired")
+                dropped.append((raw, error))
+                continue
+            result.issues.append(issue)
+
+        print(f"Writer produced {len(result.issues)} issues ({len(result.failed)} needed repair by the LLM)")
+        result.failed = dropped
+        return result
@@ -0,0 +1,354 @@
+# SUPPRESSIONS / BASELINE
+# Accepted-risk findings that are never reported again. The suppression file is compiled
+# into an index once per scan, and checkov findings are filtered through it before any
+# LLM sees them. Issues that still come out of the LLMs or the rules engine are filtered
+# again before the report is written. Reports count what was suppressed.
+#
+# Suppression file (YAML, SUPPRESSIONS_FILE), every field optional but at least one of
+# check_id / resource / fingerprint must be given. An entry matches when all its fields do:
+#
+#   suppressions:
+#     - check_id: CKV_AWS_18            # glob allowed, e.g. CKV_AWS_*
+#       resource: aws_s3_bucket.logs_*  # glob
+#       file: "payments/envs/*/main.tf" # glob of the scanned file, see below
+#       expires: 2026-12-31             # last day it applies
+#       reason: Access logs bucket, accepted by security review
+#     - fingerprint: 3f2a...            # one exact issue of an earlier report
+#
+# file is matched against the path the scan is filed under: the CLI path, or project/path
+# as sent to the API (uploads without them are uploads/<job_id>/<file name>). A glob also
+# matches a trailing part of the path ("envs/*/main.tf" covers every project's envs). A
+# bare file name ("main.tf") matches that name in every project and directory, such
+# entries are reported when the file is loaded.
+#
+# Add every issue of a report to the baseline: python suppressions.py baseline <report.json|report name>
+
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from typing import Annotated, Optional
+from datetime import date
+import threading
+import fnmatch
+import glob
+import yaml
+import re
+import os
+
+from line_index import get_line_index
+from report_diff import finding_fingerprint
+
+# ===== Suppression Settings =====
+
+SUPPRESSIONS_FILE = os.getenv("SUPPRESSIONS_FILE", "suppressions.yaml")
+
+GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+class Suppression(BaseModel):
+    """
+    One entry of the suppression file.
+    """
+
+    check_id: Annotated[Optional[str], Field(None, description="Check id, glob allowed (e.g. CKV_AWS_*)")]
+    resource: Annotated[Optional[str], Field(None, description="Resource glob (e.g. aws_s3_bucket.logs_*)")]
+    file: Annotated[Optional[str], Field(None, description="Glob of the scanned file path")]
+    fingerprint: Annotated[Optional[str], Field(None, description="Fingerprint of one issue of an earlier report")]
+    expires: Annotated[Optional[date], Field(None, description="Last day the suppression applies")]
+    reason: Annotated[str, Field("", description="Why the finding is accepted")]
+
+    @model_validator(mode="after")
+    def _has_target(self):
+        if not (self.check_id or self.resource or self.fingerprint):
+            raise ValueError("needs at least one of check_id, resource, fingerprint")
+        return self
+
+
+# ===== Index =====
+
+def _glob(pattern: Optional[str]):
+    """
+    Compiled glob, None for a missing or exact pattern (those are looked up in dicts).
+    """
+
+    if pattern is None or not GLOB_CHARS.search(pattern):
+        return None
+    return re.compile(fnmatch.translate(pattern))
+
+
+def _file_matches(pattern: str, path: str) -> bool:
+    pattern = pattern.removeprefix("./")
+    path = os.path.normpath(path).replace(os.sep, "/")
+    if "/" not in pattern:
+        path = path.rsplit("/", 1)[-1]
+    return fnmatch.fnmatchcase(path, pattern) or fnmatch.fnmatchcase(path, "*/" + pattern.lstrip("/"))
+
+
+class SuppressionIndex:
+    """
+    The suppressions of one scanned file, compiled for lookup.
+
+    File globs and expiry are resolved when the index is built, so only check id,
+    resource and fingerprint are left per finding. Entries are bucketed by what is
+    exact about them: fingerprint, (check id, resource), check id. Only entries with a
+    glob check id (or none) are tried against every finding, so lookups stay cheap
+    with baselines of thousands of entries.
+    """
+
+    def __init__(self, entries: list):
+        self.size = len(entries)
+        self.fingerprints: dict[str, list] = {}
+        self.exact: dict[tuple, list] = {}
+        self.by_check: dict[str, list] = {}
+        self.other: list = []
+
+        for entry in entries:
+            compiled = (entry, _glob(entry.check_id), _glob(entry.resource))
+            if entry.fingerprint:
+                self.fingerprints.setdefault(entry.fingerprint, []).append(compiled)
+            elif entry.check_id and compiled[1] is None:
+                if entry.resource and compiled[2] is None:
+                    self.exact.setdefault((entry.check_id, entry.resource), []).append(compiled)
+                else:
+                    self.by_check.setdefault(entry.check_id, []).append(compiled)
+            else:
+                self.other.append(compiled)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def uses_fingerprints(self) -> bool:
+        return bool(self.fingerprints)
+
+    def match(self, check_id: Optional[str], resource: Optional[str], fingerprint: Optional[str] = None) -> Optional[Suppression]:
+        """
+        The first suppression covering the finding, None if it is to be reported.
+        """
+
+        candidates = []
+        if fingerprint:
+            # Occurrence suffixes (#2, ...) are not part of the fingerprint of the finding
+            candidates += self.fingerprints.get(fingerprint.split("#")[0], [])
+        if check_id:
+            candidates += self.exact.get((check_id, resource), [])
+            candidates += self.by_check.get(check_id, [])
+        candidates += self.other
+
+        for entry, check_re, resource_re in candidates:
+            if entry.check_id and not _value_matches(entry.check_id, check_re, check_id):
+                continue
+            if entry.resource and not _value_matches(entry.resource, resource_re, resource):
+                continue
+            return entry
+        return None
+
+
+def _value_matches(pattern: str, compiled, value: Optional[str]) -> bool:
+    if value is None:
+        return False
+    if compiled is None:
+        return pattern == value
+    return compiled.match(value) is not None
+
+
+# ===== Loading =====
+
+def load_suppressions(path: str = SUPPRESSIONS_FILE) -> list:
+    """
+    Entries of the suppression file, invalid ones are skipped with a warning.
+    """
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return []
+    except (OSError, yaml.YAMLError) as e:
+        print(f"Could not read suppression file {path}: {e}")
+        return []
+
+    raw_entries = data.get("suppressions", []) if isinstance(data, dict) else data
+    entries = []
+    for i, raw in enumerate(raw_entries or []):
+        try:
+            entries.append(Suppression.model_validate(raw))
+        except ValidationError as e:
+            print(f"Skipping suppression {i + 1} in {path}: {e.errors()[0]['msg']}")
+
+    bare = [entry.file for entry in entries if entry.file and "/" not in entry.file]
+    if bare:
+        print(f"{len(bare)} suppressions in {path} give only a file name ({', '.join(sorted(set(bare))[:5])}), "
+              "they match that name in every project and directory, use project/path to scope them")
+    return entries
+
+
+def compile_suppressions(entries: list, file: str, today: Optional[date] = None) -> SuppressionIndex:
+    """
+    Index of the entries that apply to file today.
+    """
+
+    today = today or date.today()
+    active = []
+    expired = 0
+    for entry in entries:
+        if entry.expires is not None and entry.expires < today:
+            expired += 1
+            continue
+        if entry.file and not _file_matches(entry.file, file):
+            continue
+        active.append(entry)
+
+    if expired:
+        print(f"{expired} suppressions have expired and no longer apply")
+    return SuppressionIndex(active)
+
+
+_indexes: dict[tuple, SuppressionIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_suppressions(file: str, path: str = SUPPRESSIONS_FILE) -> SuppressionIndex:
+    """
+    Compiled suppressions for the scanned file. Rebuilt when the suppression file changes.
+    """
+
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+
+    key = (os.path.abspath(path), mtime, file, date.today())
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = compile_suppressions(load_suppressions(path) if mtime is not None else [], file)
+            _indexes[key] = index
+        return index
+
+
+# ===== Filtering =====
+
+def suppression_key(check_id: Optional[str], resource: Optional[str], location: list) -> str:
+    """
+    Identifies a suppressed finding, so one found by several tool runs or again in the
+    writer's output is counted once.
+    """
+
+    return f"{check_id}|{resource}|{'-'.join(str(line) for line in location or [])}"
+
+
+def filter_findings(findings: list, index: SuppressionIndex, path: str) -> tuple:
+    """
+    Splits checkov findings (dicts with check_id, resource, file_line_range) into
+    (kept, suppressed keys). path is the scanned file, used for fingerprints.
+    """
+
+    if not len(index):
+        return findings, []
+
+    line_index = get_line_index(path) if index.uses_fingerprints else None
+    kept, suppressed = [], []
+    for finding in findings:
+        if not isinstance(finding, dict):
+            kept.append(finding)
+            continue
+
+        check_id, resource = finding.get("check_id"), finding.get("resource")
+        location = list(finding.get("file_line_range") or [])
+        fingerprint = None
+        if line_index is not None and check_id:
+            snippet = line_index.snippet(location[0], location[-1]) if location else None
+            fingerprint = finding_fingerprint(check_id, resource, location, snippet)
+
+        if index.match(check_id, resource, fingerprint) is None:
+            kept.append(finding)
+        else:
+            suppressed.append(suppression_key(check_id, resource, location))
+
+    return kept, suppressed
+
+
+def filter_issues(issues: list, index: SuppressionIndex) -> tuple:
+    """
+    Splits fingerprinted SecurityIssues into (kept, suppressed keys).
+    """
+
+    if not len(index):
+        return issues, []
+
+    kept, suppressed = [], []
+    for issue in issues:
+        if index.match(issue.check_id, issue.resource, issue.fingerprint) is None:
+            kept.append(issue)
+        else:
+            suppressed.append(suppression_key(issue.check_id, issue.resource, issue.location))
+
+    return kept, suppressed
+
+
+# ===== CLI =====
+
+def add_baseline(report_data: bytes, path: str = SUPPRESSIONS_FILE, reason: str = "",
+                 expires: Optional[date] = None) -> int:
+    """
+    Adds every issue of a report to the suppression file by fingerprint. Returns the number added.
+    """
+
+    from templates import SecurityReport
+
+    report = SecurityReport.model_validate_json(report_data)
+    if report.file.startswith("uploads/"):
+        print(f"{report.name} was uploaded without a project or path, its baseline only applies to that upload")
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        data = {}
+    entries = data.setdefault("suppressions", [])
+
+    known = {entry.get("fingerprint") for entry in entries if isinstance(entry, dict)}
+    added = 0
+    for issue in report.issues:
+        fingerprint = (issue.fingerprint or "").split("#")[0]
+        if not fingerprint or fingerprint in known:
+            continue
+        entry = {
+            "fingerprint": fingerprint,
+            "check_id": issue.check_id,
+            "resource": issue.resource,
+            "file": glob.escape(report.file),
+            "expires": expires.isoformat() if expires else None,
+            "reason": reason or f"Baseline of {report.name}",
+        }
+        entries.append({key: value for key, value in entry.items() if value is not None})
+        known.add(fingerprint)
+        added += 1
+
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(data, f, sort_keys=False)
+    return added
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the suppression/baseline file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    baseline = commands.add_parser("baseline", help="Suppress every issue of a report")
+    baseline.add_argument("report", help="Report JSON file or stored report name")
+    baseline.add_argument("--reason", default="")
+    baseline.add_argument("--expires", type=date.fromisoformat, default=None, help="YYYY-MM-DD")
+    baseline.add_argument("--file", default=SUPPRESSIONS_FILE, help="Suppression file to update")
+    args = parser.parse_args()
+
+    if os.path.exists(args.report):
+        with open(args.report, "rb") as f:
+            report_data = f.read()
+    else:
+        from artifact_store import get_artifact_store
+        report_data = get_artifact_store().get(args.report)
+        if report_data is None:
+            parser.error(f"No report file or stored report named {args.report}")
+
+    added = add_baseline(report_data, args.file, args.reason, args.expires)
+    print(f"Added {added} suppressions to {args.file}")
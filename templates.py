@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import Annotated, Literal, List, TypedDict
+from pydantic.json_schema import SkipJsonSchema
+from typing import Annotated, Literal, List, Optional, TypedDict
+import operator
 from datetime import datetime
 from langgraph.graph import MessagesState
 
@@ -16,6 +18,11 @@ class SecurityIssue(BaseModel):
     confidence_score: Annotated[Literal["Low", "Medium", "High"], Field(..., description="Confidence level for the given issue")]
     problems: Annotated[List[str], Field(..., description="List of possible problems that can arise from the given issue")]
     remedies: Annotated[List[str], Field(..., description="List of possible solutions to fix the issue")]
+    check_id: Annotated[Optional[str], Field(None, description="ID of the check that found the issue, if any (e.g. CKV_AWS_20)")]
+    resource: Annotated[Optional[str], Field(None, description="Resource the issue belongs to, if known (e.g. aws_s3_bucket.data)")]
+    # Filled from the scanned file after generation, left out of the schema sent to the LLM
+    snippet: Annotated[SkipJsonSchema[Optional[str]], Field(None, description="Code at the issue location")]
+    fingerprint: Annotated[SkipJsonSchema[Optional[str]], Field(None, description="Stable ID of the issue across scans of the same file")]
 
 class SecurityReport(BaseModel):
     """
@@ -23,7 +30,7 @@ class SecurityReport(BaseModel):
     """
 
     name: Annotated[str, Field(..., description="Report Name in the Format FileName+Timestamp(mm:dd:yyyy hh:mm:ss)")]
-    summary: Annotated[dict[str, int], Field(..., description="Summary counts: {'count': total, 'low': x, 'medium': y, 'high': z}")]
+    summary: Annotated[dict[str, int], Field(..., description="Summary counts: {'count': total, 'low': x, 'medium': y, 'high': z, 'suppressed': s}")]
     timestamp: Annotated[datetime, Field(..., description="Date & Time of creation of the rpeort")]
     file: Annotated[str, Field(..., description="Path to file that was scanned for the report")]
     issues: Annotated[List[SecurityIssue], Field(..., description="List of Security Issues(can be empty if none found)")]
@@ -35,6 +42,19 @@ class AIReport(BaseModel):
 
     issues: Annotated[List[SecurityIssue], Field(..., description="List of Security Issues(can be empty if none found)")]
 
+class ReportDiff(BaseModel):
+    """
+    Class representing the change set between a report and the previous report of the same file.
+    """
+
+    report: Annotated[str, Field(..., description="Name of the new report")]
+    previous_report: Annotated[Optional[str], Field(None, description="Name of the report compared against (None on the first scan)")]
+    file: Annotated[str, Field(..., description="Path to file that was scanned")]
+    summary: Annotated[dict[str, int], Field(..., description="Counts: {'new': x, 'resolved': y, 'unchanged': z}")]
+    new: Annotated[List[SecurityIssue], Field(..., description="Issues not in the previous report")]
+    resolved: Annotated[List[SecurityIssue], Field(..., description="Issues of the previous report that are gone")]
+    unchanged: Annotated[List[SecurityIssue], Field(..., description="Issues in both reports")]
+
 # ===== Graph Templates =====
 
 class GraphState(TypedDict):
@@ -44,7 +64,12 @@ class GraphState(TypedDict):
 
     output_dir: Annotated[str, Field(..., description="Location of all outputs")]
     input_file_path: Annotated[str, Field(..., description="Location of the IaC template")]
+    source_file: Annotated[str, Field(..., description="File name the report is filed under, defaults to input_file_path")]
+    input_hash: Annotated[str, Field(..., description="Hash of source_file and the input content, binds checkpoints to the input")]
     iac_template: Annotated[str, Field(..., description="IaC Template to be scanned")]
+    rule_issues: Annotated[List[SecurityIssue], Field(..., description="Issues found by the local rules engine")]
+    llm_template: Annotated[str, Field(..., description="Template with rule-decided blocks blanked out, empty if the LLM is not needed")]
+    complexity: Annotated[dict, Field(..., description="Size of the scan input (lines, resources, findings), picks the model tier")]
     iac_issues: Annotated[AIReport, Field(..., description="Issues Generated by the AI")]
     report: Annotated[SecurityReport, Field(..., description="Final Generated Report")]
 
@@ -61,6 +86,10 @@ class ReActGraphState(MessagesState):
     output_file_name: Annotated[str, Field(..., description="Name of the output files(Input FileName + Timestamp)")]
     output_dir: Annotated[str, Field(..., description="Location of all outputs")]
     input_file_path: Annotated[str, Field(..., description="Location of the IaC template")]
-    iac_template: Annotated[str, Field(..., description="IaC Template to be scanned")]
+    source_file: Annotated[str, Field(..., description="File name the report is filed under, defaults to input_file_path")]
+    input_hash: Annotated[str, Field(..., description="Hash of source_file and the input content, binds checkpoints to the input")]
+    iac_template_ref: Annotated[str, Field(..., description="Blob store reference of the IaC template to be scanned")]
+    suppressed: Annotated[List[str], Field(..., description="Findings dropped by the suppression file, added to by every tool call"), operator.add]
+    complexity: Annotated[dict, Field(..., description="Size of the scan input (lines, resources, findings), picks the model tier")]
     iac_issues: Annotated[AIReport, Field(..., description="Issues Generated by the AI")]
     report: Annotated[SecurityReport, Field(..., description="Final Generated Report")]
@@ -0,0 +1,5 @@
+import sys
+import os
+
+# The modules are flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,41 @@
+from block_cache import BlockIssueCache, block_hash
+from templates import SecurityIssue
+
+
+def issue(name, location):
+    return SecurityIssue(name=name, severity="High", location=list(location), confidence_score="High",
+                         problems=["p"], remedies=["r"])
+
+
+def test_block_hash_covers_every_line_and_the_model():
+    a = block_hash("terraform", ['resource "x" "y" {', "  a = 1", "}"], "prompt", "model-a")
+
+    assert a == block_hash("terraform", ['resource "x" "y" {', "  a = 1", "}"], "prompt", "model-a")
+    # A blank line shifts the lines below it, cached offsets would point at the wrong line
+    assert a != block_hash("terraform", ['resource "x" "y" {', "", "  a = 1", "}"], "prompt", "model-a")
+    assert a != block_hash("terraform", ['resource "x" "y" {', "  a = 1", "}"], "prompt", "model-b")
+
+
+def test_cached_issues_follow_a_moved_block(tmp_path):
+    cache = BlockIssueCache(str(tmp_path / "blocks.sqlite"))
+    cache.put_blocks([("one", 10, 15), ("two", 20, 30)], [issue("Open port", (11, 12)), issue("Public", (20, 30))])
+
+    assert [i.location for i in cache.get("one", 40)] == [[41, 42]]
+    assert [i.location for i in cache.get("two", 1)] == [[1, 11]]
+
+
+def test_spanning_issues_are_stored_under_every_overlapping_block(tmp_path):
+    cache = BlockIssueCache(str(tmp_path / "blocks.sqlite"))
+    cache.put_blocks([("one", 1, 5), ("two", 6, 9), ("clean", 10, 12)], [issue("Spans both", (4, 7))])
+
+    assert [i.location for i in cache.get("one", 1)] == [[4, 7]]
+    assert [i.location for i in cache.get("two", 6)] == [[4, 7]]
+    assert cache.get("clean", 10) == []
+
+
+def test_no_block_is_cached_as_clean_when_an_issue_is_unassigned(tmp_path):
+    cache = BlockIssueCache(str(tmp_path / "blocks.sqlite"))
+    cache.put_blocks([("one", 1, 5), ("clean", 6, 9)], [issue("In one", (2, 3)), issue("Loose", (20, 21))])
+
+    assert [i.name for i in cache.get("one", 1)] == ["In one"]
+    assert cache.get("clean", 6) is None
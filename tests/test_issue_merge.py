@@ -0,0 +1,60 @@
+import issue_merge
+from issue_merge import merge_issues
+from templates import SecurityIssue
+
+
+def issue(name, location, check_id=None, resource=None, problems=("p",)):
+    return SecurityIssue(name=name, severity="Medium", location=list(location), confidence_score="High",
+                         problems=list(problems), remedies=[], check_id=check_id, resource=resource)
+
+
+def test_equivalent_checks_on_one_resource_merge():
+    merged = merge_issues([
+        issue("Unencrypted EBS volume", (3, 8), "CKV_AWS_3", "aws_ebs_volume.v", ["a"]),
+        issue("EBS Volume Not Encrypted", (3, 8), "RULE_EBS_UNENCRYPTED", "aws_ebs_volume.v", ["b"]),
+    ])
+
+    assert len(merged) == 1
+    assert merged[0].problems == ["a", "b"]
+
+
+def test_port_specific_security_group_checks_stay_distinct():
+    issues = [
+        issue("SSH open to the world", (1, 10), "CKV_AWS_24", "aws_security_group.sg"),
+        issue("RDP open to the world", (1, 10), "CKV_AWS_25", "aws_security_group.sg"),
+        issue("Security Group Allows Ingress from 0.0.0.0/0", (1, 10), "RULE_SG_OPEN_INGRESS", "aws_security_group.sg"),
+    ]
+
+    assert len(merge_issues(issues)) == 3
+
+
+def test_untyped_issue_merges_by_name_and_keeps_order():
+    merged = merge_issues([
+        issue("Bucket versioning disabled", (20, 25)),
+        issue("Hardcoded database password", (5, 5)),
+        issue("Hardcoded password in database", (4, 6), "CKV_SECRET_6"),
+        issue("Hardcoded database password", (40, 40)),
+    ])
+
+    assert [i.name for i in merged] == [
+        "Bucket versioning disabled", "Hardcoded password in database", "Hardcoded database password",
+    ]
+
+
+def test_overlapping_untyped_issues_are_not_compared_pairwise(monkeypatch):
+    calls = 0
+    accepts = issue_merge._Cluster.accepts
+
+    def counting(self, *args):
+        nonlocal calls
+        calls += 1
+        return accepts(self, *args)
+
+    monkeypatch.setattr(issue_merge._Cluster, "accepts", counting)
+
+    # All open at once, distinct names sharing a common word
+    n = 5000
+    issues = [issue(f"bucket q{i}a q{i}b q{i}c", (1, n)) for i in range(n)]
+
+    assert len(merge_issues(issues)) == n
+    assert calls < n
@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from llm_cache import ResponseCache
+from llm_scheduler import LLMScheduler
+
+
+def counting_scheduler(monkeypatch):
+    scheduler = LLMScheduler(rpm=600, tpm=1_000_000, max_concurrency=2)
+    slot = scheduler.slot
+    slots = []
+
+    @contextmanager
+    def counting(*args, **kwargs):
+        slots.append(args)
+        with slot(*args, **kwargs):
+            yield
+
+    monkeypatch.setattr(scheduler, "slot", counting)
+    return scheduler, slots
+
+
+def test_cache_hits_take_no_slot(monkeypatch):
+    scheduler, slots = counting_scheduler(monkeypatch)
+    model = FakeListChatModel(responses=["first", "second"], cache=ResponseCache(db_path=None))
+
+    assert scheduler.invoke(model, "scan").content == "first"
+    assert scheduler.invoke(model, "scan").content == "first"
+    assert scheduler.invoke(model.bind(stop=["x"]), "scan").content == "second"
+    assert len(slots) == 2
+
+
+def test_uncached_calls_are_admitted_up_front(monkeypatch):
+    scheduler, slots = counting_scheduler(monkeypatch)
+    model = FakeListChatModel(responses=["first"])
+
+    scheduler.invoke(model, "scan")
+    scheduler.invoke(model, "scan")
+    assert len(slots) == 2
@@ -0,0 +1,87 @@
+from iac_parser import parse_template
+from rules import evaluate_rules, is_covered, mask_covered_blocks
+
+
+RDS_AND_BUCKET = '''resource "aws_db_instance" "db" {
+  publicly_accessible = true
+  password            = "hunter2"
+}
+
+resource "aws_s3_bucket" "b" {
+  bucket = "plain"
+}
+'''
+
+
+def test_resource_blocks_of_rule_types_still_go_to_the_llm():
+    parsed = parse_template(RDS_AND_BUCKET, "main.tf")
+
+    assert not any(is_covered(block) for block in parsed.blocks)
+    llm_template = mask_covered_blocks(RDS_AND_BUCKET, parsed)
+    assert 'password            = "hunter2"' in llm_template
+    assert "publicly_accessible = true" in llm_template
+    assert 'bucket = "plain"' in llm_template
+
+
+def test_neutral_blocks_are_masked_keeping_line_numbers():
+    template = 'variable "region" {\n  default = "us-east-1"\n}\n\nresource "aws_s3_bucket" "b" {\n  bucket = "x"\n}\n'
+    parsed = parse_template(template, "main.tf")
+
+    llm_template = mask_covered_blocks(template, parsed)
+    lines = llm_template.splitlines()
+    assert lines[0] == ""
+    assert lines[4] == 'resource "aws_s3_bucket" "b" {'
+
+
+def test_only_neutral_blocks_need_no_llm():
+    template = 'terraform {\n  required_version = ">= 1.0"\n}\n\noutput "id" {\n  value = "x"\n}\n'
+    assert mask_covered_blocks(template, parse_template(template, "main.tf")) == ""
+
+
+def test_resources_the_rules_cover_need_no_llm():
+    template = '''resource "aws_ebs_volume" "v" {
+  availability_zone = "eu-west-1a"
+  size              = 10
+  encrypted         = true
+}
+
+resource "random_id" "suffix" {
+  byte_length = 4
+}
+'''
+    assert mask_covered_blocks(template, parse_template(template, "main.tf")) == ""
+
+
+def test_covered_type_with_other_attributes_goes_to_the_llm():
+    template = 'resource "aws_ebs_volume" "v" {\n  encrypted            = true\n  multi_attach_enabled = true\n}\n'
+    parsed = parse_template(template, "main.tf")
+
+    assert not is_covered(parsed.blocks[0])
+    assert "multi_attach_enabled" in mask_covered_blocks(template, parsed)
+
+
+def test_rules_match_public_bucket_and_open_security_group():
+    template = '''resource "aws_s3_bucket" "public" {
+  acl = "public-read"
+}
+
+resource "aws_security_group" "ssh" {
+  ingress {
+    from_port   = 22
+    to_port     = 22
+    cidr_blocks = ["0.0.0.0/0"]
+  }
+}
+'''
+    issues = evaluate_rules(parse_template(template, "main.tf"))
+
+    found = {(issue.check_id, issue.resource, tuple(issue.location)) for issue in issues}
+    assert found == {
+        ("RULE_S3_PUBLIC_ACL", "aws_s3_bucket.public", (1, 3)),
+        ("RULE_SG_OPEN_INGRESS", "aws_security_group.ssh", (5, 11)),
+    }
+
+
+def test_encrypted_volume_is_not_flagged():
+    template = 'resource "aws_ebs_volume" "v" {\n  encrypted = true\n}\n'
+    assert evaluate_rules(parse_template(template, "main.tf")) == []
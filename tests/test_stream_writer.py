@@ -0,0 +1,45 @@
+import json
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from stream_writer import IssueStreamParser, StreamingIssueWriter, _repair_json, parse_issue
+
+
+def test_repair_json_fixes_common_slips():
+    assert json.loads(_repair_json('{"a": [1, 2,], "b": None, "c": True,}')) == {"a": [1, 2], "b": None, "c": True}
+    assert json.loads(_repair_json("{'name': 'x'}")) == {"name": "x"}
+
+
+def test_repair_json_closes_a_cut_off_item():
+    assert json.loads(_repair_json('{"name": "Open port", "problems": ["a", "b')) == {"name": "Open port", "problems": ["a", "b"]}
+    assert json.loads(_repair_json('{"location": [1, 2], "remedies": [{"x": "}]"},')) == {"location": [1, 2], "remedies": [{"x": "}]"}]}
+
+
+def test_parse_issue_coerces_fields():
+    issue = parse_issue('{"name": "x", "severity": "critical", "location": "12", "confidence_score": "med", '
+                        '"problems": "one", "remedies": null,}')
+
+    assert (issue.severity, issue.confidence_score, issue.location) == ("High", "Medium", [12, 12])
+    assert (issue.problems, issue.remedies) == (["one"], [])
+
+
+def test_parser_returns_items_as_they_close():
+    parser = IssueStreamParser()
+
+    assert parser.feed('```json\n{"issues": [{"name": "a {"}, {"na') == ['{"name": "a {"}']
+    assert parser.feed('me": "b"}]}') == ['{"name": "b"}']
+    assert parser.finish() is None
+
+
+def test_cut_off_stream_is_incomplete():
+    def model(messages):
+        yield '{"issues": [{"name": "A", "severity": "High", "location": [1, 2], "confidence_score": "High", '
+        yield '"problems": [], "remedies": []}, {"name": "B", "sev'
+
+    writer = StreamingIssueWriter(RunnableLambda(model))
+    result = writer.stream_issues(ChatPromptTemplate.from_messages([("human", "{x}")]), {"x": "scan"})
+
+    assert [issue.name for issue in result.issues] == ["A"]
+    assert result.truncated and not result.complete
+    assert result.model == writer.model_id
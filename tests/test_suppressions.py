@@ -0,0 +1,55 @@
+from datetime import date
+
+import pytest
+
+from suppressions import Suppression, compile_suppressions
+
+
+def entries(*raw):
+    return [Suppression.model_validate(entry) for entry in raw]
+
+
+def test_exact_glob_and_fingerprint_entries_match():
+    index = compile_suppressions(entries(
+        {"check_id": "CKV_AWS_18", "resource": "aws_s3_bucket.logs"},
+        {"check_id": "CKV_AWS_2*"},
+        {"resource": "aws_iam_role.ci_*"},
+        {"fingerprint": "abc123"},
+    ), "main.tf")
+
+    assert index.match("CKV_AWS_18", "aws_s3_bucket.logs") is not None
+    assert index.match("CKV_AWS_18", "aws_s3_bucket.data") is None
+    assert index.match("CKV_AWS_21", "aws_s3_bucket.data") is not None
+    assert index.match("CKV_AWS_62", "aws_iam_role.ci_deploy") is not None
+    assert index.match(None, None, "abc123#2") is not None
+    assert index.match("CKV_AWS_62", "aws_iam_role.app") is None
+
+
+def test_file_glob_and_expiry_are_resolved_per_file():
+    raw = (
+        {"check_id": "CKV_AWS_18", "file": "envs/*/main.tf"},
+        {"check_id": "CKV_AWS_19", "file": "main.tf"},
+        {"check_id": "CKV_AWS_20", "expires": "2026-01-31"},
+    )
+
+    prod = compile_suppressions(entries(*raw), "repo/envs/prod/main.tf", today=date(2026, 2, 1))
+    assert prod.match("CKV_AWS_18", "r") is not None
+    assert prod.match("CKV_AWS_19", "r") is not None
+    assert prod.match("CKV_AWS_20", "r") is None
+
+    other = compile_suppressions(entries(*raw), "modules/main.tf", today=date(2026, 1, 31))
+    assert other.match("CKV_AWS_18", "r") is None
+    assert other.match("CKV_AWS_20", "r") is not None
+
+
+def test_project_path_scopes_an_entry():
+    raw = ({"check_id": "CKV_AWS_18", "file": "payments/envs/*/main.tf"},)
+
+    assert compile_suppressions(entries(*raw), "payments/envs/prod/main.tf").match("CKV_AWS_18", "r") is not None
+    assert compile_suppressions(entries(*raw), "billing/envs/prod/main.tf").match("CKV_AWS_18", "r") is None
+    assert compile_suppressions(entries(*raw), "uploads/0f3a/main.tf").match("CKV_AWS_18", "r") is None
+
+
+def test_entry_needs_a_target():
+    with pytest.raises(ValueError):
+        Suppression.model_validate({"file": "main.tf"})
@@ -1,7 +1,6 @@
-from langchain.tools import ToolRuntime
 from langchain_core.tools import tool
 
-from pydantic import BaseModel, Field
+from deadlines import TOOL_TIMEOUT
 
 import subprocess
 import json
@@ -37,7 +36,8 @@ def checkov_tool(input_file_path: str, output_dir: str, output_file_name: str) -
         # Run Checkov
         subprocess.run(
             ["checkov", "-f", input_file_path, "-o", "json", "--output-file-path", output_dir],
-            check=False
+            check=False,
+            timeout=TOOL_TIMEOUT  # The checkov process is killed after this
         )
 
         # Read checkov output
@@ -73,6 +73,10 @@ def checkov_tool(input_file_path: str, output_dir: str, output_file_name: str) -
 
         return final_json_str
 
+    except subprocess.TimeoutExpired:
+        print(f"Checkov Tool timed out after {TOOL_TIMEOUT:.0f}s.")
+        return f"Error: checkov timed out after {TOOL_TIMEOUT:.0f} seconds, no results."
+
     except Exception as e:
         print("Checkov Tool failed to run.")
         print(e)